@@ -1,7 +1,5 @@
-import os, re, json, base64, tempfile, zipfile
-from typing import TypedDict, Dict, Any
-
-from starlette.responses import JSONResponse
+import base64, io, zipfile
+from typing import TypedDict, Dict, Any, List
 
 from app.utils.helper_utils import HelperUtils
 
@@ -12,47 +10,51 @@ class AgentState(TypedDict):
     block_details: Dict[str, Any]
     block_content_output: Dict[str, Any]
     final_output: Dict[str, Any]
+    include_zip_base64: bool
 
 
-def assemble_json(output):
-    pass
-
-    block_name = output["block_name"]
-    css_code = output["css_code"]
-    js_code = output["js_code"]
-    mkd_table = output["markdown_table"]
+def _write_block(zipf: zipfile.ZipFile, prefix: str, block_name: str, css_code: str, js_code: str) -> None:
+    zipf.writestr(f"{prefix}{block_name}/{block_name}.css", css_code)
+    if js_code:
+        zipf.writestr(f"{prefix}{block_name}/{block_name}.js", js_code)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        block_dir = os.path.join(tmpdir, block_name)
-        os.makedirs(block_dir, exist_ok=True)
 
-        css_path = os.path.join(block_dir, f"{block_name}.css")
-        with open(css_path, "w") as f:
-            f.write(css_code)
+def build_block_archive(block_name: str, css_code: str, js_code: str = "") -> bytes:
+    """Zip a block's files in memory; nothing is written to disk"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        _write_block(zipf, "", block_name, css_code, js_code)
+    return buffer.getvalue()
 
-        if js_code:
-            js_path = os.path.join(block_dir, f"{block_name}.js")
-            with open(js_path, "w") as f:
-                f.write(js_code)
 
-        zip_path = os.path.join(tmpdir, f"{block_name}.zip")
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for filename in os.listdir(block_dir):
-                zipf.write(os.path.join(block_dir, filename), arcname=f"{block_name}/{filename}")
+def build_blocks_archive(blocks: List[Dict[str, str]]) -> bytes:
+    """Zip several assembled blocks into one in-memory archive laid out as blocks/<name>/"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for block in blocks:
+            _write_block(zipf, "blocks/", block["block_name"], block.get("css", ""), block.get("js", ""))
+    return buffer.getvalue()
 
-        zip_bytes = open(zip_path, 'rb').read()
 
-        zip_base64 = base64.b64encode(zip_bytes).decode('utf-8')
+def assemble_json(output, include_zip_base64: bool = False):
+    block_name = output["block_name"]
+    css_code = output["css_code"]
+    js_code = output["js_code"]
+    mkd_table = output["markdown_table"]
 
-        return {
-            "zip_base64": zip_base64,
-            "css": css_code,
-            "js": js_code,
-            "mkd_table": mkd_table,
-            "file_name": f"{block_name}.zip"
-        }
+    assembled = {
+        "block_name": block_name,
+        "css": css_code,
+        "js": js_code,
+        "mkd_table": mkd_table,
+        "file_name": f"{block_name}.zip"
+    }
+    # Base64 inflates the archive by a third; clients should prefer the binary archive endpoint
+    if include_zip_base64:
+        assembled["zip_base64"] = base64.b64encode(build_block_archive(block_name, css_code, js_code)).decode('utf-8')
+    return assembled
 
 def assemble_node(state: AgentState) -> AgentState:
     output = state['block_content_output']
-    state["final_output"] = assemble_json(output)
+    state["final_output"] = assemble_json(output, state.get("include_zip_base64", False))
     return state
@@ -1,4 +1,5 @@
-from typing import TypedDict, Dict, Any
+import asyncio
+from typing import TypedDict, Dict, Any, List
 
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
 
@@ -24,7 +25,7 @@ class AgentState(TypedDict):
     block_content_output: Dict[str, Any]
     final_output: Dict[str, Any]
 
-def extract_node(state: AgentState) -> AgentState:
+async def extract_node(state: AgentState) -> AgentState:
     """
     Agent 1: Extracts block name, style, and functionality description from user input.
     """
@@ -43,7 +44,7 @@ def extract_node(state: AgentState) -> AgentState:
     ]
     logger.info(f"Extract Agent prompt: {prompt} \n\n")
     # Call OpenAI API to extract block details
-    response = HelperUtils.call_openai(prompt)
+    response = await HelperUtils.call_openai(prompt, agent_name="eds_extract")
 
     if not response:
         raise ValueError("Extraction failed")
@@ -52,3 +53,50 @@ def extract_node(state: AgentState) -> AgentState:
     state['block_details'] = HelperUtils.parse_chat_response_to_json(block_details)
     logger.info(f"Extracted block details: {state['block_details']}")
     return state
+
+
+async def extract_batch(descriptions: List[str]) -> List[Dict[str, Any]]:
+    """
+    Extracts block details for several requests with a single prompt.
+    Returns one details dict per description, in order; entries the model skipped or
+    mangled are re-extracted individually with extract_node.
+    """
+    user_prompt = HelperUtils.build_eds_prompt("extract_agent_batch_prompt.txt", {})
+    numbered = "\n".join(f"{index}. {description}" for index, description in enumerate(descriptions))
+    prompt = [
+        ChatCompletionSystemMessageParam(role="system", content=SYSTEM_PROMPT_EXTRACT_AGENT),
+        ChatCompletionUserMessageParam(role="user", content=user_prompt),
+        ChatCompletionUserMessageParam(role="user", content=f"**User Requests**\n{numbered}")
+    ]
+
+    extracted: Dict[int, Dict[str, Any]] = {}
+    try:
+        response = await HelperUtils.call_openai(prompt, agent_name="eds_extract_batch")
+        items = HelperUtils.parse_chat_response_to_json(response.choices[0].message.content)
+        if isinstance(items, list):
+            for position, item in enumerate(items):
+                if not isinstance(item, dict) or not item.get("blockName"):
+                    continue
+                index = item.pop("index", position)
+                if isinstance(index, int) and 0 <= index < len(descriptions):
+                    extracted[index] = item
+    except Exception as e:
+        logger.warning(f"Batched extraction failed, extracting individually: {e}")
+
+    missing = [index for index in range(len(descriptions)) if index not in extracted]
+    if missing:
+        logger.info(f"Batched extraction covered {len(extracted)}/{len(descriptions)} requests; re-extracting {missing}")
+        states = await asyncio.gather(*(
+            extract_node({"user_request": descriptions[index], "block_details": {},
+                          "block_content_output": {}, "final_output": {}})
+            for index in missing
+        ), return_exceptions=True)
+        for index, state in zip(missing, states):
+            if isinstance(state, Exception):
+                # Left empty so only this block fails at generation time
+                logger.error(f"Extraction failed for request {index}: {state}")
+                extracted[index] = {}
+            else:
+                extracted[index] = state["block_details"]
+
+    return [extracted[index] for index in range(len(descriptions))]
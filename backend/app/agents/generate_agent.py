@@ -17,7 +17,7 @@ class AgentState(TypedDict):
     block_content_output: Dict[str, Any]
     final_output: Dict[str, Any]
 
-def generate_content_node(state: AgentState) -> AgentState:
+async def generate_content_node(state: AgentState) -> AgentState:
     """
     Agent 2: Generates CSS, JS, markdown table, and input HTML for the block.
     """
@@ -57,7 +57,7 @@ def generate_content_node(state: AgentState) -> AgentState:
     logger.info(f"User prompt for content generation: {user_prompt}")
     
     # Call OpenAI API to extract block details
-    response = HelperUtils.call_openai(user_prompt)
+    response = await HelperUtils.call_openai(user_prompt, agent_name="eds_generate")
 
     if not response:
         raise ValueError("Extraction failed")
@@ -1,20 +1,27 @@
+import json
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Annotated
+from typing import Dict, Any, Iterator, List, Optional, Annotated
 from pydantic import BaseModel, Field, ConfigDict, field_validator
 from pydantic.functional_validators import BeforeValidator
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, ServerSelectionTimeoutError
 from bson import ObjectId
 import os
 from dotenv import load_dotenv
 import logging
 import time
 
+from app.utils.telemetry import traced
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Stage outputs of failed generations are kept this long for resumption
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+
 # Custom ObjectId type for Pydantic v2
 def validate_object_id(v: Any) -> ObjectId:
     if isinstance(v, ObjectId):
@@ -73,6 +80,31 @@ class GeneratedComponent(BaseModel):
     generation_timestamp: datetime = Field(default_factory=datetime.utcnow)
     generation_metadata: Optional[Dict[str, Any]] = None
 
+class LLMUsageRecord(BaseModel):
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={
+            ObjectId: str,
+            datetime: lambda v: v.isoformat() if v else None
+        }
+    )
+
+    record_id: str = Field(default_factory=lambda: str(ObjectId()))
+    agent_name: str
+    provider: str
+    model: str
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cache_creation_tokens: int = 0
+    duration_ms: float = 0.0
+    cost_usd: float = 0.0
+    success: bool = True
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
 class ChatSession(BaseModel):
     model_config = ConfigDict(
         populate_by_name=True,
@@ -93,6 +125,7 @@ class ChatSession(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = Field(default=True)
     model_provider: str = Field(default="openai")
+    usage_totals: Dict[str, Any] = Field(default_factory=dict)
 
     @classmethod
     def from_mongo(cls, data: dict):
@@ -146,6 +179,17 @@ def clean_for_json(obj):
     else:
         return obj
 
+def _idempotency_record(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if doc is None:
+        return None
+    return {
+        "status": doc["status"],
+        "request_hash": doc["request_hash"],
+        "created_at": doc.get("created_at"),
+        "result": json.loads(doc["result"]) if doc.get("result") else None
+    }
+
+
 class ChatStorage:
     def __init__(self):
         self.mongo_uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
@@ -178,6 +222,13 @@ class ChatStorage:
                 self.db.chat_sessions.create_index("user_id")
                 self.db.chat_sessions.create_index("created_at")
                 self.db.chat_sessions.create_index("is_active")
+                self.db.llm_usage.create_index("session_id")
+                self.db.llm_usage.create_index("user_id")
+                self.db.llm_usage.create_index("timestamp")
+                self.db.generation_checkpoints.create_index([("generation_id", 1), ("stage", 1)], unique=True)
+                self.db.generation_checkpoints.create_index("created_at", expireAfterSeconds=CHECKPOINT_TTL_SECONDS)
+                self.db.idempotency_keys.create_index("scope_key", unique=True)
+                self.db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
 
                 logger.info(f"Connected to MongoDB: {self.database_name}")
                 return
@@ -205,6 +256,7 @@ class ChatStorage:
         except Exception:
             return False
 
+    @traced("storage.create_chat_session")
     def create_chat_session(self, session_title: str, user_id: Optional[str] = None,
                             model_provider: str = "openai") -> str:
         """Create a new chat session"""
@@ -265,6 +317,7 @@ class ChatStorage:
             logger.error(f"Failed to retrieve chat session {session_id}: {e}")
             return None
 
+    @traced("storage.update_chat_session")
     def update_chat_session(self, session_id: str, session: ChatSession) -> bool:
         """Update an existing chat session"""
         try:
@@ -281,6 +334,7 @@ class ChatStorage:
             logger.error(f"Failed to update chat session {session_id}: {e}")
             return False
 
+    @traced("storage.add_message")
     def add_message_to_session(self, session_id: str, message: ChatMessage) -> bool:
         """Add a message to a chat session"""
         try:
@@ -298,6 +352,7 @@ class ChatStorage:
             logger.error(f"Failed to add message to session {session_id}: {e}")
             return False
 
+    @traced("storage.add_component")
     def add_component_to_session(self, session_id: str, component: GeneratedComponent) -> bool:
         """Add a generated component to a chat session"""
         try:
@@ -415,6 +470,209 @@ class ChatStorage:
             logger.error(f"Failed to retrieve component {component_id} from session {session_id}: {e}")
             return None
 
+    def session_exists(self, session_id: str) -> bool:
+        try:
+            return self.db.chat_sessions.count_documents({"session_id": session_id}, limit=1) > 0
+        except Exception as e:
+            logger.error(f"Failed to look up session {session_id}: {e}")
+            return False
+
+    def iter_session_components(self, session_id: str, component_ids: Optional[List[str]] = None,
+                                batch_size: int = 20) -> Iterator[GeneratedComponent]:
+        """
+        Yield a session's components newest first through an aggregation cursor, so callers hold one
+        batch at a time instead of the whole session document
+        """
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"session_id": session_id}},
+            {"$unwind": "$generated_components"},
+            {"$replaceRoot": {"newRoot": "$generated_components"}},
+        ]
+        if component_ids:
+            pipeline.append({"$match": {"component_id": {"$in": list(component_ids)}}})
+        pipeline.append({"$sort": {"generation_timestamp": -1}})
+        for component_data in self.db.chat_sessions.aggregate(pipeline, batchSize=batch_size, allowDiskUse=True):
+            component_data.pop("_id", None)
+            yield GeneratedComponent(**component_data)
+
+    @traced("storage.add_usage_record")
+    def add_usage_record(self, record: LLMUsageRecord) -> bool:
+        """Store one LLM call record and roll its totals up onto the owning session"""
+        try:
+            self.db.llm_usage.insert_one(record.model_dump())
+
+            if record.session_id:
+                self.db.chat_sessions.update_one(
+                    {"session_id": record.session_id},
+                    {"$inc": {
+                        "usage_totals.calls": 1,
+                        "usage_totals.prompt_tokens": record.prompt_tokens,
+                        "usage_totals.completion_tokens": record.completion_tokens,
+                        "usage_totals.cached_tokens": record.cached_tokens,
+                        "usage_totals.duration_ms": record.duration_ms,
+                        "usage_totals.cost_usd": record.cost_usd
+                    }}
+                )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store LLM usage record for agent {record.agent_name}: {e}")
+            return False
+
+    @traced("storage.save_checkpoint")
+    def save_checkpoint(self, generation_id: str, stage: str, input_hash: str, output: Dict[str, Any],
+                        session_id: Optional[str] = None) -> bool:
+        """Persist one pipeline stage's validated output so a retry can skip it"""
+        try:
+            # Stored as JSON text: agent outputs use file names such as ".content.xml" as keys
+            self.db.generation_checkpoints.update_one(
+                {"generation_id": generation_id, "stage": stage},
+                {"$set": {
+                    "input_hash": input_hash,
+                    "output": json.dumps(output),
+                    "session_id": session_id,
+                    "created_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint {stage} for generation {generation_id}: {e}")
+            return False
+
+    def get_checkpoints(self, generation_id: str, input_hash: str) -> Dict[str, Any]:
+        """Stage name -> output for a generation; checkpoints recorded for different input are ignored"""
+        try:
+            cursor = self.db.generation_checkpoints.find(
+                {"generation_id": generation_id, "input_hash": input_hash},
+                {"_id": 0, "stage": 1, "output": 1}
+            )
+            return {doc["stage"]: json.loads(doc["output"]) for doc in cursor}
+        except Exception as e:
+            logger.error(f"Failed to load checkpoints for generation {generation_id}: {e}")
+            return {}
+
+    def delete_checkpoints(self, generation_id: str) -> bool:
+        try:
+            self.db.generation_checkpoints.delete_many({"generation_id": generation_id})
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete checkpoints for generation {generation_id}: {e}")
+            return False
+
+    def claim_idempotency_key(self, scope_key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim a key for a new run. Returns None when the claim succeeded, otherwise the
+        existing record ({"status": "in_progress" | "completed", "request_hash", "result"}).
+        """
+        try:
+            existing = self.db.idempotency_keys.find_one_and_update(
+                {"scope_key": scope_key},
+                {"$setOnInsert": {
+                    "request_hash": request_hash,
+                    "status": "in_progress",
+                    "created_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Lost a concurrent upsert race; the winner's record is the one to report
+            existing = self.db.idempotency_keys.find_one({"scope_key": scope_key})
+        return _idempotency_record(existing)
+
+    def get_idempotency_record(self, scope_key: str) -> Optional[Dict[str, Any]]:
+        try:
+            doc = self.db.idempotency_keys.find_one({"scope_key": scope_key})
+        except Exception as e:
+            logger.error(f"Failed to load idempotency key {scope_key}: {e}")
+            return None
+        return _idempotency_record(doc)
+
+    def complete_idempotency_key(self, scope_key: str, result: Dict[str, Any]) -> bool:
+        """Store the response of a finished run; the TTL restarts so it is replayable for the full window"""
+        try:
+            self.db.idempotency_keys.update_one(
+                {"scope_key": scope_key},
+                {"$set": {"status": "completed", "result": json.dumps(result, default=str),
+                          "created_at": datetime.utcnow()}}
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store result for idempotency key {scope_key}: {e}")
+            return False
+
+    def release_idempotency_key(self, scope_key: str, claimed_before: Optional[datetime] = None) -> bool:
+        """
+        Forget an in-progress key whose run failed or was cancelled, so a retry runs again.
+        With claimed_before, only a claim older than that is released (taking over a dead worker's claim).
+        """
+        query: Dict[str, Any] = {"scope_key": scope_key, "status": "in_progress"}
+        if claimed_before is not None:
+            query["created_at"] = {"$lt": claimed_before}
+        try:
+            self.db.idempotency_keys.delete_one(query)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key {scope_key}: {e}")
+            return False
+
+    def get_usage_records(self, session_id: str, limit: int = 500) -> List[LLMUsageRecord]:
+        """Get the individual LLM call records of a session, oldest first"""
+        try:
+            records = self.db.llm_usage.find({"session_id": session_id}) \
+                .sort("timestamp", 1) \
+                .limit(limit)
+
+            result = []
+            for record_data in records:
+                record_data.pop("_id", None)
+                result.append(LLMUsageRecord(**record_data))
+            return result
+        except Exception as e:
+            logger.error(f"Failed to retrieve usage records for session {session_id}: {e}")
+            return []
+
+    def aggregate_usage(self, group_by: str = "agent_name", user_id: Optional[str] = None,
+                        session_id: Optional[str] = None, since: Optional[datetime] = None,
+                        limit: int = 50) -> List[Dict[str, Any]]:
+        """Aggregate LLM usage grouped by agent, provider, model, session or user"""
+        try:
+            match: Dict[str, Any] = {}
+            if user_id:
+                match["user_id"] = user_id
+            if session_id:
+                match["session_id"] = session_id
+            if since:
+                match["timestamp"] = {"$gte": since}
+
+            pipeline = [
+                {"$match": match},
+                {
+                    "$group": {
+                        "_id": f"${group_by}",
+                        "calls": {"$sum": 1},
+                        "failed_calls": {"$sum": {"$cond": ["$success", 0, 1]}},
+                        "prompt_tokens": {"$sum": "$prompt_tokens"},
+                        "completion_tokens": {"$sum": "$completion_tokens"},
+                        "cached_tokens": {"$sum": "$cached_tokens"},
+                        "cost_usd": {"$sum": "$cost_usd"},
+                        "total_duration_ms": {"$sum": "$duration_ms"},
+                        "avg_duration_ms": {"$avg": "$duration_ms"},
+                        "max_duration_ms": {"$max": "$duration_ms"}
+                    }
+                },
+                {"$sort": {"cost_usd": -1, "total_duration_ms": -1}},
+                {"$limit": limit}
+            ]
+
+            result = []
+            for row in self.db.llm_usage.aggregate(pipeline):
+                row[group_by] = row.pop("_id")
+                result.append(row)
+            return result
+        except Exception as e:
+            logger.error(f"Failed to aggregate LLM usage by {group_by}: {e}")
+            return []
+
     def close_connection(self):
         """Close MongoDB connection"""
         if self.client:
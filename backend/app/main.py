@@ -1,11 +1,19 @@
-from fastapi import FastAPI
+import time
+import uuid
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import component_routes, project_routes, eds_block_routes, eds_routes
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.routes import aem_core_routes, component_routes, project_routes, eds_block_routes, eds_routes
 import os
 from app.routes.component_routes import router as component_router
 from app.routes.project_routes import router as project_router
 from app.routes.eds_routes import router as eds_router
 from app.chatStorage.chat_model import ChatStorage
+from app.services.aem_core_components_service import aem_core_components_service
+from app.utils.openai_client import close_openai_client, warm_up_openai_client
+from app.utils.request_context import request_scope
+from app.utils.telemetry import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS, span
 from dotenv import load_dotenv
 import logging
 
@@ -20,18 +28,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Generation-Id"],
 )
 
+
+@app.middleware("http")
+async def request_telemetry(request: Request, call_next):
+    """Tag each request with an id, trace it as a root span and record HTTP latency metrics"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    method = request.method
+    started = time.perf_counter()
+    status = "500"
+    # Label by the matched route template after routing, so ids in paths don't explode cardinality
+    route = request.url.path
+    HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+    try:
+        with request_scope(request_id), span(f"http {method}", path=request.url.path):
+            response = await call_next(request)
+        status = str(response.status_code)
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        matched = request.scope.get("route")
+        if matched is not None:
+            route = getattr(matched, "path", route)
+        elif status == "404":
+            route = "unmatched"
+        HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+        HTTP_REQUEST_DURATION.labels(method, route, status).observe(time.perf_counter() - started)
+
 app.include_router(component_router, prefix="/api/component", tags=["components"])
 #app.include_router(project_router, prefix="/api/project", tags=["project"])
 app.include_router(project_router, prefix="/api/project", tags=["projects"])
 app.include_router(eds_block_routes.router, prefix="/api/component", tags=["edsblocks"])
 app.include_router(eds_router)
+app.include_router(aem_core_routes.router)
+
+@app.on_event("startup")
+async def warm_up_clients():
+    await warm_up_openai_client()
+
+@app.on_event("shutdown")
+async def close_clients():
+    await close_openai_client()
+    await eds_block_routes.block_service.close()
+    await aem_core_components_service.close()
 
 @app.get("/")
 async def root():
     return {"message": "AEM Component Generator API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint that includes MongoDB connectivity"""
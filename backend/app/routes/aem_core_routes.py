@@ -18,6 +18,12 @@ class CoreComponentsConfigResponse(BaseModel):
     github_token_available: bool
     cache_dir: str
     repo_info: Dict[str, str]
+    index_file: Optional[str] = None
+    index_available: bool = False
+
+class IngestRequest(BaseModel):
+    # Branch, tag or commit to download; the server-side AEM_CORE_ARCHIVE tarball takes precedence
+    ref: Optional[str] = None
 
 @router.get("/config", response_model=CoreComponentsConfigResponse)
 async def get_core_components_config():
@@ -28,6 +34,8 @@ async def get_core_components_config():
             configured=bool(service.github_token),
             github_token_available=bool(service.github_token),
             cache_dir=str(service.cache_dir),
+            index_file=str(service.index_file),
+            index_available=service.index_file.is_file(),
             repo_info={
                 "owner": service.repo_owner,
                 "name": service.repo_name,
@@ -52,7 +60,7 @@ async def list_core_components():
         logger.error(f"Error fetching component list: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch components: {str(e)}")
 
-@router.get("/components/{component_name}")
+@router.get("/components/{component_name:path}")
 async def get_component_details(component_name: str):
     """Get detailed information about a specific core component"""
     try:
@@ -91,16 +99,27 @@ async def search_relevant_components(request: ComponentSearchRequest):
         logger.error(f"Error searching components: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to search components: {str(e)}")
 
+@router.post("/ingest")
+async def ingest_core_components(request: Optional[IngestRequest] = None):
+    """Index every core component from one repository archive; later lookups are local reads"""
+    request = request or IngestRequest()
+    try:
+        result = await aem_core_components_service.ingest_archive(request.ref)
+        return {
+            "success": True,
+            **result
+        }
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error ingesting core components archive: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to ingest archive: {str(e)}")
+
 @router.post("/clear-cache")
 async def clear_components_cache():
     """Clear the core components cache"""
     try:
-        import shutil
-        cache_dir = aem_core_components_service.cache_dir
-        
-        if cache_dir.exists():
-            shutil.rmtree(cache_dir)
-            cache_dir.mkdir(parents=True, exist_ok=True)
+        aem_core_components_service.clear_cache()
             
         return {
             "success": True,
@@ -1,21 +1,43 @@
+import asyncio
 import base64
 import logging
 from typing import Optional, List
 from datetime import datetime
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Request, File, UploadFile, Form, Query
+from fastapi import APIRouter, HTTPException, Header, Request, File, UploadFile, Form, Query
 from pydantic import BaseModel
 from ..services.component_service import ComponentService
+from ..services.idempotency import (IdempotencyConflict, generation_id_for, idempotency_scope,
+                                    idempotency_service, request_fingerprint)
 from ..chatStorage.chat_model import ChatStorage
+from ..utils.disconnect import CLIENT_CLOSED_REQUEST, ClientDisconnected, cancel_on_disconnect
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 component_service = ComponentService()
 
-# Simplified Pydanti# New Pydantic models for component search and reuse
+# Simplified Pydantic models
+class ComponentRequest(BaseModel):
+    componentDesc: str
+    sessionId: Optional[str] = None
+    userId: Optional[str] = None
+
+class ChatSessionCreate(BaseModel):
+    session_title: str
+    user_id: Optional[str] = None
+
+class ComponentRefinementRequest(BaseModel):
+    session_id: str
+    component_id: str
+    refinement_prompt: str
+    user_id: Optional[str] = None
+    # Id returned by a failed attempt; resumes the generation from its checkpointed stages
+    generation_id: Optional[str] = None
+
+# New Pydantic models for component search and reuse
 class ComponentSearchRequest(BaseModel):
     component_type: str
     limit: Optional[int] = 10
@@ -26,6 +48,31 @@ class ComponentReuseRequest(BaseModel):
     source_session_id: str
     customization_prompt: Optional[str] = None
 
+class MessageRequest(BaseModel):
+    message_type: str = "user"
+    content: str
+    image_data: Optional[str] = None
+    metadata: Optional[dict] = None
+
+class SessionResponse(BaseModel):
+    success: bool
+    session_id: Optional[str] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+class ComponentResponse(BaseModel):
+    success: bool
+    message: Optional[str] = None
+    session_id: Optional[str] = None
+    component_id: Optional[str] = None
+    outputDirs: Optional[dict] = None
+    fileManifest: Optional[List[dict]] = None
+    structure: Optional[dict] = None
+    aiOutput: Optional[dict] = None
+    error: Optional[str] = None
+    details: Optional[str] = None
+    generation_id: Optional[str] = None
+
 # Component search and reuse endpoints
 @router.get("/test-search")
 async def test_search():
@@ -56,49 +103,18 @@ async def search_components(component_type: str = Query(...), limit: int = Query
             }
         )
 
-@router.get("/{session_id}/{component_id}")
-async def get_component_details(session_id: str, component_id: str):
-    """Get detailed information about a specific component"""
-    try:
-        logger.info(f"Getting component details: {component_id} from session: {session_id}")
-        
-        component = component_service.get_component_details(session_id, component_id)
-        
-        if not component:
-            raise HTTPException(
-                status_code=404,
-                detail="Component not found"
-            )
-        
-        return {
-            "success": True,
-            "component": component
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error getting component details: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "error": "Failed to get component details",
-                "details": str(e)
-            }
-        )
-
 @router.post("/reuse", response_model=ComponentResponse)
-async def reuse_component(request: ComponentReuseRequest):
+async def reuse_component(request: ComponentReuseRequest, http_request: Request):
     """Reuse an existing component with optional customization"""
     try:
         logger.info(f"Reusing component {request.source_component_id} from session {request.source_session_id}")
         
-        result = await component_service.reuse_existing_component(
+        result = await cancel_on_disconnect(http_request, component_service.reuse_existing_component(
             session_id=request.session_id,
             source_component_id=request.source_component_id,
             source_session_id=request.source_session_id,
             customization_prompt=request.customization_prompt
-        )
+        ))
         
         if not result["success"]:
             raise HTTPException(
@@ -108,6 +124,8 @@ async def reuse_component(request: ComponentReuseRequest):
         
         return ComponentResponse(**result)
         
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except HTTPException:
         raise
     except Exception as e:
@@ -120,67 +138,6 @@ async def reuse_component(request: ComponentReuseRequest):
             }
         )
 
-# Legacy endpoint for backward compatibility (if needed)
-@router.post("/component/generate", response_model=ComponentResponse)
-async def generate_component_legacy(
-        componentDesc: str = Form(...),
-        file: Optional[UploadFile] = File(default=None)
-):
-    """Legacy endpoint for backward compatibility"""
-    return await generate_component(
-        componentDesc=componentDesc,
-        sessionId=None,
-        userId=None,
-        file=file
-    )
-    componentDesc: str
-    sessionId: Optional[str] = None
-    userId: Optional[str] = None
-
-class ChatSessionCreate(BaseModel):
-    session_title: str
-    user_id: Optional[str] = None
-
-class ComponentRefinementRequest(BaseModel):
-    session_id: str
-    component_id: str
-    refinement_prompt: str
-    user_id: Optional[str] = None
-
-# New Pydantic models for component search and reuse
-class ComponentSearchRequest(BaseModel):
-    component_type: str
-    limit: Optional[int] = 10
-
-class ComponentReuseRequest(BaseModel):
-    session_id: str
-    source_component_id: str
-    source_session_id: str
-    customization_prompt: Optional[str] = None
-
-class MessageRequest(BaseModel):
-    message_type: str = "user"
-    content: str
-    image_data: Optional[str] = None
-    metadata: Optional[dict] = None
-
-class SessionResponse(BaseModel):
-    success: bool
-    session_id: Optional[str] = None
-    message: Optional[str] = None
-    error: Optional[str] = None
-
-class ComponentResponse(BaseModel):
-    success: bool
-    message: Optional[str] = None
-    session_id: Optional[str] = None
-    component_id: Optional[str] = None
-    outputDirs: Optional[dict] = None
-    structure: Optional[dict] = None
-    aiOutput: Optional[dict] = None
-    error: Optional[str] = None
-    details: Optional[str] = None
-
 # Component search and reuse endpoints
 
 # Chat Session Management Endpoints
@@ -204,6 +161,40 @@ async def create_chat_session(session_data: ChatSessionCreate):
         logger.error(f"Failed to create chat session: {str(e)}", exc_info=True)
         return SessionResponse(success=False, error=str(e))
 
+# Registered before /chat/sessions/{session_id} so "search" is not captured as a session id
+@router.get("/chat/sessions/search")
+async def search_chat_sessions(
+        q: str = Query(..., description="Search term"),
+        user_id: Optional[str] = Query(None),
+        limit: int = Query(10, ge=1, le=50)
+):
+    """Search chat sessions"""
+    try:
+        sessions = component_service.search_chat_sessions(q, user_id)
+
+        # Convert sessions to dicts for JSON serialization
+        sessions_data = []
+        for session in sessions[:limit]:  # Apply limit
+            session_dict = {
+                'session_id': session.session_id,
+                'session_title': session.session_title,
+                'created_at': session.created_at.isoformat(),
+                'updated_at': session.updated_at.isoformat(),
+                'message_count': len(session.messages),
+                'component_count': len(session.generated_components),
+                'user_id': session.user_id
+            }
+            sessions_data.append(session_dict)
+
+        return {
+            'success': True,
+            'sessions': sessions_data
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to search chat sessions: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/chat/sessions/{session_id}")
 @router.get("/chat/sessions/{session_id}")
 async def get_chat_session(session_id: str):
@@ -293,39 +284,6 @@ async def get_chat_sessions(
         logger.error(f"Failed to retrieve chat sessions: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/chat/sessions/search")
-async def search_chat_sessions(
-        q: str = Query(..., description="Search term"),
-        user_id: Optional[str] = Query(None),
-        limit: int = Query(10, ge=1, le=50)
-):
-    """Search chat sessions"""
-    try:
-        sessions = component_service.search_chat_sessions(q, user_id)
-
-        # Convert sessions to dicts for JSON serialization
-        sessions_data = []
-        for session in sessions[:limit]:  # Apply limit
-            session_dict = {
-                'session_id': session.session_id,
-                'session_title': session.session_title,
-                'created_at': session.created_at.isoformat(),
-                'updated_at': session.updated_at.isoformat(),
-                'message_count': len(session.messages),
-                'component_count': len(session.generated_components),
-                'user_id': session.user_id
-            }
-            sessions_data.append(session_dict)
-
-        return {
-            'success': True,
-            'sessions': sessions_data
-        }
-
-    except Exception as e:
-        logger.error(f"Failed to search chat sessions: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
 @router.delete("/chat/sessions/{session_id}")
 async def delete_chat_session(session_id: str):
     """Delete a chat session"""
@@ -361,6 +319,66 @@ async def get_session_components(session_id: str):
         logger.error(f"Failed to retrieve components for session {session_id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/chat/sessions/{session_id}/export")
+async def export_session_components(
+        session_id: str,
+        format: str = Query(default="zip", pattern="^(zip|package)$"),
+        component_id: Optional[List[str]] = Query(default=None)
+):
+    """
+    Download components as a zip in the Maven project layout (format=zip) or as an AEM content
+    package (format=package). Exports the whole session, or only the given component_id values
+    (repeat the parameter). The archive is streamed while it is built.
+    """
+    archive = await asyncio.to_thread(component_service.export_components, session_id, component_id, format)
+    if archive is None:
+        raise HTTPException(status_code=404, detail="No components found to export")
+    suffix = "zip" if format == "zip" else "package.zip"
+    return StreamingResponse(
+        archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="components-{session_id}.{suffix}"'}
+    )
+
+@router.get("/chat/sessions/{session_id}/usage")
+async def get_session_usage(session_id: str):
+    """Get LLM token, cost and latency records for a session"""
+    try:
+        usage = component_service.get_session_usage(session_id)
+
+        return JSONResponse(content={
+            'success': True,
+            'session_id': session_id,
+            'records': usage['records'],
+            'by_agent': usage['by_agent']
+        })
+
+    except Exception as e:
+        logger.error(f"Failed to retrieve usage for session {session_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/usage")
+async def get_usage_summary(
+        group_by: str = Query("agent_name", pattern="^(agent_name|provider|model|session_id|user_id)$"),
+        user_id: Optional[str] = Query(None),
+        session_id: Optional[str] = Query(None),
+        since: Optional[datetime] = Query(None, description="Only include calls after this ISO timestamp"),
+        limit: int = Query(50, ge=1, le=500)
+):
+    """Aggregate LLM usage (tokens, cost, wall time) by agent, provider, model, session or user"""
+    try:
+        summary = component_service.get_usage_summary(group_by, user_id, session_id, since, limit)
+
+        return {
+            'success': True,
+            'group_by': group_by,
+            'usage': summary
+        }
+
+    except Exception as e:
+        logger.error(f"Failed to aggregate usage: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/chat/sessions/{session_id}/messages")
 async def add_message_to_session(session_id: str, message_data: MessageRequest):
     """Add a message to a session"""
@@ -390,12 +408,17 @@ async def add_message_to_session(session_id: str, message_data: MessageRequest):
 # Component Generation and Refinement Endpoints (Simplified)
 @router.post("/generate", response_model=ComponentResponse)
 async def generate_component(
+        http_request: Request,
         componentDesc: str = Form(...),
         sessionId: Optional[str] = Form(None),
         userId: Optional[str] = Form(None),
-        file: Optional[UploadFile] = File(default=None)
+        generationId: Optional[str] = Form(None),
+        file: Optional[UploadFile] = File(default=None),
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    """Generate a component (enhanced with session support)"""
+    """Generate a component (enhanced with session support). Send back the generationId of a
+    failed response to retry it from the stages that already succeeded. Retries carrying the
+    same Idempotency-Key attach to the first run or get its stored result."""
     try:
         logger.info(f"Received component generation request")
         logger.debug(f"Request data: prompt='{componentDesc}', sessionId='{sessionId}'")
@@ -406,12 +429,28 @@ async def generate_component(
             image_bytes = await file.read()
             logger.info(f"Received image file: {file.filename}, size: {len(image_bytes)} bytes")
 
-        result = await component_service.generate_component(
-            prompt=componentDesc,
-            image=image_bytes,
-            session_id=sessionId,
-            user_id=userId
-        )
+        if idempotency_key:
+            scope_key = idempotency_scope(userId, "generate", idempotency_key)
+            work = idempotency_service.run(
+                scope_key,
+                request_fingerprint(componentDesc, sessionId, generationId, image_bytes),
+                lambda: component_service.generate_component(
+                    prompt=componentDesc,
+                    image=image_bytes,
+                    session_id=sessionId,
+                    user_id=userId,
+                    generation_id=generationId or generation_id_for(scope_key)
+                )
+            )
+        else:
+            work = component_service.generate_component(
+                prompt=componentDesc,
+                image=image_bytes,
+                session_id=sessionId,
+                user_id=userId,
+                generation_id=generationId
+            )
+        result = await cancel_on_disconnect(http_request, work)
 
         logger.info("Component generation completed successfully")
 
@@ -422,12 +461,18 @@ async def generate_component(
             session_id=result.get('session_id'),
             component_id=result.get('component_id'),
             outputDirs=result.get('outputDirs'),
+            fileManifest=result.get('fileManifest'),
             structure=result.get('structure'),
             aiOutput=result.get('aiOutput'),
             error=result.get('error'),
-            details=result.get('details')
+            details=result.get('details'),
+            generation_id=result.get('generation_id')
         )
 
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error in generate_component endpoint: {str(e)}", exc_info=True)
         return ComponentResponse(
@@ -437,17 +482,34 @@ async def generate_component(
         )
 
 @router.post("/refine", response_model=ComponentResponse)
-async def refine_component(refinement_data: ComponentRefinementRequest):
-    """Refine an existing component"""
+async def refine_component(refinement_data: ComponentRefinementRequest, http_request: Request,
+                           idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """Refine an existing component; Idempotency-Key dedupes retried submissions like /generate"""
     try:
         logger.info(f"Received component refinement request for component {refinement_data.component_id}")
 
-        result = await component_service.refine_component(
-            session_id=refinement_data.session_id,
-            component_id=refinement_data.component_id,
-            refinement_prompt=refinement_data.refinement_prompt,
-            user_id=refinement_data.user_id
-        )
+        if idempotency_key:
+            scope_key = idempotency_scope(refinement_data.user_id, "refine", idempotency_key)
+            work = idempotency_service.run(
+                scope_key,
+                request_fingerprint(refinement_data.model_dump_json()),
+                lambda: component_service.refine_component(
+                    session_id=refinement_data.session_id,
+                    component_id=refinement_data.component_id,
+                    refinement_prompt=refinement_data.refinement_prompt,
+                    user_id=refinement_data.user_id,
+                    generation_id=refinement_data.generation_id or generation_id_for(scope_key)
+                )
+            )
+        else:
+            work = component_service.refine_component(
+                session_id=refinement_data.session_id,
+                component_id=refinement_data.component_id,
+                refinement_prompt=refinement_data.refinement_prompt,
+                user_id=refinement_data.user_id,
+                generation_id=refinement_data.generation_id
+            )
+        result = await cancel_on_disconnect(http_request, work)
 
         logger.info("Component refinement completed successfully")
 
@@ -457,11 +519,17 @@ async def refine_component(refinement_data: ComponentRefinementRequest):
             session_id=result.get('session_id'),
             component_id=result.get('component_id'),
             outputDirs=result.get('outputDirs'),
+            fileManifest=result.get('fileManifest'),
             aiOutput=result.get('aiOutput'),
             error=result.get('error'),
-            details=result.get('details')
+            details=result.get('details'),
+            generation_id=result.get('generation_id')
         )
 
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Error in refine_component endpoint: {str(e)}", exc_info=True)
         return ComponentResponse(
@@ -602,13 +670,50 @@ async def deploy_aem_component(
 # Legacy endpoint for backward compatibility (if needed)
 @router.post("/component/generate", response_model=ComponentResponse)
 async def generate_component_legacy(
+        http_request: Request,
         componentDesc: str = Form(...),
         file: Optional[UploadFile] = File(default=None)
 ):
     """Legacy endpoint for backward compatibility"""
     return await generate_component(
+        http_request=http_request,
         componentDesc=componentDesc,
         sessionId=None,
         userId=None,
-        file=file
-    )
\ No newline at end of file
+        generationId=None,
+        file=file,
+        idempotency_key=None
+    )
+
+
+# Registered last: this two-segment catch-all would otherwise shadow /chat/sessions and friends
+@router.get("/{session_id}/{component_id}")
+async def get_component_details(session_id: str, component_id: str):
+    """Get detailed information about a specific component"""
+    try:
+        logger.info(f"Getting component details: {component_id} from session: {session_id}")
+        
+        component = component_service.get_component_details(session_id, component_id)
+        
+        if not component:
+            raise HTTPException(
+                status_code=404,
+                detail="Component not found"
+            )
+        
+        return {
+            "success": True,
+            "component": component
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting component details: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Failed to get component details",
+                "details": str(e)
+            }
+        )
@@ -1,25 +1,113 @@
-from fastapi import APIRouter, HTTPException
+import json
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from app.agents.assemble_agent import build_block_archive, build_blocks_archive
 from app.services.eds.block_service import EDSBlockService
+from app.utils.disconnect import CLIENT_CLOSED_REQUEST, ClientDisconnected, cancel_on_disconnect
 from app.utils.helper_utils import HelperUtils
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Initialize logger once
 logger = HelperUtils.setup_logger("fastapi_app")
 
 router = APIRouter()
 block_service = EDSBlockService()
+
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
 class BlockInput(BaseModel):
     description: str
+    # Opt-in: embed the zip as base64 in the JSON (33% larger); prefer /generate-eds-block/archive
+    include_zip_base64: bool = False
+    # X-Generation-Id of a failed attempt; resumes its workflow after the last finished step
+    thread_id: Optional[str] = None
+
+class BlockArchiveInput(BaseModel):
+    block_name: str = Field(..., pattern=r"^[A-Za-z0-9_-]+$")
+    css: str = ""
+    js: str = ""
+
+class BlockBatchInput(BaseModel):
+    descriptions: List[str] = Field(..., min_length=1, max_length=100)
+
+class BlockBatchArchiveInput(BaseModel):
+    blocks: List[BlockArchiveInput] = Field(..., min_length=1)
+
+def _iter_bytes(data: bytes) -> Iterator[bytes]:
+    view = memoryview(data)
+    for offset in range(0, len(view), ARCHIVE_CHUNK_SIZE):
+        yield bytes(view[offset:offset + ARCHIVE_CHUNK_SIZE])
 
 @router.post("/generate-eds-block")  # will resolve to /auth/login
-async def generate_block(input_data: BlockInput):
+async def generate_block(input_data: BlockInput, http_request: Request):
     logger.info(f"Received EDS Block generation request")
     try:
         # Call the service to generate the EDS block files
-        result = block_service.run_workflow(input_data.description)
+        result = await cancel_on_disconnect(http_request, block_service.run_workflow(
+            input_data.description, input_data.include_zip_base64, input_data.thread_id))
 
         logger.info("EDS Block generation completed successfully")
         return result
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except Exception as e:
         logger.error(f"Error during block generation: ", e)
-        raise HTTPException(status_code=500, detail="An error occurred during block generation.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An error occurred during block generation.")
+
+@router.post("/generate-eds-block/archive")
+async def download_block_archive(input_data: BlockArchiveInput):
+    """Stream an assembled block (as returned by /generate-eds-block) as a zip, built in memory"""
+    archive = build_block_archive(input_data.block_name, input_data.css, input_data.js)
+    return StreamingResponse(
+        _iter_bytes(archive),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{input_data.block_name}.zip"',
+            "Content-Length": str(len(archive))
+        }
+    )
+
+@router.post("/generate-eds-block/batch")
+async def generate_blocks_batch(input_data: BlockBatchInput):
+    """
+    Generate many blocks in one request. Streams NDJSON: one {"index", "success", "block"|"error"}
+    line per block as it finishes, then a {"summary": ...} line. Post the successful blocks to
+    /generate-eds-block/archive/batch for one combined zip.
+    """
+    logger.info(f"Received batched EDS Block generation request for {len(input_data.descriptions)} blocks")
+
+    async def stream() -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        succeeded = 0
+        async for result in block_service.run_batch(input_data.descriptions):
+            succeeded += result["success"]
+            yield (json.dumps(result) + "\n").encode("utf-8")
+        summary = {
+            "total": len(input_data.descriptions),
+            "succeeded": succeeded,
+            "failed": len(input_data.descriptions) - succeeded,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        logger.info(f"Batched EDS Block generation finished: {summary}")
+        yield (json.dumps({"summary": summary}) + "\n").encode("utf-8")
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/generate-eds-block/archive/batch")
+async def download_blocks_archive(input_data: BlockBatchArchiveInput):
+    """Stream several assembled blocks as one zip laid out as blocks/<name>/"""
+    names = [block.block_name for block in input_data.blocks]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Block names must be unique within an archive.")
+    archive = build_blocks_archive([block.model_dump() for block in input_data.blocks])
+    return StreamingResponse(
+        _iter_bytes(archive),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": 'attachment; filename="eds-blocks.zip"',
+            "Content-Length": str(len(archive))
+        }
+    )
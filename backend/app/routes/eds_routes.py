@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import logging
 
-from ..services.git_service import GitService
+from ..services.git_service import GIT_PUSH_BATCH_WINDOW_SECONDS, GIT_PUSH_MODE, GitService, git_push_queue
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +14,17 @@ class PushToGitRequest(BaseModel):
     files: Dict[str, str]  # html, css, js, etc.
     metadata: Optional[Dict[str, Any]] = {}
     create_pr: bool = True
+    # Push right away instead of joining the current batch window
+    urgent: bool = False
+
+class PushBlock(BaseModel):
+    block_name: str
+    files: Dict[str, str]
+    metadata: Optional[Dict[str, Any]] = {}
+
+class PushBatchRequest(BaseModel):
+    blocks: List[PushBlock]
+    create_pr: bool = True
 
 class PushToGitResponse(BaseModel):
     success: bool
@@ -66,18 +77,27 @@ async def push_eds_block_to_git(request: PushToGitRequest):
         
         logger.info(f"Pushing EDS block '{request.block_name}' to Git")
         
-        # Push to Git
-        result = await git_service.push_eds_block(
-            block_name=request.block_name,
-            files=request.files,
-            metadata=metadata,
-            create_pr=request.create_pr
-        )
+        # Push to Git; non-urgent pushes share a branch/commit/PR with others in the batch window
+        if request.urgent or GIT_PUSH_BATCH_WINDOW_SECONDS <= 0:
+            result = await git_service.push_eds_block(
+                block_name=request.block_name,
+                files=request.files,
+                metadata=metadata,
+                create_pr=request.create_pr
+            )
+        else:
+            result = await git_push_queue.submit(
+                block_name=request.block_name,
+                files=request.files,
+                metadata=metadata,
+                create_pr=request.create_pr
+            )
         
         # Format response - build it manually to avoid field conflicts
         response_data = {
             "success": result.get("success", True),
-            "message": f"EDS block '{request.block_name}' successfully pushed to Git",
+            "message": (f"EDS block '{request.block_name}' is already up to date in Git" if result.get("unchanged")
+                        else f"EDS block '{request.block_name}' successfully pushed to Git"),
             "block_name": result.get("block_name", request.block_name),
             "sanitized_name": result.get("sanitized_name", ""),
             "branch_name": result.get("branch_name", ""),
@@ -87,7 +107,11 @@ async def push_eds_block_to_git(request: PushToGitRequest):
             "pull_request_url": result.get("pull_request_url"),
             "pull_request_number": result.get("pull_request_number"),
             "files_written": result.get("files_written", []),
-            "pr_error": result.get("pr_error")
+            "pr_error": result.get("pr_error"),
+            "unchanged": result.get("unchanged", False),
+            "status": result.get("status"),
+            "batch_size": result.get("batch_size", 1),
+            "batched_with": result.get("batched_with", [])
         }
         
         response = PushToGitResponse(**response_data)
@@ -104,6 +128,44 @@ async def push_eds_block_to_git(request: PushToGitRequest):
             detail=f"Failed to push EDS block to Git: {str(e)}"
         )
 
+@router.post("/push-to-git/batch")
+async def push_eds_blocks_to_git(request: PushBatchRequest):
+    """
+    Push several EDS blocks as one branch, one commit and (optionally) one Pull Request.
+    The response lists each block's status: pushed, unchanged or superseded (the same
+    block appears later in the batch).
+    """
+    if not request.blocks:
+        raise HTTPException(status_code=400, detail="No blocks provided")
+    for block in request.blocks:
+        if not block.files:
+            raise HTTPException(status_code=400, detail=f"No files provided for block '{block.block_name}'")
+        if not block.block_name or not block.block_name.strip():
+            raise HTTPException(status_code=400, detail="Block name is required")
+
+    try:
+        blocks = []
+        for block in request.blocks:
+            metadata = block.metadata or {}
+            metadata.update({
+                'author': metadata.get('author', 'DXP Component Generator'),
+                'generated_at': metadata.get('generated_at', 'now')
+            })
+            blocks.append({'block_name': block.block_name, 'files': block.files, 'metadata': metadata})
+
+        logger.info(f"Pushing {len(blocks)} EDS blocks to Git as one batch")
+        result = await GitService().push_eds_blocks(blocks, create_pr=request.create_pr)
+        return {
+            **result,
+            "message": f"{result['batch_size']} EDS block(s) pushed to Git"
+            if not result.get("unchanged") else "EDS blocks are already up to date in Git"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error pushing EDS blocks to Git: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to push EDS blocks to Git: {str(e)}")
+
 @router.get("/git-config")
 async def get_git_config():
     """
@@ -117,6 +179,8 @@ async def get_git_config():
             "repo_url": git_service.repo_url,
             "base_branch": git_service.base_branch,
             "branch_prefix": git_service.branch_prefix,
+            "push_mode": GIT_PUSH_MODE,
+            "batch_window_seconds": GIT_PUSH_BATCH_WINDOW_SECONDS,
             "author_name": git_service.author_name,
             "author_email": git_service.author_email,
             # Don't expose the actual token
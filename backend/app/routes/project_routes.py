@@ -1,24 +1,57 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 from ..services.project_service import ProjectService
 
 router = APIRouter()
 project_service = ProjectService()
 
 class ProjectRequest(BaseModel):
-    aem_version: str
-    archetype_version: str
-    app_title: str
-    app_id: str
-    group_id: str
-    artifact_id: str
-    package: str
-    version: str
+    # The frontend form posts camelCase keys; both spellings are accepted
+    model_config = ConfigDict(populate_by_name=True)
+
+    aem_version: Optional[str] = Field(default=None, alias="aemVersion")
+    archetype_version: Optional[str] = Field(default=None, alias="archetypeVersion")
+    app_title: Optional[str] = Field(default=None, alias="appTitle")
+    app_id: Optional[str] = Field(default=None, alias="appId")
+    group_id: Optional[str] = Field(default=None, alias="groupId")
+    artifact_id: Optional[str] = Field(default=None, alias="artifactId")
+    package: Optional[str] = None
+    version: Optional[str] = None
 
 @router.post("/generate", summary="Generate project from AEM")
 async def generate_project(request: ProjectRequest):
+    """Generate a project and respond once it is ready (Maven runs as a background job)"""
     try:
-        result = await project_service.generate_project_structure(request.model_dump_json())
+        result = await project_service.generate_project_structure(request.model_dump(exclude_none=True))
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/jobs", status_code=202, summary="Start project generation as a job")
+async def start_project_job(request: ProjectRequest):
+    """Queue generation and return immediately; poll the job or follow its log"""
+    try:
+        job = project_service.start_job(request.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        **job.to_dict(),
+        "status_url": f"/api/project/jobs/{job.job_id}",
+        "log_url": f"/api/project/jobs/{job.job_id}/log"
+    }
+
+@router.get("/jobs/{job_id}", summary="Project generation job status")
+async def get_project_job(job_id: str):
+    job = project_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {**job.to_dict(), **({"result": job.result()} if job.done else {})}
+
+@router.get("/jobs/{job_id}/log", summary="Follow a project generation job's Maven output")
+async def stream_project_job_log(job_id: str):
+    if not project_service.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(project_service.stream_job_log(job_id), media_type="text/plain; charset=utf-8")
@@ -1,15 +1,121 @@
 import os
 import json
 import asyncio
+import tarfile
+import tempfile
 import aiohttp
 import logging
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional
 from pathlib import Path
 import re
+import time
 from datetime import datetime, timedelta
 
+from app.utils.file_utils import write_if_changed
+
 logger = logging.getLogger(__name__)
 
+# Concurrent GitHub API requests; the shared session pools connections to api.github.com
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "8"))
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "30"))
+
+AEM_CORE_CACHE_DIR = os.getenv("AEM_CORE_CACHE_DIR", "/app/cache/aem_components")
+# Fresh for the TTL; after that served stale (refreshed in the background) until MAX_STALE
+AEM_CORE_CACHE_TTL_HOURS = float(os.getenv("AEM_CORE_CACHE_TTL_HOURS", "6"))
+AEM_CORE_CACHE_MAX_STALE_HOURS = float(os.getenv("AEM_CORE_CACHE_MAX_STALE_HOURS", "168"))
+# Parsed entries kept in memory (LRU) and files kept on disk (oldest evicted first)
+AEM_CORE_CACHE_MEMORY_ENTRIES = int(os.getenv("AEM_CORE_CACHE_MEMORY_ENTRIES", "128"))
+AEM_CORE_CACHE_MAX_FILES = int(os.getenv("AEM_CORE_CACHE_MAX_FILES", "1000"))
+
+# Local index built from one repository archive; when present, every lookup reads it instead of GitHub
+AEM_CORE_INDEX_FILE = os.getenv("AEM_CORE_INDEX_FILE") or str(Path(AEM_CORE_CACHE_DIR) / "index" / "core_components.json")
+# Offline ingest: a local tarball of adobe/aem-core-wcm-components (otherwise it is downloaded)
+AEM_CORE_ARCHIVE = os.getenv("AEM_CORE_ARCHIVE")
+AEM_CORE_ARCHIVE_REF = os.getenv("AEM_CORE_ARCHIVE_REF", "")
+AEM_CORE_ARCHIVE_TIMEOUT = float(os.getenv("AEM_CORE_ARCHIVE_TIMEOUT", "300"))
+
+COMPONENTS_ROOT = "content/src/content/jcr_root/apps/core/wcm/components/"
+MODELS_ROOT = "bundles/core/src/main/java/com/adobe/cq/wcm/core/components/models/"
+MAX_INDEXED_FILE_BYTES = 512 * 1024
+VERSION_DIR = re.compile(r"v(\d+)")
+# Branch, tag or commit names accepted for the tarball download (they become part of the API URL)
+GIT_REF_PATTERN = re.compile(r"[\w.\-/]+")
+
+
+def _model_rank(model_path: str, component_name: str) -> tuple:
+    """Sort key for Sling model candidates: the component's own package, then its parent's, exact class name first"""
+    directory, _, filename = model_path.lower().rpartition("/")
+    leaf = component_name.rsplit("/", 1)[-1].lower()
+    return (directory != component_name.lower(), directory != component_name.lower().rpartition("/")[0],
+            filename != f"{leaf}.java", model_path)
+
+
+def build_core_components_index(fileobj: BinaryIO) -> Dict[str, Dict[str, Any]]:
+    """
+    Stream a .tar.gz of the core components repository (tarfile "r|gz": one pass, nothing
+    extracted to disk) and collect each component's latest HTL, dialog, README and Sling
+    model interface. Returns component name -> details, in the shape fetch_component_details returns.
+    """
+    # component -> version -> {field: text}
+    versions: Dict[str, Dict[int, Dict[str, str]]] = {}
+    component_readmes: Dict[str, str] = {}
+    models: Dict[str, str] = {}
+
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as archive:
+        for member in archive:
+            if not member.isfile() or member.size > MAX_INDEXED_FILE_BYTES:
+                continue
+            # Drop the "<owner>-<repo>-<sha>/" prefix GitHub archives put on every entry
+            path = member.name.split("/", 1)[-1]
+            if path.startswith(MODELS_ROOT) and path.endswith(".java"):
+                models[path[len(MODELS_ROOT):]] = archive.extractfile(member).read().decode("utf-8", "replace")
+                continue
+            if not path.startswith(COMPONENTS_ROOT):
+                continue
+            parts = path[len(COMPONENTS_ROOT):].split("/")
+            if parts[-1] == "README.md" and len(parts) >= 2 and not any(VERSION_DIR.fullmatch(p) for p in parts):
+                component_readmes["/".join(parts[:-1])] = archive.extractfile(member).read().decode("utf-8", "replace")
+                continue
+            # <name>/vN/<leaf>/<file>, where <name> may be nested (form/text) and <leaf> is its last segment
+            version_at = next((i for i, part in enumerate(parts) if VERSION_DIR.fullmatch(part)), None)
+            if not version_at or len(parts) < version_at + 3 or parts[version_at + 1] != parts[version_at - 1]:
+                continue
+            name, leaf = "/".join(parts[:version_at]), parts[version_at + 1]
+            field = {f"{leaf}.html": "htl_template", "_cq_dialog/.content.xml": "dialog",
+                     "README.md": "readme"}.get("/".join(parts[version_at + 2:]))
+            if field:
+                version = int(VERSION_DIR.fullmatch(parts[version_at]).group(1))
+                versions.setdefault(name, {}).setdefault(version, {})[field] = \
+                    archive.extractfile(member).read().decode("utf-8", "replace")
+
+    index = {}
+    for name, by_version in versions.items():
+        version = max((v for v, fields in by_version.items() if "htl_template" in fields), default=max(by_version))
+        fields = by_version[version]
+        leaf = name.rsplit("/", 1)[-1]
+        # Same name matching as the contents-API lookup
+        candidates = [model_path for model_path in models if leaf.lower() in model_path.rsplit("/", 1)[-1].lower()]
+        candidates.sort(key=lambda model_path: _model_rank(model_path, name))
+        index[name] = {
+            'name': name,
+            'version': f"v{version}",
+            'path': f"{COMPONENTS_ROOT}{name}",
+            'htl_template': fields.get("htl_template"),
+            'sling_model': models[candidates[0]] if candidates else None,
+            'dialog': fields.get("dialog"),
+            'clientlib': None,
+            'readme': fields.get("readme") or component_readmes.get(name)
+        }
+    return index
+
+
+@dataclass
+class _CacheEntry:
+    cached_at: datetime
+    data: Any
+
 class AEMCoreComponentsService:
     """
     Service to fetch and analyze AEM Core Components from GitHub
@@ -21,11 +127,24 @@ class AEMCoreComponentsService:
         self.repo_owner = "adobe"
         self.repo_name = "aem-core-wcm-components"
         self.base_url = f"https://api.github.com/repos/{self.repo_owner}/{self.repo_name}"
-        self.cache_dir = Path("/app/cache/aem_components")
-        self.cache_duration = timedelta(hours=6)  # Cache for 6 hours
-        
-        # Ensure cache directory exists
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir = Path(AEM_CORE_CACHE_DIR)
+        self.cache_duration = timedelta(hours=AEM_CORE_CACHE_TTL_HOURS)
+        self.max_stale = timedelta(hours=AEM_CORE_CACHE_MAX_STALE_HOURS)
+        # The cache directory is created by the first write, so importing this module touches no disk
+
+        # One long-lived session for every GitHub request, created on first use
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(GITHUB_MAX_CONCURRENCY)
+        # URL -> running request, so concurrent lookups of the same file share one round trip
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # In-memory tier over the disk cache, most recently used last
+        self._memory: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # Cache key -> running refresh, shared by every caller waiting on it
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # Archive-built index (see ingest_archive); loaded from disk on first use
+        self.index_file = Path(AEM_CORE_INDEX_FILE)
+        self._index: Optional[Dict[str, Any]] = None
+        self._index_checked = False
         
         # Component categories for better organization
         self.component_categories = {
@@ -41,59 +160,135 @@ class AEMCoreComponentsService:
         """Get cache file path for a given key"""
         return self.cache_dir / f"{cache_key}.json"
     
-    def _is_cache_valid(self, cache_file: Path) -> bool:
-        """Check if cache file exists and is not expired"""
-        if not cache_file.exists():
-            return False
-        
+    def _read_cache_file(self, cache_key: str) -> Optional[_CacheEntry]:
+        """Parse a disk cache entry once; expiry is judged by the caller"""
         try:
-            with open(cache_file, 'r') as f:
+            with open(self._get_cache_file(cache_key), 'r') as f:
                 data = json.load(f)
-                cached_time = datetime.fromisoformat(data.get('cached_at', ''))
-                return datetime.now() - cached_time < self.cache_duration
-        except (json.JSONDecodeError, ValueError, KeyError):
-            return False
-    
-    def _save_to_cache(self, cache_key: str, data: Any):
-        """Save data to cache with timestamp"""
-        cache_file = self._get_cache_file(cache_key)
+            return _CacheEntry(datetime.fromisoformat(data['cached_at']), data.get('data'))
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable cache file for {cache_key}: {e}")
+            return None
+
+    def _write_cache_file(self, cache_key: str, entry: _CacheEntry) -> None:
+        """Atomic write (readers never see a partial file), then trim the directory to its size bound"""
         cache_data = {
-            'cached_at': datetime.now().isoformat(),
-            'data': data
+            'cached_at': entry.cached_at.isoformat(),
+            'data': entry.data
         }
-        
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
+            write_if_changed(self._get_cache_file(cache_key), json.dumps(cache_data, indent=2))
+            cache_files = list(self.cache_dir.glob("*.json"))
+            if len(cache_files) > AEM_CORE_CACHE_MAX_FILES:
+                cache_files.sort(key=lambda path: path.stat().st_mtime)
+                for path in cache_files[:len(cache_files) - AEM_CORE_CACHE_MAX_FILES]:
+                    path.unlink(missing_ok=True)
         except Exception as e:
             logger.warning(f"Failed to save cache for {cache_key}: {e}")
-    
-    def _load_from_cache(self, cache_key: str) -> Optional[Any]:
-        """Load data from cache if valid"""
-        cache_file = self._get_cache_file(cache_key)
-        
-        if not self._is_cache_valid(cache_file):
-            return None
-        
+
+    def _remember(self, cache_key: str, entry: _CacheEntry) -> None:
+        self._memory[cache_key] = entry
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > AEM_CORE_CACHE_MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    async def _cached(self, cache_key: str, loader: Callable[[], Awaitable[Any]],
+                      cacheable: Callable[[Any], bool] = bool) -> Any:
+        """
+        Memory, then disk, then GitHub. A fresh entry is returned as is; an expired one (up to
+        max_stale old) is returned immediately while a background task refreshes it. Only data
+        passing cacheable is stored, so an empty answer (rate limit, outage) never replaces good data.
+        """
+        entry = self._memory.get(cache_key)
+        if entry is not None:
+            self._memory.move_to_end(cache_key)
+        else:
+            entry = await asyncio.to_thread(self._read_cache_file, cache_key)
+            if entry is not None:
+                self._remember(cache_key, entry)
+
+        if entry is not None:
+            age = datetime.now() - entry.cached_at
+            if age < self.cache_duration:
+                logger.info(f"Using cached {cache_key}")
+                return entry.data
+            if age < self.max_stale:
+                logger.info(f"Using stale cached {cache_key} while refreshing it")
+                self._refresh(cache_key, loader, cacheable)
+                return entry.data
+
+        return await asyncio.shield(self._refresh(cache_key, loader, cacheable))
+
+    def _refresh(self, cache_key: str, loader: Callable[[], Awaitable[Any]],
+                 cacheable: Callable[[Any], bool]) -> asyncio.Task:
+        task = self._refreshing.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._load_and_store(cache_key, loader, cacheable))
+            self._refreshing[cache_key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(cache_key, None))
+        return task
+
+    async def _load_and_store(self, cache_key: str, loader: Callable[[], Awaitable[Any]],
+                              cacheable: Callable[[Any], bool]) -> Any:
         try:
-            with open(cache_file, 'r') as f:
-                data = json.load(f)
-                return data.get('data')
-        except (json.JSONDecodeError, FileNotFoundError):
-            return None
+            data = await loader()
+        except Exception as e:
+            logger.error(f"Failed to refresh {cache_key}: {e}")
+            stale = self._memory.get(cache_key)
+            return stale.data if stale else None
+        if not cacheable(data):
+            # Keep serving what we had rather than an empty answer
+            stale = self._memory.get(cache_key)
+            return stale.data if stale else data
+        entry = _CacheEntry(datetime.now(), data)
+        self._remember(cache_key, entry)
+        await asyncio.to_thread(self._write_cache_file, cache_key, entry)
+        return data
+
+    def clear_cache(self) -> None:
+        """Drop both tiers"""
+        self._memory.clear()
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
     
-    async def _github_request(self, session: aiohttp.ClientSession, url: str) -> Optional[Dict]:
-        """Make authenticated GitHub API request"""
-        headers = {
-            'Accept': 'application/vnd.github.v3+json',
-            'User-Agent': 'DXP-Component-Generator'
-        }
-        
-        if self.github_token:
-            headers['Authorization'] = f'token {self.github_token}'
-        
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            headers = {
+                'Accept': 'application/vnd.github.v3+json',
+                'User-Agent': 'DXP-Component-Generator'
+            }
+            
+            if self.github_token:
+                headers['Authorization'] = f'token {self.github_token}'
+
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                connector=aiohttp.TCPConnector(limit=GITHUB_MAX_CONCURRENCY, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=GITHUB_TIMEOUT)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _github_request(self, url: str) -> Optional[Dict]:
+        """Make authenticated GitHub API request; concurrent requests for the same URL are merged"""
+        task = self._in_flight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._send_github_request(url))
+            self._in_flight[url] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        # Shielded: one caller being cancelled must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _send_github_request(self, url: str) -> Optional[Dict]:
         try:
-            async with session.get(url, headers=headers) as response:
+            async with self._semaphore, self._get_session().get(url) as response:
                 if response.status == 200:
                     return await response.json()
                 elif response.status == 403:
@@ -106,40 +301,104 @@ class AEMCoreComponentsService:
             logger.error(f"GitHub API request error: {e}")
             return None
     
+    async def _get_index(self) -> Optional[Dict[str, Any]]:
+        if not self._index_checked:
+            self._index_checked = True
+            try:
+                if self.index_file.is_file():
+                    self._index = await asyncio.to_thread(
+                        lambda: json.loads(self.index_file.read_text(encoding='utf-8')))
+                    logger.info(f"Loaded core components index ({len(self._index['components'])} components)")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable core components index {self.index_file}: {e}")
+        return self._index
+
+    async def ingest_archive(self, ref: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the local index from one repository archive: the local .tar.gz at AEM_CORE_ARCHIVE
+        or a single tarball download of ref. Later lookups read the index, not GitHub.
+        """
+        archive_path = AEM_CORE_ARCHIVE
+        ref = ref if ref is not None else AEM_CORE_ARCHIVE_REF
+        if ref and (not GIT_REF_PATTERN.fullmatch(ref) or ".." in ref):
+            raise ValueError(f"Invalid git ref: {ref!r}")
+        started = time.perf_counter()
+        if archive_path:
+            source = archive_path
+            components = await asyncio.to_thread(self._index_from_file, Path(archive_path))
+        else:
+            source = f"{self.base_url}/tarball" + (f"/{ref}" if ref else "")
+            fd, download_path = tempfile.mkstemp(prefix="aem_core_", suffix=".tar.gz")
+            os.close(fd)
+            try:
+                logger.info(f"Downloading core components archive from {source}")
+                async with self._get_session().get(
+                        source, timeout=aiohttp.ClientTimeout(total=AEM_CORE_ARCHIVE_TIMEOUT)) as response:
+                    if response.status != 200:
+                        raise RuntimeError(f"Archive download failed: HTTP {response.status}")
+                    with open(download_path, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(256 * 1024):
+                            f.write(chunk)
+                components = await asyncio.to_thread(self._index_from_file, Path(download_path))
+            finally:
+                os.unlink(download_path)
+
+        index = {
+            'ingested_at': datetime.now().isoformat(),
+            'source': source,
+            'components': components
+        }
+        await asyncio.to_thread(write_if_changed, self.index_file, json.dumps(index, separators=(',', ':')))
+        self._index, self._index_checked = index, True
+        # Entries fetched through the contents API are superseded by the index
+        self._memory.clear()
+        logger.info(f"Indexed {len(components)} core components from {source} "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return {
+            'components': len(components),
+            'source': source,
+            'ingested_at': index['ingested_at'],
+            'index_file': str(self.index_file),
+            'index_bytes': self.index_file.stat().st_size
+        }
+
+    @staticmethod
+    def _index_from_file(path: Path) -> Dict[str, Dict[str, Any]]:
+        with open(path, 'rb') as f:
+            return build_core_components_index(f)
+
     async def fetch_component_list(self) -> List[Dict]:
         """Fetch list of core components from GitHub"""
-        cache_key = "component_list"
-        cached_data = self._load_from_cache(cache_key)
-        
-        if cached_data:
-            logger.info("Using cached component list")
-            return cached_data
-        
+        index = await self._get_index()
+        if index is not None:
+            return [{'name': name, 'path': details['path'], 'url': '', 'category': self._categorize_component(name)}
+                    for name, details in sorted(index['components'].items())]
+        return await self._cached("component_list", self._fetch_component_list_from_github)
+
+    async def _fetch_component_list_from_github(self) -> List[Dict]:
         logger.info("Fetching component list from GitHub")
         
-        async with aiohttp.ClientSession() as session:
-            # Get content of the main components directory
-            url = f"{self.base_url}/contents/content/src/content/jcr_root/apps/core/wcm/components"
-            response = await self._github_request(session, url)
-            
-            if not response:
-                logger.error("Failed to fetch component list")
-                return []
-            
-            components = []
-            for item in response:
-                if item['type'] == 'dir':
-                    component_name = item['name']
-                    components.append({
-                        'name': component_name,
-                        'path': item['path'],
-                        'url': item['url'],
-                        'category': self._categorize_component(component_name)
-                    })
-            
-            self._save_to_cache(cache_key, components)
-            logger.info(f"Found {len(components)} core components")
-            return components
+        # Get content of the main components directory
+        url = f"{self.base_url}/contents/content/src/content/jcr_root/apps/core/wcm/components"
+        response = await self._github_request(url)
+        
+        if not response:
+            logger.error("Failed to fetch component list")
+            return []
+        
+        components = []
+        for item in response:
+            if item['type'] == 'dir':
+                component_name = item['name']
+                components.append({
+                    'name': component_name,
+                    'path': item['path'],
+                    'url': item['url'],
+                    'category': self._categorize_component(component_name)
+                })
+        
+        logger.info(f"Found {len(components)} core components")
+        return components
     
     def _categorize_component(self, component_name: str) -> str:
         """Categorize component based on name"""
@@ -153,57 +412,55 @@ class AEMCoreComponentsService:
     
     async def fetch_component_details(self, component_name: str) -> Optional[Dict]:
         """Fetch detailed information about a specific component"""
-        cache_key = f"component_{component_name}"
-        cached_data = self._load_from_cache(cache_key)
-        
-        if cached_data:
-            logger.info(f"Using cached data for component: {component_name}")
-            return cached_data
-        
+        index = await self._get_index()
+        if index is not None:
+            return index['components'].get(component_name)
+        return await self._cached(
+            f"component_{component_name}",
+            lambda: self._fetch_component_details_from_github(component_name),
+            # Nothing fetched (rate limit, outage) is not worth caching
+            cacheable=lambda details: any(details.get(key) for key in ('htl_template', 'sling_model', 'dialog', 'readme'))
+        )
+
+    async def _fetch_component_details_from_github(self, component_name: str) -> Dict:
         logger.info(f"Fetching details for component: {component_name}")
         
-        async with aiohttp.ClientSession() as session:
-            component_details = {
-                'name': component_name,
-                'htl_template': None,
-                'sling_model': None,
-                'dialog': None,
-                'clientlib': None,
-                'readme': None
-            }
-            
-            # Base path for the component
-            base_path = f"content/src/content/jcr_root/apps/core/wcm/components/{component_name}/v1/{component_name}"
-            
-            # Fetch HTL template
-            htl_url = f"{self.base_url}/contents/{base_path}.html"
-            htl_content = await self._fetch_file_content(session, htl_url)
-            if htl_content:
-                component_details['htl_template'] = htl_content
-            
-            # Fetch dialog configuration
-            dialog_url = f"{self.base_url}/contents/{base_path}/cq:dialog/.content.xml"
-            dialog_content = await self._fetch_file_content(session, dialog_url)
-            if dialog_content:
-                component_details['dialog'] = dialog_content
-            
-            # Try to find Sling model (Java files)
-            java_files = await self._find_java_files(session, component_name)
-            if java_files:
-                component_details['sling_model'] = java_files[0]  # Take the first/main model
-            
-            # Look for README or documentation
-            readme_url = f"{self.base_url}/contents/content/src/content/jcr_root/apps/core/wcm/components/{component_name}/README.md"
-            readme_content = await self._fetch_file_content(session, readme_url)
-            if readme_content:
-                component_details['readme'] = readme_content
-            
-            self._save_to_cache(cache_key, component_details)
-            return component_details
+        component_details = {
+            'name': component_name,
+            'htl_template': None,
+            'sling_model': None,
+            'dialog': None,
+            'clientlib': None,
+            'readme': None
+        }
+        
+        # Base path for the component
+        base_path = f"content/src/content/jcr_root/apps/core/wcm/components/{component_name}/v1/{component_name}"
+        htl_url = f"{self.base_url}/contents/{base_path}.html"
+        dialog_url = f"{self.base_url}/contents/{base_path}/cq:dialog/.content.xml"
+        readme_url = f"{self.base_url}/contents/content/src/content/jcr_root/apps/core/wcm/components/{component_name}/README.md"
+
+        # HTL template, dialog, Sling model (Java files) and README are independent: fetch them together
+        htl_content, dialog_content, java_files, readme_content = await asyncio.gather(
+            self._fetch_file_content(htl_url),
+            self._fetch_file_content(dialog_url),
+            self._find_java_files(component_name),
+            self._fetch_file_content(readme_url)
+        )
+        if htl_content:
+            component_details['htl_template'] = htl_content
+        if dialog_content:
+            component_details['dialog'] = dialog_content
+        if java_files:
+            component_details['sling_model'] = java_files[0]  # Take the first/main model
+        if readme_content:
+            component_details['readme'] = readme_content
+        
+        return component_details
     
-    async def _fetch_file_content(self, session: aiohttp.ClientSession, url: str) -> Optional[str]:
+    async def _fetch_file_content(self, url: str) -> Optional[str]:
         """Fetch content of a file from GitHub API"""
-        response = await self._github_request(session, url)
+        response = await self._github_request(url)
         
         if response and 'content' in response:
             try:
@@ -215,7 +472,7 @@ class AEMCoreComponentsService:
         
         return None
     
-    async def _find_java_files(self, session: aiohttp.ClientSession, component_name: str) -> List[str]:
+    async def _find_java_files(self, component_name: str) -> List[str]:
         """Find Java Sling model files for a component"""
         # Look in the bundles/core directory for Java files
         search_paths = [
@@ -223,20 +480,18 @@ class AEMCoreComponentsService:
             f"bundles/core/src/main/java/com/adobe/cq/wcm/core/components/models"
         ]
         
-        java_files = []
-        
-        for search_path in search_paths:
-            url = f"{self.base_url}/contents/{search_path}"
-            response = await self._github_request(session, url)
-            
+        # List the directories in one wave, then fetch every matching file in a second
+        listings = await asyncio.gather(
+            *(self._github_request(f"{self.base_url}/contents/{search_path}") for search_path in search_paths))
+        file_urls = []
+        for response in listings:
             if response and isinstance(response, list):
                 for item in response:
                     if item['name'].endswith('.java') and component_name.lower() in item['name'].lower():
-                        file_content = await self._fetch_file_content(session, item['url'])
-                        if file_content:
-                            java_files.append(file_content)
-        
-        return java_files
+                        file_urls.append(item['url'])
+
+        contents = await asyncio.gather(*(self._fetch_file_content(url) for url in dict.fromkeys(file_urls)))
+        return [content for content in contents if content]
     
     async def get_relevant_examples(self, user_description: str, component_type: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -250,10 +505,12 @@ class AEMCoreComponentsService:
         # Score components based on relevance
         relevant_components = self._score_components(user_description, components, component_type)
         
-        # Fetch details for top 3 most relevant components
+        # Fetch details for top 3 most relevant components, concurrently
+        top_components = relevant_components[:3]
+        all_details = await asyncio.gather(
+            *(self.fetch_component_details(component['name']) for component in top_components))
         examples = {}
-        for component in relevant_components[:3]:
-            details = await self.fetch_component_details(component['name'])
+        for component, details in zip(top_components, all_details):
             if details:
                 examples[component['name']] = {
                     'category': component['category'],
@@ -414,3 +671,24 @@ class AEMCoreComponentsService:
 
 # Singleton instance
 aem_core_components_service = AEMCoreComponentsService()
+
+
+async def _ingest_cli(ref: Optional[str]) -> Dict[str, Any]:
+    try:
+        return await aem_core_components_service.ingest_archive(ref)
+    finally:
+        await aem_core_components_service.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the local AEM Core Components index")
+    parser.add_argument("command", choices=["ingest"])
+    parser.add_argument("--ref", help="Branch, tag or commit to download (default AEM_CORE_ARCHIVE_REF); "
+                                      "ignored when AEM_CORE_ARCHIVE points at a local tarball")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = asyncio.run(_ingest_cli(args.ref))
+    print(f"Indexed {result['components']} components from {result['source']} into {result['index_file']}")
@@ -1,15 +1,17 @@
 import base64
+import hashlib
+import itertools
 import os
 import json
 import re
 import shutil
 import subprocess
+from functools import lru_cache
 from io import BytesIO
 from urllib.request import Request
 from datetime import datetime
-from typing import Dict, Any, Coroutine, Optional, List, cast
+from typing import Dict, Any, Coroutine, Iterator, Optional, List, Tuple, cast
 
-from openai import OpenAI
 import google.generativeai as genai
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
@@ -18,10 +20,24 @@ import asyncio
 
 import logging
 import sys
+import time
+import uuid
 
 import anthropic
 
 from ..chatStorage.chat_model import ChatStorage, ChatSession, ChatMessage, GeneratedComponent
+from ..utils.file_utils import write_if_changed
+from ..utils.helper_utils import HelperUtils
+from ..utils.llm_replay import replay_provider
+from ..utils.openai_client import get_max_tokens, get_openai_client, max_tokens_kwargs
+from ..utils.request_context import call_context, get_session_id
+from ..utils.telemetry import AEM_PIPELINE_DURATION, AEM_PIPELINE_RUNS, span, traced
+from .dialog_generator import AEM_LOCAL_DIALOG, dialog_generator
+from .export_service import archive_entries, stream_zip
+from .fast_path import classify_complexity, pipeline_stats, validate_fast_path_output
+from .idempotency import idempotency_service
+from .project_index import ProjectIndex
+from ..utils.usage_tracker import usage_tracker
 
 # Import our new storage models
 
@@ -38,6 +54,42 @@ logging.basicConfig(
 logger = logging.getLogger('app.services.component_service')
 logger.setLevel(logging.INFO)
 
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts" / "aem"
+DEFAULT_PROJECT_CODE_DIR = Path(__file__).parent.parent.parent.parent / "project_code"
+# The Messages API requires max_tokens; used when the agent has no budget of its own
+ANTHROPIC_MAX_TOKENS = int(os.getenv("ANTHROPIC_MAX_TOKENS", "4096"))
+
+
+# Checkpointed stages of the full pipeline, in execution order
+PIPELINE_STAGES = ("html", "agent1", "agent2", "agent3", "agent4")
+
+
+def generation_input_hash(user_prompt: str, image) -> str:
+    """Fingerprint of a generation's input; checkpoints only resume a retry of the same request"""
+    digest = hashlib.sha256(user_prompt.encode('utf-8'))
+    if isinstance(image, bytes):
+        digest.update(image)
+    elif isinstance(image, str):
+        digest.update(image.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_project_code_dir() -> Path:
+    """Root of the Maven project generated files are written into (PROJECT_CODE_DIR overrides)"""
+    return Path(os.getenv("PROJECT_CODE_DIR", str(DEFAULT_PROJECT_CODE_DIR)))
+
+
+@lru_cache(maxsize=None)
+def load_aem_prompt(prompt_name: str) -> str:
+    """Read an AEM system prompt once and reuse the exact same string afterwards.
+
+    Provider-side prompt caching only hits when the prefix is byte-identical, so
+    the prompt files are read a single time per process instead of on every call.
+    """
+    with open(PROMPTS_DIR / prompt_name, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
 class ComponentService:
     def __init__(self):
         # Load environment variables first
@@ -47,6 +99,11 @@ class ComponentService:
 
         # Initialize chat storage
         self.chat_storage = ChatStorage()
+        usage_tracker.bind_storage(self.chat_storage)
+        idempotency_service.bind_storage(self.chat_storage)
+
+        # Components and models already in the generated project (collision checks, prompt context)
+        self.project_index = ProjectIndex(get_project_code_dir)
 
         # Default provider; can be overridden per request/session
         self.default_provider = os.getenv("MODEL_PROVIDER", "openai").lower()
@@ -57,6 +114,9 @@ class ComponentService:
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
         self.groq_api_key = os.getenv("GROQ_API_KEY")
 
+        # Mark static system prompts for Anthropic prompt caching (OpenAI caches prefixes automatically)
+        self.anthropic_prompt_cache = os.getenv("ANTHROPIC_PROMPT_CACHE", "true").lower() == "true"
+
         # Clients (lazy init)
         self.openai_client = None
         self.gemini_configured = False
@@ -65,7 +125,8 @@ class ComponentService:
 
         if self.openai_api_key:
             try:
-                self.openai_client = OpenAI(api_key=self.openai_api_key)
+                # Shared process-wide async client, pooled with the EDS agents
+                self.openai_client = get_openai_client()
             except Exception as e:
                 logger.warning(f"Failed to init OpenAI client: {e}")
         if self.gemini_api_key:
@@ -78,14 +139,15 @@ class ComponentService:
                 logger.warning(f"Failed to configure Gemini: {e}")
         if self.anthropic_api_key:
             try:
-                self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+                # Async clients: awaiting never blocks the loop and cancelling aborts the HTTP request
+                self.anthropic_client = anthropic.AsyncAnthropic(api_key=self.anthropic_api_key)
             except Exception as e:
                 logger.warning(f"Failed to init Anthropic client: {e}")
         if self.groq_api_key:
             try:
                 # Import locally to prevent static analysis errors if SDK missing
                 import groq  # type: ignore
-                self.groq_client = groq.Groq(api_key=self.groq_api_key)
+                self.groq_client = groq.AsyncGroq(api_key=self.groq_api_key)
             except Exception as e:
                 logger.warning(f"Failed to init Groq client: {e}")
 
@@ -144,26 +206,32 @@ class ComponentService:
             logger.error(f"Raw response: {response}")
             raise ValueError(f"Failed to parse JSON response from {agent_name}: {error}")
 
-    async def call_openai_image(self, prompt: str, system_prompt: str, data_url=None, model_name: Optional[str] = None):
+    async def call_openai_image(self, prompt: str, system_prompt: str, data_url=None, model_name: Optional[str] = None,
+                                max_tokens: Optional[int] = None):
         logger.info(f"in call_openai_image with data_url")
+        # Keep the static system prompt as the first message so OpenAI's automatic
+        # prefix caching can reuse it; only the user turn and image vary per call.
         messages: List[Dict[str, Any]] = [
+            {"role": "system", "content": system_prompt},
             {
                 "role": "user",
                 "content": [
-                    {"type": "text", "text": f"{system_prompt}\n\n{prompt}"},
+                    {"type": "text", "text": prompt},
                     {"type": "image_url", "image_url": {"url": data_url}},
                 ],
             }
         ]
         if not self.openai_client:
             raise ValueError("OpenAI client not configured")
-        return self.openai_client.chat.completions.create(
+        return await self.openai_client.chat.completions.create(
             model=(model_name or "gpt-4o"),
             messages=cast(Any, messages),
-            temperature=0.7
+            temperature=0.7,
+            **max_tokens_kwargs(max_tokens)
         )
 
-    async def call_openai(self, prompt: str, system_prompt: str, model_name: Optional[str] = None):
+    async def call_openai(self, prompt: str, system_prompt: str, model_name: Optional[str] = None,
+                          max_tokens: Optional[int] = None):
         logger.info(f"in call_openai without data_url")
         messages: List[Dict[str, Any]] = [
             {"role": "system", "content": system_prompt},
@@ -171,14 +239,16 @@ class ComponentService:
         ]
         if not self.openai_client:
             raise ValueError("OpenAI client not configured")
-        return self.openai_client.chat.completions.create(
+        return await self.openai_client.chat.completions.create(
             model=(model_name or "gpt-4o"),
             messages=cast(Any, messages),
-            temperature=0.7
+            temperature=0.7,
+            **max_tokens_kwargs(max_tokens)
         )
 
     async def call_openai_with_history(self, prompt: str, system_prompt: str,
-                                       chat_history: Optional[List[ChatMessage]], model_name: Optional[str] = None, data_url=None):
+                                       chat_history: Optional[List[ChatMessage]], model_name: Optional[str] = None, data_url=None,
+                                       max_tokens: Optional[int] = None):
         """Call OpenAI with chat history for refinement"""
         logger.info(f"in call_openai_with_history")
 
@@ -215,10 +285,11 @@ class ComponentService:
 
         if not self.openai_client:
             raise ValueError("OpenAI client not configured")
-        return self.openai_client.chat.completions.create(
+        return await self.openai_client.chat.completions.create(
             model=(model_name or "gpt-4o"),
             messages=cast(Any, messages),
-            temperature=0.7
+            temperature=0.7,
+            **max_tokens_kwargs(max_tokens)
         )
 
     async def call_gemini(self, prompt: str, system_prompt: str, image_file=None, model_name: Optional[str] = None):
@@ -231,14 +302,18 @@ class ComponentService:
         if not callable(GenModel):
             raise ValueError("Gemini SDK missing GenerativeModel; please upgrade google-generativeai package")
         model = GenModel(mdl_name)
+        async_gen_fn = getattr(model, "generate_content_async", None)
+        if callable(async_gen_fn):
+            return await async_gen_fn(full_prompt)
         gen_fn = getattr(model, "generate_content", None)
         if not callable(gen_fn):
             raise ValueError("Gemini model missing generate_content; please upgrade SDK")
-        return gen_fn(full_prompt)
+        # Older SDKs are sync only; keep the blocking call off the event loop
+        return await asyncio.to_thread(gen_fn, full_prompt)
 
     async def call_anthropic(self, prompt: str, system_prompt: str = '', image: Optional[bytes] = None,
                              chat_history: Optional[List[ChatMessage]] = None,
-                             model_name: Optional[str] = None):
+                             model_name: Optional[str] = None, max_tokens: Optional[int] = None):
         if not self.anthropic_client:
             raise ValueError("Anthropic client not configured")
 
@@ -270,11 +345,21 @@ class ComponentService:
         messages.append({"role": "user", "content": content_blocks})
 
         model = model_name or os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
-        # Use NOT_GIVEN when no system prompt is provided
-        sys_param = system_prompt if system_prompt else anthropic.NOT_GIVEN
-        return self.anthropic_client.messages.create(
+        # Use NOT_GIVEN when no system prompt is provided. The agent system prompts are
+        # large and identical on every call, so mark them as a cacheable prefix.
+        if not system_prompt:
+            sys_param = anthropic.NOT_GIVEN
+        elif self.anthropic_prompt_cache:
+            sys_param = [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }]
+        else:
+            sys_param = system_prompt
+        return await self.anthropic_client.messages.create(
             model=model,
-            max_tokens=4096,
+            max_tokens=max_tokens or ANTHROPIC_MAX_TOKENS,
             system=cast(Any, sys_param),
             messages=cast(Any, messages),
             temperature=0.7,
@@ -282,7 +367,7 @@ class ComponentService:
 
     async def call_groq(self, prompt: str, system_prompt: str = '',
                          chat_history: Optional[List[ChatMessage]] = None,
-                         model_name: Optional[str] = None):
+                         model_name: Optional[str] = None, max_tokens: Optional[int] = None):
         if not self.groq_client:
             raise ValueError("Groq client not configured")
 
@@ -299,73 +384,82 @@ class ComponentService:
 
         model = model_name or os.getenv("GROQ_MODEL", "llama3-70b-8192")
         # Groq uses an OpenAI-compatible chat.completions API
-        return self.groq_client.chat.completions.create(
+        return await self.groq_client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=0.7,
+            **max_tokens_kwargs(max_tokens),
         )
 
+    def _default_model(self, provider: str) -> str:
+        """Model used by a provider when the caller does not pick one"""
+        if provider == "gemini":
+            return os.getenv("GEMINI_MODEL", "gemini-pro")
+        if provider in ("anthropic", "claude"):
+            return os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
+        if provider in ("llama", "groq"):
+            return os.getenv("GROQ_MODEL", "llama3-70b-8192")
+        return "gpt-4o"
+
     async def call_llm(self, prompt: str, system_prompt: str = '', image: Optional[bytes] = None,
                        chat_history: Optional[List[ChatMessage]] = None,
-                       provider: Optional[str] = None, model_name: Optional[str] = None):
+                       provider: Optional[str] = None, model_name: Optional[str] = None,
+                       agent_name: str = "llm"):
         """Enhanced LLM call with optional chat history"""
+        provider = (provider or self.default_provider).lower()
+        max_tokens = get_max_tokens(agent_name)
+        started = time.perf_counter()
         try:
-            provider = (provider or self.default_provider).lower()
-            if provider == "openai":
-                if image:
-                    base64_image = base64.b64encode(image).decode("utf-8")
-                    image_url = f"data:image/png;base64,{base64_image}"
-                    logger.info(f"image_url: {image_url[:50]}")
-                    return await self.call_openai_image(prompt, system_prompt, image_url, model_name)
-                else:
-                    if chat_history:
-                        return await self.call_openai_with_history(prompt, system_prompt, chat_history, model_name)
+            with span(f"llm.{agent_name}", provider=provider, model=model_name or self._default_model(provider)):
+                if replay_provider.replaying:
+                    # Offline mode: serve recorded responses instead of calling any provider
+                    provider = "replay"
+                    response = await replay_provider.complete(agent_name, system_prompt, prompt)
+                elif provider == "openai":
+                    if image:
+                        base64_image = base64.b64encode(image).decode("utf-8")
+                        image_url = f"data:image/png;base64,{base64_image}"
+                        logger.info(f"image_url: {image_url[:50]}")
+                        response = await self.call_openai_image(prompt, system_prompt, image_url, model_name, max_tokens)
                     else:
-                        return await self.call_openai(prompt, system_prompt, model_name)
-            elif provider == "gemini":
-                return await self.call_gemini(prompt, system_prompt, None, model_name)
-            elif provider in ("anthropic", "claude"):
-                return await self.call_anthropic(prompt, system_prompt, image, chat_history, model_name)
-            elif provider in ("llama", "groq"):
-                if image is not None:
-                    raise NotImplementedError("Llama via Groq does not support images in this build")
-                return await self.call_groq(prompt, system_prompt, chat_history, model_name)
-            else:
-                raise ValueError(f"Unsupported provider: {provider}")
+                        if chat_history:
+                            response = await self.call_openai_with_history(prompt, system_prompt, chat_history, model_name,
+                                                                          max_tokens=max_tokens)
+                        else:
+                            response = await self.call_openai(prompt, system_prompt, model_name, max_tokens)
+                elif provider == "gemini":
+                    response = await self.call_gemini(prompt, system_prompt, None, model_name)
+                elif provider in ("anthropic", "claude"):
+                    response = await self.call_anthropic(prompt, system_prompt, image, chat_history, model_name, max_tokens)
+                elif provider in ("llama", "groq"):
+                    if image is not None:
+                        raise NotImplementedError("Llama via Groq does not support images in this build")
+                    response = await self.call_groq(prompt, system_prompt, chat_history, model_name, max_tokens)
+                else:
+                    raise ValueError(f"Unsupported provider: {provider}")
+
+            if replay_provider.recording:
+                replay_provider.record(agent_name, system_prompt, prompt, response)
+
+            usage_tracker.record(response, agent_name, provider, model_name or self._default_model(provider),
+                                 (time.perf_counter() - started) * 1000)
+            return response
+        except asyncio.CancelledError:
+            logger.info(f"LLM call for {agent_name} cancelled")
+            usage_tracker.record(None, agent_name, provider, model_name or self._default_model(provider),
+                                 (time.perf_counter() - started) * 1000, success=False)
+            raise
         except Exception as e:
             logger.error(f"Error calling LLM: {str(e)}")
+            usage_tracker.record(None, agent_name, provider, model_name or self._default_model(provider),
+                                 (time.perf_counter() - started) * 1000, success=False)
             raise e
 
     def extract_and_format_response(self, response_obj, require_html_code=False):
         """Extract JSON from provider responses and validate when needed."""
         try:
             # Coerce text content from various provider response shapes
-            content = None
-            try:
-                # OpenAI/Groq
-                if hasattr(response_obj, 'choices'):
-                    content = response_obj.choices[0].message.content
-                # Gemini
-                elif hasattr(response_obj, 'text'):
-                    content = response_obj.text  # google-generativeai response
-                # Anthropic messages
-                elif hasattr(response_obj, 'content') and isinstance(response_obj.content, list):
-                    blocks = []
-                    for block in response_obj.content:
-                        if isinstance(block, dict):
-                            if block.get('type') == 'text' and 'text' in block:
-                                blocks.append(block['text'])
-                        else:
-                            # SDK models may provide objects with .type/.text
-                            t = getattr(block, 'type', None)
-                            txt = getattr(block, 'text', None)
-                            if t == 'text' and txt:
-                                blocks.append(txt)
-                    content = "\n".join(blocks) if blocks else str(response_obj)
-                else:
-                    content = str(response_obj)
-            except Exception:
-                content = str(response_obj)
+            content = HelperUtils.extract_text(response_obj)
 
             logger.debug(f"in extract_and_format_response fetched content :: {content[:500]}")
 
@@ -391,91 +485,113 @@ class ComponentService:
         except Exception as e:
             raise ValueError(f"Error processing response: {e}")
 
+    @traced("agent.image_agent")
     async def image_agent_generate_html(self, user_prompt: str, image, chat_history: Optional[List[ChatMessage]] = None) -> Dict[str, Any]:
-        prompt_file = Path(__file__).parent.parent / "prompts" / "aem" / "image_prompt.txt"
-        with open(prompt_file, 'r') as f:
-            system_prompt = f.read()
+        system_prompt = load_aem_prompt("image_prompt.txt")
 
         prompt = f"""USER REQUIREMENT: {user_prompt}
         Analyze this UI and generate the code."""
 
         logger.info("Sending image bytes to llm")
-        response = await self.call_llm(prompt, system_prompt, image, chat_history)
+        response = await self.call_llm(prompt, system_prompt, image, chat_history, agent_name="image_agent")
         logger.debug("in image_agent_generate_html calling extract html method")
         response = self.extract_and_format_response(response, require_html_code=True)
         logger.debug(f"in image_agent_generate_html fetching response :: {response}")
         return response['data'] if 'data' in response else response
 
+    @traced("agent.text_agent")
     async def text_agent_generate_html(self, user_prompt: str, chat_history: Optional[List[ChatMessage]] = None) -> Dict[str, Any]:
         """Generate HTML/CSS from text requirements when no image is provided."""
-        prompt_file = Path(__file__).parent.parent / "prompts" / "aem" / "text_prompt.txt"
-        with open(prompt_file, 'r') as f:
-            system_prompt = f.read()
+        system_prompt = load_aem_prompt("text_prompt.txt")
 
         prompt = f"""USER REQUIREMENT: {user_prompt}
         Generate clean, accessible, responsive HTML and CSS. Return JSON with keys htmlCode and cssCode as specified."""
 
         logger.info("Generating HTML/CSS from text requirements")
-        response = await self.call_llm(prompt, system_prompt, None, chat_history)
+        response = await self.call_llm(prompt, system_prompt, None, chat_history, agent_name="text_agent")
         response = self.extract_and_format_response(response, require_html_code=True)
         return response['data'] if 'data' in response else response
 
-    async def agent1_requirements_and_sling_model(self, user_prompt: str, chat_history: Optional[List[ChatMessage]] = None) -> Dict[str, Any]:
-        prompt_file = Path(__file__).parent.parent / "prompts" / "aem" / "agent_1.txt"
-        with open(prompt_file, 'r') as f:
-            system_prompt = f.read()
+    @traced("agent.agent1_sling_model")
+    async def agent1_requirements_and_sling_model(self, user_prompt: str, chat_history: Optional[List[ChatMessage]] = None,
+                                                  project_context: str = "") -> Dict[str, Any]:
+        system_prompt = load_aem_prompt("agent_1.txt")
 
         prompt = f"""USER REQUIREMENT: {user_prompt}
         Generate the complete analysis and Sling Model as specified."""
+        if project_context:
+            prompt += f"\n\nEXISTING PROJECT (pick new component and model names; follow existing conventions):\n{project_context}"
 
-        response = await self.call_llm(prompt, system_prompt, None, chat_history)
+        response = await self.call_llm(prompt, system_prompt, None, chat_history, agent_name="agent1_sling_model")
         logger.debug(f"in agent1_requirements_and_sling_model fetching response :: {response}")
         response = self.extract_and_format_response(response, require_html_code=False)
         logger.debug(f"in agent1_requirements_and_sling_model fetching response after extraction :: {response}")
         return response['data'] if 'data' in response else response
 
+    @traced("agent.agent2_htl")
     async def agent2_htl_generator(self, shared_context: Dict[str, Any], sling_model: str, chat_history: Optional[List[ChatMessage]] = None) -> Dict[str, Any]:
-        prompt_file = Path(__file__).parent.parent / "prompts" / "aem" /  "agent_2.txt"
-        with open(prompt_file, 'r') as f:
-            system_prompt = f.read()
+        system_prompt = load_aem_prompt("agent_2.txt")
 
         prompt = f"""SHARED CONTEXT: {json.dumps(shared_context, indent=2)}
         SLING MODEL REFERENCE: {sling_model}
         Generate the complete HTL template as specified.
         Given an AI agent has analyzed the design and provided the html and css code, generate the HTL template for the AEM component."""
 
-        response = await self.call_llm(prompt, system_prompt, None, chat_history)
+        response = await self.call_llm(prompt, system_prompt, None, chat_history, agent_name="agent2_htl")
         response = self.extract_and_format_response(response, require_html_code=False)
         return response['data'] if 'data' in response else response
 
+    @traced("agent.agent3_dialog")
     async def agent3_dialog_generator(self, shared_context: Dict[str, Any], sling_model: str, chat_history: Optional[List[ChatMessage]] = None) -> Dict[str, Any]:
-        prompt_file = Path(__file__).parent.parent / "prompts" / "aem" / "agent_3.txt"
-        with open(prompt_file, 'r') as f:
-            system_prompt = f.read()
+        system_prompt = load_aem_prompt("agent_3.txt")
 
         prompt = f"""SHARED CONTEXT: {json.dumps(shared_context, indent=2)}
         SLING MODEL REFERENCE: {sling_model}
         Generate the complete dialog configuration as specified."""
 
-        response = await self.call_llm(prompt, system_prompt, None, chat_history)
+        response = await self.call_llm(prompt, system_prompt, None, chat_history, agent_name="agent3_dialog")
         response = self.extract_and_format_response(response, require_html_code=False)
         return response['data'] if 'data' in response else response
 
+    @traced("agent.agent4_clientlib")
     async def agent4_client_lib_generator(self, shared_context: Dict[str, Any], htl: str, chat_history: Optional[List[ChatMessage]] = None) -> Dict[str, Any]:
-        prompt_file = Path(__file__).parent.parent / "prompts" / "aem" / "agent_4.txt"
-        with open(prompt_file, 'r') as f:
-            system_prompt = f.read()
+        system_prompt = load_aem_prompt("agent_4.txt")
 
         prompt = f"""SHARED CONTEXT: {json.dumps(shared_context, indent=2)}
         HTL REFERENCE: {htl}
         Generate the complete client library structure as specified."""
 
-        response = await self.call_llm(prompt, system_prompt, None, chat_history)
+        response = await self.call_llm(prompt, system_prompt, None, chat_history, agent_name="agent4_clientlib")
         response = self.extract_and_format_response(response, require_html_code=False)
         return response['data'] if 'data' in response else response
 
-    async def generate_aem_component(self, user_prompt: str, image, session_id: Optional[str] = None) -> Dict[str, Any]:
-        """Main orchestrator method with chat history support"""
+    @traced("agent.fast_path")
+    async def fast_path_generate(self, user_prompt: str, chat_history: Optional[List[ChatMessage]] = None,
+                                 project_context: str = "") -> Optional[Dict[str, Any]]:
+        """Generate all component files in a single call; None when the response fails schema validation"""
+        system_prompt = load_aem_prompt("fast_path.txt")
+
+        prompt = f"""USER REQUIREMENT: {user_prompt}
+        Generate the complete component as specified."""
+        if project_context:
+            prompt += f"\n\nEXISTING PROJECT (pick new component and model names; follow existing conventions):\n{project_context}"
+
+        try:
+            response = await self.call_llm(prompt, system_prompt, None, chat_history, agent_name="fast_path")
+            response = self.extract_and_format_response(response, require_html_code=False)
+        except Exception as e:
+            logger.warning(f"Fast path generation failed: {e}")
+            return None
+        return validate_fast_path_output(response['data'] if 'data' in response else response)
+
+    @traced("generate_aem_component")
+    async def generate_aem_component(self, user_prompt: str, image, session_id: Optional[str] = None,
+                                     generation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Main orchestrator with chat history support. Simple requests try the single-call fast
+        path first and fall back to the five-agent pipeline when its output is rejected.
+        With a generation_id, stages checkpointed by an earlier failed attempt are reused.
+        """
         logger.info('Starting AEM Component Generation...')
 
         # Get chat history if session_id is provided
@@ -485,63 +601,130 @@ class ComponentService:
             if session:
                 chat_history = session.messages
 
+        input_hash = generation_input_hash(user_prompt, image)
+        checkpoints = self.chat_storage.get_checkpoints(generation_id, input_hash) if generation_id else {}
+
+        complexity, reason = classify_complexity(user_prompt, has_image=bool(image))
+        logger.info(f'Request classified as {complexity} ({reason})')
+        started = time.perf_counter()
+        project_context = await asyncio.to_thread(self.get_project_context, user_prompt)
+
+        final_result = None
+        pipeline = "full"
+        # A retry with checkpoints always resumes the full pipeline it started
+        if complexity == "simple" and not checkpoints:
+            final_result = await self.fast_path_generate(user_prompt, chat_history, project_context)
+            pipeline = "fast" if final_result else "fast_fallback"
+        if final_result is None:
+            final_result = await self._run_full_pipeline(user_prompt, image, chat_history,
+                                                         generation_id, input_hash, checkpoints, project_context)
+
+        dialog_source = final_result.pop('dialogSource', pipeline)
+        duration_ms = (time.perf_counter() - started) * 1000
+        AEM_PIPELINE_RUNS.labels(pipeline).inc()
+        AEM_PIPELINE_DURATION.labels(pipeline).observe(duration_ms / 1000)
+        pipeline_stats.observe(pipeline, duration_ms)
+        final_result['generationMetadata'] = {
+            'pipeline': pipeline,
+            'complexity': complexity,
+            'complexity_reason': reason,
+            'dialog_source': dialog_source,
+            'duration_ms': round(duration_ms, 2),
+            'estimated_savings_ms': pipeline_stats.estimated_savings_ms(duration_ms) if pipeline == "fast" else None,
+            'generation_id': generation_id,
+            'resumed_stages': [stage for stage in PIPELINE_STAGES if stage in checkpoints]
+        }
+        logger.info(f'AEM Component Generation finished via {pipeline} pipeline in {duration_ms:.0f} ms')
+        return final_result
+
+    async def _run_full_pipeline(self, user_prompt: str, image, chat_history: List[ChatMessage],
+                                 generation_id: Optional[str] = None, input_hash: str = "",
+                                 checkpoints: Optional[Dict[str, Any]] = None,
+                                 project_context: str = "") -> Dict[str, Any]:
+        """
+        Image/text agent followed by agents 1-4. Each validated stage output is checkpointed
+        under the generation id, so a retry only runs the stages that did not succeed.
+        """
+        checkpoints = checkpoints or {}
+
+        async def stage(name: str, run, required_keys=()) -> Dict[str, Any]:
+            if name in checkpoints:
+                logger.info(f'Stage {name}: resumed from checkpoint of generation {generation_id}')
+                return checkpoints[name]
+            result = await run()
+            if not isinstance(result, dict) or any(key not in result for key in required_keys):
+                raise ValueError(f'Stage {name} failed to generate required outputs')
+            if generation_id:
+                self.chat_storage.save_checkpoint(generation_id, name, input_hash, result, get_session_id())
+            return result
+
         try:
-            logger.info('Starting AEM Component Generation...')
-            image_gen_result = None
             if image:
-                image_gen_result = await self.image_agent_generate_html(user_prompt, image, chat_history)
+                image_gen_result = await stage(
+                    "html", lambda: self.image_agent_generate_html(user_prompt, image, chat_history))
                 logger.debug(f"Image generation result: {image_gen_result}")
             else:
                 # Generate HTML/CSS from text if no image is provided
-                image_gen_result = await self.text_agent_generate_html(user_prompt, chat_history)
+                image_gen_result = await stage(
+                    "html", lambda: self.text_agent_generate_html(user_prompt, chat_history))
                 logger.debug(f"Text-based HTML/CSS generation result: {image_gen_result}")
 
             # Agent 1: Requirements Analysis & Sling Model
             logger.info('Agent 1: Analyzing requirements and generating Sling Model...')
-            agent1_result = await self.agent1_requirements_and_sling_model(user_prompt, chat_history)
+            agent1_result = await stage(
+                "agent1", lambda: self.agent1_requirements_and_sling_model(user_prompt, chat_history, project_context),
+                ('sharedContext', 'slingModel'))
             logger.debug(f'Agent 1: fetching agent1_result{agent1_result}')
 
-            if 'sharedContext' not in agent1_result or 'slingModel' not in agent1_result:
-                raise ValueError('Agent 1 failed to generate required outputs')
-
             # If image was provided, merge its results into shared context
             if image_gen_result:
                 agent1_result['sharedContext'].update(image_gen_result)
 
             shared_content = agent1_result['sharedContext']
-
-            # Agents 2 & 3: Can run in parallel
+            sling_model = agent1_result['slingModel']
+
+            async def render_dialog() -> Dict[str, Any]:
+                # The dialog is a mechanical function of the Sling Model fields; render it locally when
+                # every field maps to a known widget and only fall back to agent 3 otherwise
+                if AEM_LOCAL_DIALOG:
+                    with span("dialog.template"):
+                        rendered = dialog_generator.generate(shared_content, sling_model)
+                    if rendered:
+                        return {**rendered, 'source': 'template'}
+                generated = await self.agent3_dialog_generator(shared_content, sling_model, chat_history)
+                return {**generated, 'source': 'llm'} if isinstance(generated, dict) else generated
+
+            # Agents 2 & 3: Can run in parallel. Both are awaited before raising so the one
+            # that succeeded is checkpointed even when the other fails.
             logger.info('Agent 2 & 3: Generating HTL and Dialog in parallel....')
-            agent2_task = self.agent2_htl_generator(agent1_result['sharedContext'], agent1_result['slingModel'], chat_history)
-            agent3_task = self.agent3_dialog_generator(agent1_result['sharedContext'], agent1_result['slingModel'], chat_history)
-
-            agent2_result, agent3_result = await asyncio.gather(agent2_task, agent3_task)
+            agent2_result, agent3_result = await asyncio.gather(
+                stage("agent2", lambda: self.agent2_htl_generator(shared_content, sling_model, chat_history), ('htl',)),
+                stage("agent3", render_dialog, ('dialog', '.content.xml')),
+                return_exceptions=True
+            )
+            for result in (agent2_result, agent3_result):
+                if isinstance(result, BaseException):
+                    raise result
 
             logger.debug(f'Agent 3: fetching agent3_result{agent3_result}')
 
-            if 'htl' not in agent2_result or 'dialog' not in agent3_result:
-                raise ValueError('Agent 2 or 3 failed to generate required outputs')
-
             # Agent 4: Client Library (needs HTL from Agent 2)
             logger.info('Agent 4: Generating Client Library...')
-            agent4_result = await self.agent4_client_lib_generator(
-                agent1_result['sharedContext'],
-                agent2_result['htl'],
-                chat_history
-            )
-
-            if 'clientLib' not in agent4_result:
-                raise ValueError('Agent 4 failed to generate required outputs')
+            agent4_result = await stage(
+                "agent4",
+                lambda: self.agent4_client_lib_generator(shared_content, agent2_result['htl'], chat_history),
+                ('clientLib',))
 
             # Combine final results
             final_result = {
                 'htl': agent2_result['htl'],
-                'slingModel': agent1_result['slingModel'],
+                'slingModel': sling_model,
                 'dialog': agent3_result['dialog'],
                 'content_xml': agent3_result['.content.xml'],
                 'clientLib': agent4_result['clientLib'],
                 'slingModelName': shared_content['slingModelName'],
-                'componentName': shared_content['componentName']
+                'componentName': shared_content['componentName'],
+                'dialogSource': agent3_result.get('source', 'llm')
             }
 
             logger.info('AEM Component Generation completed successfully!')
@@ -551,10 +734,26 @@ class ComponentService:
             logger.error(f'AEM Component Generation failed: {error}')
             raise error
 
+    def _record_cancellation(self, session_id: str, generation_id: Optional[str] = None, resumable: bool = False):
+        """Note a generation abandoned by its client; checkpoints are kept only if the client can resume them"""
+        logger.info(f"Generation cancelled in session {session_id}: client disconnected")
+        self.add_message_to_session(session_id, "ai", "Generation cancelled: the request was closed before it finished.",
+                                    None, {'action': 'cancelled', 'generation_id': generation_id})
+        if generation_id and not resumable:
+            self.chat_storage.delete_checkpoints(generation_id)
+
+    @traced("generate_component")
     async def generate_component(self, prompt: str, image,
-                                 session_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
-        """Enhanced generate_component with chat history support (removed app_id/package)"""
+                                 session_id: Optional[str] = None, user_id: Optional[str] = None,
+                                 generation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Enhanced generate_component with chat history support (removed app_id/package).
+        Passing the generation_id of a failed attempt resumes it from its checkpoints.
+        """
         logger.info(f"In ComponentService generate_component :: {prompt}")
+        # Only a caller that supplied the id can resume from checkpoints after a disconnect
+        resumable = generation_id is not None
+        generation_id = generation_id or uuid.uuid4().hex
 
         # Create or get session
         if not session_id:
@@ -573,7 +772,8 @@ class ComponentService:
         self.add_message_to_session(session_id, "user", prompt, image_data)
 
         try:
-            component_data = await self.generate_aem_component(prompt, image, session_id)
+            with call_context(session_id, user_id):
+                component_data = await self.generate_aem_component(prompt, image, session_id, generation_id)
 
             logger.debug(f"In ComponentService ai_output :: {component_data}")
 
@@ -589,6 +789,7 @@ class ComponentService:
 
             # Generate sanitized component name
             sanitized_component_name = re.sub(r'[^a-z0-9]', '', component_data['componentName'].lower().replace(' ', ''))
+            renamed_model = await asyncio.to_thread(self._resolve_model_conflict, component_data, sanitized_component_name)
 
             # Handle dialog data - check if it's the new structure or old structure
             dialog_content = component_data['dialog']
@@ -613,7 +814,9 @@ class ComponentService:
                 content_xml=component_data['content_xml'],
                 client_lib=component_data['clientLib'],
                 generation_metadata={
-                    'sanitized_name': sanitized_component_name
+                    'sanitized_name': sanitized_component_name,
+                    'renamed_model_from': renamed_model,
+                    **component_data.get('generationMetadata', {})
                 }
             )
 
@@ -629,13 +832,14 @@ class ComponentService:
 
             # Create actual files in the output directory
             # Use default values for app_id and package since they're handled in prompts
-            output_dirs = self._create_component_files(
+            output_dirs, file_manifest = await self._create_component_files(
                 component_data,
                 "myapp",  # Default app_id - can be made configurable
                 "com.mycompany.myapp",  # Default package - can be made configurable
                 sanitized_component_name,
                 component_data['slingModelName']
             )
+            self.chat_storage.delete_checkpoints(generation_id)
 
             return {
                 "success": True,
@@ -643,10 +847,14 @@ class ComponentService:
                 "session_id": session_id,
                 "component_id": generated_component.component_id,
                 "outputDirs": output_dirs,
+                "fileManifest": file_manifest,
                 "structure": self._create_folder_structure("myapp", sanitized_component_name),  # Use default
                 "aiOutput": component_data
             }
 
+        except asyncio.CancelledError:
+            self._record_cancellation(session_id, generation_id, resumable)
+            raise
         except Exception as e:
             # Add error message to session
             error_message = f"Failed to generate component: {str(e)}"
@@ -657,13 +865,17 @@ class ComponentService:
                 "success": False,
                 "error": "Component generation failed.",
                 "details": str(e),
-                "session_id": session_id
+                "session_id": session_id,
+                "generation_id": generation_id
             }
 
+    @traced("refine_component")
     async def refine_component(self, session_id: str, component_id: str, refinement_prompt: str,
-                               user_id: Optional[str] = None) -> Dict[str, Any]:
+                               user_id: Optional[str] = None, generation_id: Optional[str] = None) -> Dict[str, Any]:
         """Refine an existing component based on user feedback"""
         logger.info(f"Refining component {component_id} in session {session_id}")
+        resumable = generation_id is not None
+        generation_id = generation_id or uuid.uuid4().hex
 
         # Get the session and component
         session = self.get_chat_session(session_id)
@@ -705,7 +917,8 @@ class ComponentService:
             """
 
             # Generate refined component
-            refined_data = await self.generate_aem_component(refinement_context, None, session_id)
+            with call_context(session_id, user_id or session.user_id):
+                refined_data = await self.generate_aem_component(refinement_context, None, session_id, generation_id)
 
             # Handle dialog data - check if it's the new structure or old structure
             dialog_content = refined_data['dialog']
@@ -720,6 +933,9 @@ class ComponentService:
                 # Old structure: dialog is a string
                 dialog_code = dialog_content
 
+            refined_name = re.sub(r'[^a-z0-9]', '', refined_data.get('componentName', component.component_name).lower().replace(' ', ''))
+            renamed_model = await asyncio.to_thread(self._resolve_model_conflict, refined_data, refined_name)
+
             # Create new refined component
             refined_component = GeneratedComponent(
                 component_name=refined_data.get('componentName', component.component_name),
@@ -732,7 +948,9 @@ class ComponentService:
                 generation_metadata={
                     'action': 'refinement',
                     'original_component_id': component_id,
-                    'refinement_prompt': refinement_prompt
+                    'refinement_prompt': refinement_prompt,
+                    'renamed_model_from': renamed_model,
+                    **refined_data.get('generationMetadata', {})
                 }
             )
 
@@ -751,13 +969,14 @@ class ComponentService:
 
             # Create files for refined component
             session_metadata = session.dict()
-            output_dirs = self._create_component_files(
+            output_dirs, file_manifest = await self._create_component_files(
                 refined_data,
                 session_metadata.get('app_id', 'myapp'),
                 session_metadata.get('package', 'com.mycompany.myapp'),
                 sanitized_name,
                 refined_component.sling_model_name
             )
+            self.chat_storage.delete_checkpoints(generation_id)
 
             return {
                 "success": True,
@@ -766,9 +985,13 @@ class ComponentService:
                 "component_id": refined_component.component_id,
                 "original_component_id": component_id,
                 "outputDirs": output_dirs,
+                "fileManifest": file_manifest,
                 "aiOutput": refined_data
             }
 
+        except asyncio.CancelledError:
+            self._record_cancellation(session_id, generation_id, resumable)
+            raise
         except Exception as e:
             error_message = f"Failed to refine component: {str(e)}"
             self.add_message_to_session(session_id, "ai", error_message)
@@ -778,9 +1001,24 @@ class ComponentService:
                 "success": False,
                 "error": "Component refinement failed.",
                 "details": str(e),
-                "session_id": session_id
+                "session_id": session_id,
+                "generation_id": generation_id
             }
 
+    def get_session_usage(self, session_id: str) -> Dict[str, Any]:
+        """Get per-call LLM usage records and per-agent totals for a session"""
+        records = self.chat_storage.get_usage_records(session_id)
+        return {
+            'records': [record.model_dump(mode='json') for record in records],
+            'by_agent': self.chat_storage.aggregate_usage('agent_name', session_id=session_id)
+        }
+
+    def get_usage_summary(self, group_by: str = 'agent_name', user_id: Optional[str] = None,
+                          session_id: Optional[str] = None, since: Optional[datetime] = None,
+                          limit: int = 50) -> List[Dict[str, Any]]:
+        """Aggregate LLM usage across calls"""
+        return self.chat_storage.aggregate_usage(group_by, user_id, session_id, since, limit)
+
     def get_session_components(self, session_id: str) -> List[Dict[str, Any]]:
         """Get all components from a session"""
         session = self.get_chat_session(session_id)
@@ -799,14 +1037,40 @@ class ComponentService:
 
         return components
 
-    def _create_component_files(self, component_data: Dict, app_id: str, package: str, component_name: str, slingModelName: str) -> Dict[str, str]:
-        """Create actual files in the filesystem similar to JavaScript version"""
-
-        # Prepare sanitized names and paths
-        pkg_path = package.replace(".", "/")
-
-        # Define output paths aligned with Maven archetype structure
-        base_output_dir = Path(__file__).parent.parent.parent.parent / "project_code"
+    def get_project_context(self, user_prompt: str) -> str:
+        """Summary of existing project components/models relevant to a request (blocking; run in a thread)"""
+        try:
+            self.project_index.ensure_fresh()
+            return self.project_index.prompt_context(user_prompt)
+        except Exception as e:
+            logger.warning(f"Project index unavailable: {e}")
+            return ""
+
+    def _resolve_model_conflict(self, component_data: Dict[str, Any], component_name: str) -> Optional[str]:
+        """
+        Rename the generated Sling Model when its name belongs to another component's model,
+        so writing it cannot overwrite that model. Returns the original name when renamed.
+        """
+        model_name = component_data.get('slingModelName')
+        if not model_name:
+            return None
+        self.project_index.ensure_fresh()
+        conflict = self.project_index.model_conflict(model_name, component_name)
+        if not conflict:
+            return None
+        new_name = self.project_index.free_model_name(model_name)
+        logger.warning(f"{conflict}; renaming the generated model to {new_name}")
+        pattern = re.compile(rf'\b{re.escape(model_name)}\b')
+        component_data['slingModelName'] = new_name
+        component_data['slingModel'] = pattern.sub(new_name, component_data['slingModel'])
+        if isinstance(component_data.get('htl'), str):
+            component_data['htl'] = pattern.sub(new_name, component_data['htl'])
+        return model_name
+
+    def _component_file_entries(self, component_data: Dict, component_name: str,
+                                slingModelName: str) -> List[Tuple[Path, str]]:
+        """(target path, processed content) of every file a component consists of, aligned with the Maven archetype"""
+        base_output_dir = get_project_code_dir()
 
         sling_model_dir = base_output_dir / "core/src/main/java/com/adobe/aem/guides/wknd/core/models"
 
@@ -820,14 +1084,6 @@ class ComponentService:
         ui_apps_clientlib_js_dir = ui_apps_clientlib_dir / "js"
         ui_apps_clientlib_css_dir = ui_apps_clientlib_dir / "css"
 
-        # Ensure all directories exist
-        base_output_dir.mkdir(parents=True, exist_ok=True)
-        sling_model_dir.mkdir(parents=True, exist_ok=True)
-        ui_apps_dir.mkdir(parents=True, exist_ok=True)
-        ui_apps_clientlib_dir.mkdir(parents=True, exist_ok=True)
-        ui_apps_clientlib_js_dir.mkdir(parents=True, exist_ok=True)
-        ui_apps_clientlib_css_dir.mkdir(parents=True, exist_ok=True)
-
         # Enhanced helper function to process content and clean up formatting
         def process_file_content(content: str) -> str:
             """Convert escaped newlines and other escape sequences to actual characters, and clean up formatting"""
@@ -840,7 +1096,6 @@ class ComponentService:
                 content = content.replace('\\\\', '\\')
                 
                 # Clean up multiple consecutive newlines (preserve intentional spacing but remove excessive)
-                import re
                 # Replace 3+ consecutive newlines with just 2 (one blank line)
                 content = re.sub(r'\n{3,}', '\n\n', content)
                 
@@ -854,20 +1109,6 @@ class ComponentService:
                 
             return content
 
-        # Write Sling Model Java class directly from AI output
-        java_file_path = sling_model_dir / f"{slingModelName}.java"
-        with open(java_file_path, 'w', encoding='utf-8') as f:
-            f.write(process_file_content(component_data['slingModel']))
-
-        # Write .content.xml file directly from AI output
-        content_xml_file_path = ui_apps_dir / f".content.xml"
-        with open(content_xml_file_path, 'w', encoding='utf-8') as f:
-            f.write(process_file_content(component_data['content_xml']))
-
-        htl_file_path = ui_apps_dir / f"{component_name}.html"
-        with open(htl_file_path, 'w', encoding='utf-8') as f:
-            f.write(process_file_content(component_data['htl']))
-
         # Handle dialog data - check if it's the new structure or old structure
         dialog_content = component_data['dialog']
         if isinstance(dialog_content, dict):
@@ -881,9 +1122,13 @@ class ComponentService:
             # Old structure: dialog is a string
             dialog_code = dialog_content
 
-        dialog_file_path = ui_apps_dir / "_cq_dialog.xml"
-        with open(dialog_file_path, 'w', encoding='utf-8') as f:
-            f.write(process_file_content(dialog_code))
+        entries = [
+            # Sling Model Java class, .content.xml, HTL and dialog directly from AI output
+            (sling_model_dir / f"{slingModelName}.java", process_file_content(component_data['slingModel'])),
+            (ui_apps_dir / ".content.xml", process_file_content(component_data['content_xml'])),
+            (ui_apps_dir / f"{component_name}.html", process_file_content(component_data['htl'])),
+            (ui_apps_dir / "_cq_dialog.xml", process_file_content(dialog_code)),
+        ]
 
         # Handle clientlib files with consistent format
         if 'clientLib' in component_data:
@@ -902,10 +1147,7 @@ class ComponentService:
                     logger.warning(f"Unexpected file data format for {file_path}: {file_data}")
                     continue
 
-                # Process content to convert escaped characters
-                content = process_file_content(content)
-
-                # Determine target directory and write file
+                # Determine target directory
                 if file_path == 'js.txt':
                     target_path = ui_apps_clientlib_dir / "js.txt"
                 elif file_path == 'css.txt':
@@ -926,17 +1168,77 @@ class ComponentService:
                     logger.warning(f"Unknown file type: {file_path}")
                     continue
 
-                # Write the file
-                with open(target_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                logger.info(f"Created file: {target_path}")
+                # Process content to convert escaped characters
+                entries.append((target_path, process_file_content(content)))
+
+        return entries
+
+    @traced("create_component_files")
+    async def _create_component_files(self, component_data: Dict, app_id: str, package: str, component_name: str,
+                                      slingModelName: str) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+        """
+        Write the component into the project; returns the output dirs and a manifest of every file
+        with its sha256 and whether it was written or already up to date. Files are replaced
+        atomically and the disk I/O runs in a worker thread.
+        """
+        base_output_dir = get_project_code_dir()
+        entries = self._component_file_entries(component_data, component_name, slingModelName)
+
+        def write_all() -> List[Dict[str, str]]:
+            manifest = []
+            for target_path, content in entries:
+                sha256, written = write_if_changed(target_path, content)
+                if written:
+                    logger.info(f"Created file: {target_path}")
+                manifest.append({
+                    "path": target_path.relative_to(base_output_dir).as_posix(),
+                    "sha256": sha256,
+                    "status": "written" if written else "unchanged"
+                })
+            self.project_index.update_files(target_path for target_path, _ in entries)
+            return manifest
 
-        logger.debug(f"✅ Files created successfully in {base_output_dir}")
+        file_manifest = await asyncio.to_thread(write_all)
+        written_count = sum(entry["status"] == "written" for entry in file_manifest)
+        logger.debug(f"✅ {written_count} of {len(file_manifest)} files written in {base_output_dir}")
 
+        ui_apps_dir = base_output_dir / "ui.apps/src/main/content/jcr_root/apps/wknd/components" / component_name
         return {
-            "coreJavaDir": str(sling_model_dir),
+            "coreJavaDir": str(base_output_dir / "core/src/main/java/com/adobe/aem/guides/wknd/core/models"),
             "uiAppsDir": str(ui_apps_dir)
-        }
+        }, file_manifest
+
+    def export_components(self, session_id: str, component_ids: Optional[List[str]] = None,
+                          fmt: str = "zip") -> Optional[Iterator[bytes]]:
+        """
+        Zip (Maven layout) or AEM content package of a session's components, built on the fly from
+        the stored GeneratedComponent records. None when the session or components don't exist.
+        Blocking iterator: consume it from a thread (StreamingResponse does).
+        """
+        if not self.chat_storage.session_exists(session_id):
+            return None
+        components = self.chat_storage.iter_session_components(session_id, component_ids)
+        first = next(components, None)
+        if first is None:
+            return None
+        base_output_dir = get_project_code_dir()
+
+        def component_files():
+            for component in itertools.chain([first], components):
+                component_name = re.sub(r'[^a-z0-9]', '', component.component_name.lower().replace(' ', ''))
+                component_data = {
+                    'slingModel': component.sling_model_code,
+                    'htl': component.htl_code,
+                    'dialog': component.dialog_code,
+                    'content_xml': component.content_xml,
+                    'clientLib': component.client_lib
+                }
+                entries = self._component_file_entries(component_data, component_name, component.sling_model_name)
+                files = [(path.relative_to(base_output_dir).as_posix(), content) for path, content in entries]
+                yield component_name, files, component.generation_timestamp
+
+        description = f"Components exported from session {session_id}"
+        return stream_zip(archive_entries(component_files(), fmt, f"dxp-components-{session_id}", description))
 
     def _create_folder_structure(self, app_id: str, component_name: str) -> Dict[str, Any]:
         """Create folder structure (app_id used only for display)"""
@@ -1041,6 +1343,7 @@ class ComponentService:
             'metadata': component.generation_metadata
         }
     
+    @traced("reuse_existing_component")
     async def reuse_existing_component(self, session_id: str, source_component_id: str, 
                                      source_session_id: str, customization_prompt: Optional[str] = None) -> Dict[str, Any]:
         """Reuse an existing component with optional customization"""
@@ -1084,7 +1387,8 @@ class ComponentService:
                 """
                 
                 # Generate customized component
-                customized_data = await self.generate_aem_component(customization_context, None, session_id)
+                with call_context(session_id, session.user_id):
+                    customized_data = await self.generate_aem_component(customization_context, None, session_id)
                 
                 # Handle dialog data
                 dialog_content = customized_data['dialog']
@@ -1109,7 +1413,8 @@ class ComponentService:
                         'action': 'reuse_with_customization',
                         'source_component_id': source_component_id,
                         'source_session_id': source_session_id,
-                        'customization_prompt': customization_prompt
+                        'customization_prompt': customization_prompt,
+                        **customized_data.get('generationMetadata', {})
                     }
                 )
                 
@@ -1136,15 +1441,6 @@ class ComponentService:
                 
                 ai_response = f"Component '{source_component.component_name}' reused successfully!"
             
-            # Add reused component to current session
-            self.chat_storage.add_component_to_session(session_id, reused_component)
-            
-            # Add AI response message
-            self.add_message_to_session(session_id, "ai", ai_response, None, {
-                'component_id': reused_component.component_id,
-                'action': 'component_reused'
-            })
-            
             # Generate sanitized component name for file creation
             sanitized_name = re.sub(r'[^a-z0-9]', '', reused_component.component_name.lower().replace(' ', ''))
             
@@ -1158,8 +1454,25 @@ class ComponentService:
                 'content_xml': reused_component.content_xml,
                 'clientLib': reused_component.client_lib
             }
-            
-            output_dirs = self._create_component_files(
+
+            # The reused model's name may meanwhile belong to another component in the project
+            renamed_model = await asyncio.to_thread(self._resolve_model_conflict, component_data, sanitized_name)
+            if renamed_model:
+                reused_component.sling_model_name = component_data['slingModelName']
+                reused_component.sling_model_code = component_data['slingModel']
+                reused_component.htl_code = component_data['htl']
+                reused_component.generation_metadata['renamed_model_from'] = renamed_model
+
+            # Add reused component to current session
+            self.chat_storage.add_component_to_session(session_id, reused_component)
+
+            # Add AI response message
+            self.add_message_to_session(session_id, "ai", ai_response, None, {
+                'component_id': reused_component.component_id,
+                'action': 'component_reused'
+            })
+
+            output_dirs, file_manifest = await self._create_component_files(
                 component_data,
                 "myapp",
                 "com.mycompany.myapp",
@@ -1175,9 +1488,13 @@ class ComponentService:
                 "source_component_id": source_component_id,
                 "customized": customization_prompt is not None,
                 "outputDirs": output_dirs,
+                "fileManifest": file_manifest,
                 "aiOutput": component_data
             }
             
+        except asyncio.CancelledError:
+            self._record_cancellation(session_id)
+            raise
         except Exception as e:
             error_message = f"Failed to reuse component: {str(e)}"
             self.add_message_to_session(session_id, "ai", error_message)
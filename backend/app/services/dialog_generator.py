@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader
+
+logger = logging.getLogger(__name__)
+
+# Render _cq_dialog locally from the Sling Model instead of calling the dialog agent
+AEM_LOCAL_DIALOG = os.getenv("AEM_LOCAL_DIALOG", "true").lower() == "true"
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "templates"
+
+# "@ValueMapValue" (optionally with arguments and further annotations) followed by the field declaration
+FIELD_PATTERN = re.compile(
+    r"@ValueMapValue(?:\((?P<args>[^)]*)\))?\s*(?P<annotations>(?:@\w+(?:\([^)]*\))?\s*)*)"
+    r"(?:private|protected|public)?\s*(?:final\s+)?(?P<type>[\w.<>\[\], ]+?)\s+(?P<name>\w+)\s*(?:=[^;]*)?;"
+)
+# Property name given by @ValueMapValue(name = "jcr:title") or @Named("jcr:title")
+PROPERTY_NAME_PATTERN = re.compile(r'(?:\bname\s*=\s*|@Named\(\s*(?:value\s*=\s*)?)"([^"]+)"')
+# Injectors whose fields are not plain dialog properties (multifields, services, request objects)
+UNSUPPORTED_INJECTORS = ("@ChildResource", "@Inject")
+
+# Presentation settings whose values (CSS classes, tokens) only the LLM can infer from the requirements
+STYLE_HINTS = ("style", "variant", "size", "position", "color", "colour", "theme", "height", "width", "layout", "type")
+# String fields agent 1 uses for checkboxes ("true"/"false"): showTitle, hideDivider, openInNewTab, ...
+BOOLEAN_NAME_PATTERN = re.compile(r"^(?:show|hide|is|has|enable|disable|open)[A-Z]")
+IMAGE_HINTS = ("image", "img", "icon", "logo", "background", "picture", "thumbnail", "asset")
+LINK_HINTS = ("link", "url", "href", "path", "page")
+RICHTEXT_NAMES = {"text", "description", "body", "content", "richtext", "bodytext", "copy"}
+RICHTEXT_SUFFIXES = ("description", "body", "richtext", "content", "copy")
+TEXT_SUFFIXES = ("title", "label", "text", "heading", "name", "alt", "caption", "subtitle", "eyebrow")
+ACRONYMS = {"cta": "CTA", "url": "URL", "id": "ID", "seo": "SEO", "alt": "Alt"}
+
+# Options for select fields whose values are conventional enough to generate without the LLM
+KNOWN_OPTIONS = {
+    "alignment": [("left", "Left"), ("center", "Center"), ("right", "Right")],
+    "level": [(f"h{i}", f"H{i}") for i in range(1, 7)],
+    "target": [("_self", "Same window"), ("_blank", "New window")],
+}
+OPTION_HINTS = (
+    ("alignment", ("alignment", "align")),
+    ("level", ("level", "headingtype", "titletype", "headingtag", "titletag")),
+    ("target", ("target",)),
+)
+
+
+@dataclass
+class DialogField:
+    name: str
+    label: str
+    widget: str
+    options: List[Tuple[str, str]] = field(default_factory=list)
+    multiple: bool = False
+    # JCR property the model reads, when it differs from the Java field name
+    property: Optional[str] = None
+
+
+def humanize(name: str) -> str:
+    """ctaLink -> 'CTA Link'"""
+    words = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", name).replace("_", " ").split()
+    return " ".join(ACRONYMS.get(word.lower(), word.capitalize()) for word in words)
+
+
+def _option_node_name(value: str) -> str:
+    node = re.sub(r"[^A-Za-z0-9_]", "", value) or "option"
+    return node if node[0].isalpha() else f"option{node}"
+
+
+def parse_sling_model_fields(sling_model: str) -> Optional[List[Tuple[str, str, str]]]:
+    """
+    (type, name, JCR property) of every @ValueMapValue field, or None when the model uses
+    injectors a flat dialog cannot express.
+    """
+    if any(injector in sling_model for injector in UNSUPPORTED_INJECTORS):
+        return None
+    fields = []
+    for match in FIELD_PATTERN.finditer(sling_model):
+        named = PROPERTY_NAME_PATTERN.search(f"{match.group('args') or ''} {match.group('annotations')}")
+        fields.append((match.group("type").replace(" ", ""), match.group("name"),
+                       named.group(1) if named else match.group("name")))
+    return fields
+
+
+def _property_options(shared_context: Dict[str, Any], *names: str) -> List[Tuple[str, str]]:
+    """Options agent 1 listed for a property in the shared context, if any"""
+    for prop in shared_context.get("properties", []):
+        if not isinstance(prop, dict) or prop.get("name") not in names:
+            continue
+        values = prop.get("options") or prop.get("values") or prop.get("enum") or []
+        options = []
+        for value in values:
+            if isinstance(value, dict):
+                value_str = str(value.get("value", value.get("text", "")))
+                options.append((value_str, str(value.get("text", humanize(value_str)))))
+            else:
+                options.append((str(value), humanize(str(value))))
+        return [option for option in options if option[0]]
+    return []
+
+
+def map_field(java_type: str, name: str, shared_context: Dict[str, Any],
+              property_name: Optional[str] = None) -> Optional[DialogField]:
+    """Map one Sling Model field to a Granite UI widget; None when it can't be done reliably"""
+    lowered = name.lower()
+    label = humanize(name)
+    prop = property_name if property_name and property_name != name else None
+    multiple = java_type.endswith("[]") or java_type.startswith(("List<", "java.util.List<"))
+    base_type = re.sub(r"^(?:java\.util\.)?List<(.+)>$", r"\1", java_type).rstrip("[]").split(".")[-1]
+
+    if base_type in ("boolean", "Boolean"):
+        return DialogField(name, label, "checkbox", property=prop)
+    if base_type in ("int", "Integer", "long", "Long", "double", "Double", "float", "Float"):
+        return DialogField(name, label, "numberfield", multiple=multiple, property=prop)
+    if base_type in ("Calendar", "Date", "ZonedDateTime"):
+        return DialogField(name, label, "datepicker", multiple=multiple, property=prop)
+    if base_type != "String":
+        return None
+
+    options = _property_options(shared_context, name, property_name or name)
+    if options:
+        return DialogField(name, label, "select", options, multiple, prop)
+    for option_set, hints in OPTION_HINTS:
+        if lowered.endswith(hints):
+            return DialogField(name, label, "select", KNOWN_OPTIONS[option_set], multiple, prop)
+    if not multiple and BOOLEAN_NAME_PATTERN.match(name):
+        return DialogField(name, label, "checkbox", property=prop)
+    # Checked before the image/link hints, so backgroundColor or iconSize never become pathfields
+    if any(hint in lowered for hint in STYLE_HINTS):
+        return None
+
+    if lowered in RICHTEXT_NAMES or lowered.endswith(RICHTEXT_SUFFIXES):
+        return DialogField(name, label, "richtext", property=prop)
+    if lowered.endswith(TEXT_SUFFIXES):
+        return DialogField(name, label, "textfield", multiple=multiple, property=prop)
+    if any(hint in lowered for hint in IMAGE_HINTS):
+        return DialogField(name, label, "image", multiple=multiple, property=prop)
+    if any(hint in lowered for hint in LINK_HINTS):
+        return DialogField(name, label, "pathfield", multiple=multiple, property=prop)
+    return DialogField(name, label, "textfield", multiple=multiple, property=prop)
+
+
+class DialogGenerator:
+    """Renders _cq_dialog/.content.xml and the component .content.xml from a Sling Model"""
+
+    def __init__(self):
+        self.env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True,
+                               trim_blocks=True, lstrip_blocks=True)
+        self.env.filters["option_node"] = _option_node_name
+
+    def generate(self, shared_context: Dict[str, Any], sling_model: str) -> Optional[Dict[str, Any]]:
+        """
+        Agent 3's output shape ({"dialog": {...}, ".content.xml": ...}), or None when any
+        field can't be mapped and the dialog agent has to handle the component.
+        """
+        parsed = parse_sling_model_fields(sling_model)
+        if not parsed:
+            logger.info("Local dialog generation skipped: no plain @ValueMapValue fields in the Sling Model")
+            return None
+
+        fields = []
+        for java_type, name, property_name in parsed:
+            mapped = map_field(java_type, name, shared_context, property_name)
+            if mapped is None:
+                logger.info(f"Local dialog generation skipped: cannot map field '{name}' ({java_type})")
+                return None
+            fields.append(mapped)
+
+        component_title = shared_context.get("componentName") or shared_context.get("slingModelName") or "Component"
+        resource_name = re.sub(r"[^a-z0-9]", "", component_title.lower())
+        dialog_xml = self.env.get_template("dialog.xml.j2").render(title=component_title, fields=fields)
+        content_xml = self.env.get_template("component_content.xml.j2").render(
+            title=component_title, resource_type=f"wknd/components/{resource_name}")
+
+        logger.info(f"Rendered dialog locally with {len(fields)} fields")
+        return {
+            "dialog": {"_cq_dialog/.content.xml": dialog_xml},
+            ".content.xml": content_xml
+        }
+
+
+# Singleton instance
+dialog_generator = DialogGenerator()
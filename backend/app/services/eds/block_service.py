@@ -1,12 +1,33 @@
-from typing import TypedDict, Dict, Any
+import asyncio
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import TypedDict, Dict, Any, AsyncIterator, List, Optional
 
 from fastapi.logger import logger
 from langgraph.constants import END
 from langgraph.graph import StateGraph
 from starlette.responses import JSONResponse
-from app.agents.assemble_agent import assemble_node
-from app.agents.extract_agent import extract_node
+from app.agents.assemble_agent import assemble_json, assemble_node
+from app.agents.extract_agent import extract_batch, extract_node
 from app.agents.generate_agent import generate_content_node
+from app.utils.telemetry import span, traced
+
+# Max workflows executing at once per worker; further requests wait for a slot
+EDS_MAX_CONCURRENCY = int(os.getenv("EDS_MAX_CONCURRENCY", "16"))
+# Descriptions per batched extraction prompt
+EDS_EXTRACT_BATCH_SIZE = int(os.getenv("EDS_EXTRACT_BATCH_SIZE", "10"))
+# Where workflow checkpoints live so a failed run resumes after its last finished node: sqlite, memory or none
+EDS_CHECKPOINTER = os.getenv("EDS_CHECKPOINTER", "sqlite").lower()
+EDS_CHECKPOINT_DB = os.getenv("EDS_CHECKPOINT_DB") or str(
+    Path(__file__).parent.parent.parent.parent.parent / "output" / ".eds-checkpoints.sqlite")
+# Checkpoints of failed runs that are never retried are deleted after this, like the AEM stage checkpoints
+EDS_CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+# Minimum seconds between sweeps for expired threads
+EDS_CHECKPOINT_SWEEP_SECONDS = 3600
+# Initial-state keys a resumed run must match; anything else means a different request under the same id
+RESUME_KEYS = ("user_request", "include_zip_base64")
 
 
 # --- Define LangGraph Agent State ---
@@ -19,47 +40,225 @@ class AgentState(TypedDict):
         block_details (dict): Output from Agent 1 (extracted block requirements).
         block_content_output (dict): Output from Agent 2 (JS, CSS, Markdown, HTML).
         final_output (dict): Final assembled JSON output.
+        include_zip_base64 (bool): Whether to embed the zipped block as base64 in final_output.
     """
     user_request: str
     block_details: Dict[str, Any]
     block_content_output: Dict[str, Any]
     final_output: Dict[str, Any]
+    include_zip_base64: bool
+
+async def create_checkpointer():
+    """LangGraph checkpointer for EDS workflows; falls back to memory when the SQLite saver is not installed"""
+    if EDS_CHECKPOINTER == "none":
+        return None
+    if EDS_CHECKPOINTER == "sqlite":
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            logger.warning("langgraph-checkpoint-sqlite is not installed; keeping EDS checkpoints in memory")
+        else:
+            Path(EDS_CHECKPOINT_DB).parent.mkdir(parents=True, exist_ok=True)
+            saver = AsyncSqliteSaver(await aiosqlite.connect(EDS_CHECKPOINT_DB))
+            await saver.setup()
+            return saver
+    from langgraph.checkpoint.memory import MemorySaver
+    return MemorySaver()
+
+
+def build_eds_workflow(checkpointer=None):
+    """Build and compile the extract -> generate -> assemble graph; nodes are wrapped in timing spans"""
+    workflow = StateGraph(AgentState)
+    # Add nodes for each agent
+    workflow.add_node("extract_requirements", traced("eds.extract_requirements")(extract_node))
+    workflow.add_node("generate_content", traced("eds.generate_content")(generate_content_node))
+    workflow.add_node("assemble_json", traced("eds.assemble_json")(assemble_node))
+    # Define the flow (edges)
+    workflow.set_entry_point("extract_requirements")
+    workflow.add_edge("extract_requirements", "generate_content")
+    workflow.add_edge("generate_content", "assemble_json")
+    workflow.add_edge("assemble_json", END)
+    return workflow.compile(checkpointer=checkpointer)
+
 
 class EDSBlockService:
-    def run_workflow(self, description):
-        pass
+    def __init__(self, max_concurrency: int = EDS_MAX_CONCURRENCY):
+        # Compiled once on first use (the SQLite saver needs the running loop); the compiled
+        # graph keeps per-run state in the checkpointer, keyed by thread id, so it is safe to share
+        self.graph = None
+        self.checkpointer = None
+        self._graph_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Last activity per checkpointed thread (mirrored in SQLite, so expiry survives restarts)
+        self._thread_activity: Dict[str, float] = {}
+        self._next_sweep = 0.0
+
+    async def get_graph(self):
+        async with self._graph_lock:
+            if self.graph is None:
+                self.checkpointer = await create_checkpointer()
+                await self._load_thread_activity()
+                self.graph = build_eds_workflow(self.checkpointer)
+        return self.graph
+
+    def _db(self):
+        """The SQLite connection behind the checkpointer, or None for the in-memory saver"""
+        return getattr(self.checkpointer, "conn", None)
+
+    async def _load_thread_activity(self):
+        conn = self._db()
+        if conn is None:
+            return
+        await conn.execute("CREATE TABLE IF NOT EXISTS eds_thread_activity "
+                           "(thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+        # Threads checkpointed before expiry was tracked start their TTL now
+        await conn.execute("INSERT OR IGNORE INTO eds_thread_activity "
+                           "SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),))
+        await conn.commit()
+        async with conn.execute("SELECT thread_id, updated_at FROM eds_thread_activity") as cursor:
+            self._thread_activity = {thread_id: updated_at async for thread_id, updated_at in cursor}
+
+    async def _touch_thread(self, thread_id: str):
+        now = time.time()
+        self._thread_activity[thread_id] = now
+        conn = self._db()
+        if conn is not None:
+            await conn.execute("INSERT OR REPLACE INTO eds_thread_activity VALUES (?, ?)", (thread_id, now))
+            await conn.commit()
+
+    async def _delete_thread(self, thread_id: str):
+        delete_thread = getattr(self.checkpointer, "adelete_thread", None)
+        if delete_thread:
+            await delete_thread(thread_id)
+        self._thread_activity.pop(thread_id, None)
+        conn = self._db()
+        if conn is not None:
+            await conn.execute("DELETE FROM eds_thread_activity WHERE thread_id = ?", (thread_id,))
+            await conn.commit()
+
+    async def _sweep_expired_threads(self):
+        """Drop checkpoints of failed runs nobody retried within the TTL; runs at most once per sweep interval"""
+        if self.checkpointer is None or time.monotonic() < self._next_sweep:
+            return
+        self._next_sweep = time.monotonic() + EDS_CHECKPOINT_SWEEP_SECONDS
+        cutoff = time.time() - EDS_CHECKPOINT_TTL_SECONDS
+        expired = [thread_id for thread_id, updated_at in self._thread_activity.items() if updated_at < cutoff]
+        for thread_id in expired:
+            try:
+                await self._delete_thread(thread_id)
+            except Exception as e:
+                logger.error(f"Failed to delete expired EDS checkpoint {thread_id}: {str(e)}")
+        if expired:
+            logger.info(f"Deleted {len(expired)} expired EDS workflow checkpoints")
+
+    async def close(self):
+        conn = getattr(self.checkpointer, "conn", None)
+        if conn is not None:
+            await conn.close()
+
+    async def run_workflow(self, description, include_zip_base64: bool = False, thread_id: Optional[str] = None):
+        """
+        Run the workflow under a thread id. When a previous run of the same thread failed part-way,
+        it resumes after the last node that finished instead of starting over. A failed run returns
+        an empty body with the thread id in the X-Generation-Id header for the retry.
+        """
         logger.info(f"Running EDS block generation workflow for description: {description}")
-        # Placeholder for the actual workflow logic
-        # This would typically involve calling various methods to generate the block files
-        # For now, we return a mock response
-        # --- Build the LangGraph ---
-        workflow = StateGraph(AgentState)
-        # Add nodes for each agent
-        workflow.add_node("extract_requirements", extract_node)
-        workflow.add_node("generate_content", generate_content_node)
-        workflow.add_node("assemble_json", assemble_node)
-        # Define the flow (edges)
-        workflow.set_entry_point("extract_requirements")
-        workflow.add_edge("extract_requirements", "generate_content")
-        workflow.add_edge("generate_content", "assemble_json")
-        workflow.add_edge("assemble_json", END)
-
-        # Compile the graph
-        app = workflow.compile()
+        resumable = thread_id is not None
+        thread_id = thread_id or uuid.uuid4().hex
+        config = {"configurable": {"thread_id": thread_id}}
 
         # Initial state for the graph
         initial_state = {
             "user_request": description,
             "block_details": {},
             "block_content_output": {},
-            "final_output": {}
+            "final_output": {},
+            "include_zip_base64": include_zip_base64
         }
 
         try:
-            # Run the workflow with the initial state
-            # Invoke the graph
-            final_state = app.invoke(initial_state)
+            with span("eds.queue_wait"):
+                await self._semaphore.acquire()
+            try:
+                graph = await self.get_graph()
+                await self._sweep_expired_threads()
+                snapshot = await graph.aget_state(config) if self.checkpointer else None
+                resume = bool(snapshot and snapshot.next and all(
+                    snapshot.values.get(key) == initial_state[key] for key in RESUME_KEYS))
+                if self.checkpointer:
+                    await self._touch_thread(thread_id)
+                with span("eds.workflow", resumed=resume):
+                    if resume:
+                        logger.info(f"Resuming EDS workflow {thread_id} at {snapshot.next}")
+                        final_state = await graph.ainvoke(None, config)
+                    else:
+                        final_state = await graph.ainvoke(initial_state, config)
+            finally:
+                self._semaphore.release()
+            if self.checkpointer:
+                await self._delete_thread(thread_id)
             return final_state['final_output']
+        except asyncio.CancelledError:
+            # The client went away; nobody holds this thread id, so its checkpoints can't be resumed
+            logger.info(f"EDS workflow {thread_id} cancelled")
+            if self.checkpointer and not resumable:
+                await asyncio.shield(self._delete_thread(thread_id))
+            raise
         except Exception  as e:
-            logger.error(f"Error generating EDS block: {str(e)}")
-            return JSONResponse(content={})
\ No newline at end of file
+            logger.error(f"Error generating EDS block (thread {thread_id}): {str(e)}")
+            return JSONResponse(content={}, headers={"X-Generation-Id": thread_id})
+
+    async def run_batch(self, descriptions: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate many blocks: extraction runs as batched prompts, then each block's content is
+        generated concurrently under the shared concurrency cap. Yields one result per block
+        as soon as it finishes, so completion order differs from input order.
+        """
+        logger.info(f"Running batched EDS block generation for {len(descriptions)} descriptions")
+
+        chunks = [descriptions[i:i + EDS_EXTRACT_BATCH_SIZE]
+                  for i in range(0, len(descriptions), EDS_EXTRACT_BATCH_SIZE)]
+        with span("eds.batch_extract", blocks=len(descriptions), prompts=len(chunks)):
+            extracted = await asyncio.gather(*(extract_batch(chunk) for chunk in chunks))
+        block_details = [details for chunk in extracted for details in chunk]
+
+        # Block names become folder names in the combined archive, so they must be unique
+        seen: Dict[str, int] = {}
+        for details in block_details:
+            name = details.get("blockName")
+            if not name:
+                continue
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                details["blockName"] = f"{name}-{seen[name]}"
+
+        async def generate(index: int, details: Dict[str, Any]) -> Dict[str, Any]:
+            state = {
+                "user_request": descriptions[index],
+                "block_details": details,
+                "block_content_output": {},
+                "final_output": {},
+                "include_zip_base64": False
+            }
+            try:
+                with span("eds.queue_wait"):
+                    await self._semaphore.acquire()
+                try:
+                    with span("eds.generate_content"):
+                        state = await generate_content_node(state)
+                finally:
+                    self._semaphore.release()
+                return {"index": index, "success": True, "block": assemble_json(state["block_content_output"])}
+            except Exception as e:
+                logger.error(f"Error generating EDS block {index}: {str(e)}")
+                return {"index": index, "success": False, "error": str(e)}
+
+        tasks = [asyncio.create_task(generate(index, details)) for index, details in enumerate(block_details)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The client went away mid-stream: don't keep generating blocks nobody will read
+            for task in tasks:
+                task.cancel()
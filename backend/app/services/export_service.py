@@ -0,0 +1,118 @@
+import io
+import logging
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("zip", "package")
+JCR_ROOT_MARKER = "jcr_root/"
+PACKAGE_GROUP = "dxp-code-generator"
+
+# (archive path, content, modification time)
+ArchiveEntry = Tuple[str, str, datetime]
+
+
+class _StreamBuffer(io.RawIOBase):
+    """
+    Write-only, non-seekable sink for zipfile. zipfile then writes data descriptors instead of
+    seeking back, and whatever it wrote can be drained and sent after every entry.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    """Zip entries on the fly; memory holds one compressed entry, never the whole archive"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, content, modified in entries:
+            info = zipfile.ZipInfo(path, date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, content)
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    # Central directory, written on close
+    tail = buffer.drain()
+    if tail:
+        yield tail
+
+
+def _package_properties(name: str, description: str) -> str:
+    return f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE properties SYSTEM "http://java.sun.com/dtd/properties.dtd">
+<properties>
+<entry key="name">{escape(name)}</entry>
+<entry key="group">{PACKAGE_GROUP}</entry>
+<entry key="version">1.0.0</entry>
+<entry key="description">{escape(description)}</entry>
+<entry key="createdBy">{PACKAGE_GROUP}</entry>
+</properties>
+"""
+
+
+def _package_filter(roots: Iterable[str]) -> str:
+    filters = "\n".join(f"    <filter root={quoteattr(root)}/>" for root in sorted(roots))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<workspaceFilter version="1.0">
+{filters}
+</workspaceFilter>
+"""
+
+
+def archive_entries(component_files: Iterable[Tuple[str, List[Tuple[str, str]], datetime]], fmt: str,
+                    package_name: str, description: str = "") -> Iterator[ArchiveEntry]:
+    """
+    Archive entries for (component name, [(project-relative path, content)], timestamp) tuples,
+    newest component first. A path already emitted by a newer version of a component is skipped,
+    so a session with several refinements exports each file once.
+
+    "zip" keeps the Maven project layout (core/..., ui.apps/...). "package" is an AEM content
+    package: the ui.apps files under jcr_root plus META-INF/vault; Java sources are not content
+    and are left out.
+    """
+    emitted: Set[str] = set()
+    filter_roots: Set[str] = set()
+    latest: Optional[datetime] = None
+    for component_name, files, modified in component_files:
+        latest = latest or modified
+        for path, content in files:
+            if fmt == "package":
+                if JCR_ROOT_MARKER not in path:
+                    continue
+                jcr_path = path[path.index(JCR_ROOT_MARKER):]
+                component_root = "/" + "/".join(jcr_path.split("/")[1:5])
+                filter_roots.add(component_root)
+                path = jcr_path
+            if path in emitted:
+                continue
+            emitted.add(path)
+            yield path, content, modified
+        logger.debug(f"Exported component {component_name}")
+
+    if fmt == "package":
+        modified = latest or datetime.utcnow()
+        yield "META-INF/vault/properties.xml", _package_properties(package_name, description), modified
+        yield "META-INF/vault/filter.xml", _package_filter(filter_roots), modified
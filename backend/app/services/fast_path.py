@@ -0,0 +1,148 @@
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+logger = logging.getLogger(__name__)
+
+# off: always run the five-agent pipeline; auto: classify each request; always: try the fast path first
+AEM_FAST_PATH_MODE = os.getenv("AEM_FAST_PATH", "auto").lower()
+# Requests longer than this are treated as complex regardless of wording
+FAST_PATH_MAX_WORDS = int(os.getenv("AEM_FAST_PATH_MAX_WORDS", "60"))
+
+SIMPLE_COMPONENT_TERMS = (
+    "title", "heading", "headline", "text", "paragraph", "button", "cta", "call to action", "link",
+    "divider", "separator", "spacer", "quote", "blockquote", "label", "badge", "tag", "teaser",
+    "banner", "callout", "notice", "alert",
+)
+COMPLEX_COMPONENT_TERMS = (
+    "carousel", "slider", "slideshow", "tabs", "accordion", "multifield", "list of", "grid", "table",
+    "form", "search", "filter", "sort", "pagination", "modal", "popup", "dropdown menu", "navigation",
+    "mega menu", "api", "fetch", "dynamic", "ajax", "animation", "video", "map", "chart", "calendar",
+    "nested", "repeatable", "content fragment", "experience fragment", "personalized", "personalization",
+    "personalised", "personalisation",
+)
+
+
+def _mentions(text: str, terms) -> list:
+    # Whole words only (plurals allowed), so "map" does not match "mapping" nor "tag" "stage"
+    return [term for term in terms if re.search(rf"\b{re.escape(term)}s?\b", text)]
+
+
+def classify_complexity(prompt: str, has_image: bool = False) -> Tuple[str, str]:
+    """
+    Cheap keyword heuristic deciding whether a request can go through the single-call
+    generator. Returns ("simple" | "complex", reason).
+    """
+    if AEM_FAST_PATH_MODE == "off":
+        return "complex", "fast path disabled"
+    # Checked before "always": the single-call generator never sees the uploaded design
+    if has_image:
+        return "complex", "image input needs the image agent"
+    if AEM_FAST_PATH_MODE == "always":
+        return "simple", "fast path forced"
+
+    text = prompt.lower()
+    words = len(text.split())
+    if words > FAST_PATH_MAX_WORDS:
+        return "complex", f"{words} words"
+    complex_terms = _mentions(text, COMPLEX_COMPONENT_TERMS)
+    if complex_terms:
+        return "complex", f"mentions {', '.join(complex_terms[:3])}"
+    simple_terms = _mentions(text, SIMPLE_COMPONENT_TERMS)
+    if simple_terms:
+        return "simple", f"mentions {', '.join(simple_terms[:3])}"
+    return "complex", "no simple component type recognised"
+
+
+class FastPathComponent(BaseModel):
+    """Schema the single-call generator must satisfy before its output is accepted"""
+    componentName: str = Field(..., min_length=1)
+    slingModelName: str = Field(..., pattern=r"^[A-Z][A-Za-z0-9_]*$")
+    slingModel: str
+    htl: str
+    dialog: Dict[str, str]
+    content_xml: str = Field(..., alias=".content.xml")
+    clientLib: Dict[str, Any]
+
+    @field_validator("slingModel")
+    @classmethod
+    def _sling_model(cls, v: str) -> str:
+        if "@Model" not in v or "class " not in v:
+            raise ValueError("slingModel is not a Sling Model class")
+        return v
+
+    @field_validator("htl")
+    @classmethod
+    def _htl(cls, v: str) -> str:
+        if "data-sly-use" not in v:
+            raise ValueError("htl does not reference the Sling Model")
+        return v
+
+    @field_validator("dialog")
+    @classmethod
+    def _dialog(cls, v: Dict[str, str]) -> Dict[str, str]:
+        xml = v.get("_cq_dialog/.content.xml", "")
+        if "jcr:root" not in xml:
+            raise ValueError("dialog is missing _cq_dialog/.content.xml")
+        return v
+
+    @field_validator("content_xml")
+    @classmethod
+    def _content_xml(cls, v: str) -> str:
+        if "cq:Component" not in v:
+            raise ValueError(".content.xml is not a cq:Component")
+        return v
+
+    @field_validator("clientLib")
+    @classmethod
+    def _client_lib(cls, v: Dict[str, Any]) -> Dict[str, Any]:
+        if not any(path.endswith(".css") for path in v):
+            raise ValueError("clientLib has no CSS file")
+        return v
+
+
+def validate_fast_path_output(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the pipeline's final_result shape, or None when the response fails the schema"""
+    try:
+        component = FastPathComponent.model_validate(data)
+    except ValidationError as e:
+        logger.warning(f"Fast path output failed validation: {e.errors()[:3]}")
+        return None
+    return {
+        'htl': component.htl,
+        'slingModel': component.slingModel,
+        'dialog': component.dialog,
+        'content_xml': component.content_xml,
+        'clientLib': component.clientLib,
+        'slingModelName': component.slingModelName,
+        'componentName': component.componentName
+    }
+
+
+class PipelineStats:
+    """Running mean of full-pipeline latency, used to estimate what a fast-path run saved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._full_count = 0
+        self._full_mean_ms = 0.0
+
+    def observe(self, pipeline: str, duration_ms: float) -> None:
+        if pipeline != "full":
+            return
+        with self._lock:
+            self._full_count += 1
+            self._full_mean_ms += (duration_ms - self._full_mean_ms) / self._full_count
+
+    def estimated_savings_ms(self, duration_ms: float) -> Optional[float]:
+        with self._lock:
+            if not self._full_count:
+                return None
+            return round(self._full_mean_ms - duration_ms, 2)
+
+
+pipeline_stats = PipelineStats()
@@ -1,17 +1,128 @@
+import asyncio
+import io
 import os
-import tempfile
 import shutil
+import tempfile
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set
 from pathlib import Path
 
-from git import Repo
-from github import Github
+from git import Actor, GitCommandError, Repo
+from gitdb import IStream
+from github import Github, InputGitAuthor, InputGitTreeElement
 from fastapi import HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Persistent bare mirrors of the target repositories, fetched incrementally before each push
+GIT_MIRROR_DIR = Path(os.getenv("GIT_MIRROR_DIR") or Path(__file__).parent.parent.parent.parent / "output" / ".git-mirrors")
+# Mirror path -> lock; GitService is created per request, so the locks live at module level
+_mirror_locks: Dict[str, asyncio.Lock] = {}
+# worktree: commit in a worktree of the local mirror and push it
+# api: create blobs, tree, commit and ref through the GitHub Git Data API (no clone at all)
+# local: the same object-level flow against the bare repository at GIT_LOCAL_REPO (offline testing)
+GIT_PUSH_MODE = os.getenv("GIT_PUSH_MODE", "worktree").lower()
+GIT_LOCAL_REPO = os.getenv("GIT_LOCAL_REPO")
+# Opt-in: non-urgent pushes arriving within this window share one branch, commit and PR (0 disables batching)
+GIT_PUSH_BATCH_WINDOW_SECONDS = float(os.getenv("GIT_PUSH_BATCH_WINDOW_SECONDS", "0"))
+GIT_PUSH_BATCH_MAX_BLOCKS = int(os.getenv("GIT_PUSH_BATCH_MAX_BLOCKS", "20"))
+FILE_MODE = "100644"
+
+
+class GitHubDataBackend:
+    """Git objects through the GitHub Git Data API, one request per object"""
+
+    def __init__(self, github_client, full_name: str):
+        self.repo = github_client.get_repo(full_name)
+        # PyGithub wants the objects, not just their shas, when linking them together
+        self._objects: Dict[str, Any] = {}
+
+    def resolve_branch(self, branch: str):
+        commit = self.repo.get_git_commit(self.repo.get_git_ref(f"heads/{branch}").object.sha)
+        self._objects[commit.sha] = commit
+        self._objects[commit.tree.sha] = commit.tree
+        return commit.sha, commit.tree.sha
+
+    def resolve_commit(self, sha: str):
+        commit = self.repo.get_git_commit(sha)
+        self._objects[commit.sha] = commit
+        self._objects[commit.tree.sha] = commit.tree
+        return commit.sha, commit.tree.sha
+
+    def create_blob(self, content: str) -> str:
+        return self.repo.create_git_blob(content, "utf-8").sha
+
+    def create_tree(self, base_tree: str, entries: Dict[str, str]) -> str:
+        tree = self.repo.create_git_tree(
+            [InputGitTreeElement(path, FILE_MODE, "blob", sha=sha) for path, sha in entries.items()],
+            base_tree=self._objects[base_tree])
+        self._objects[tree.sha] = tree
+        return tree.sha
+
+    def create_commit(self, message: str, tree: str, parent: str, author_name: str, author_email: str) -> str:
+        return self.repo.create_git_commit(message, self._objects[tree], [self._objects[parent]],
+                                           author=InputGitAuthor(author_name, author_email)).sha
+
+    def create_ref(self, branch: str, sha: str) -> None:
+        self.repo.create_git_ref(f"refs/heads/{branch}", sha)
+
+    def update_ref(self, branch: str, sha: str, old_sha: str) -> None:
+        # Not forced: GitHub rejects anything but a fast-forward from the branch's current commit
+        self.repo.get_git_ref(f"heads/{branch}").edit(sha)
+
+
+class LocalBareRepoBackend:
+    """The same object-level operations against a local bare repository"""
+
+    def __init__(self, path: str):
+        self.repo = Repo(path)
+
+    def resolve_branch(self, branch: str):
+        commit = self.repo.commit(f"refs/heads/{branch}")
+        return commit.hexsha, commit.tree.hexsha
+
+    def resolve_commit(self, sha: str):
+        commit = self.repo.commit(sha)
+        return commit.hexsha, commit.tree.hexsha
+
+    def create_blob(self, content: str) -> str:
+        data = content.encode("utf-8")
+        # gitdb returns the hex sha as bytes
+        return self.repo.odb.store(IStream("blob", len(data), io.BytesIO(data))).hexsha.decode("ascii")
+
+    def create_tree(self, base_tree: str, entries: Dict[str, str]) -> str:
+        # A throwaway index file: read the base tree, overlay the entries, write the tree
+        fd, index_path = tempfile.mkstemp(prefix="eds_index_")
+        os.close(fd)
+        os.unlink(index_path)
+        env = {"GIT_INDEX_FILE": index_path}
+        try:
+            self.repo.git.read_tree(base_tree, env=env)
+            cacheinfo = []
+            for path, sha in entries.items():
+                cacheinfo += ["--cacheinfo", f"{FILE_MODE},{sha},{path}"]
+            self.repo.git.update_index("--add", *cacheinfo, env=env)
+            return self.repo.git.write_tree(env=env)
+        finally:
+            if os.path.exists(index_path):
+                os.unlink(index_path)
+
+    def create_commit(self, message: str, tree: str, parent: str, author_name: str, author_email: str) -> str:
+        env = {"GIT_AUTHOR_NAME": author_name, "GIT_AUTHOR_EMAIL": author_email,
+               "GIT_COMMITTER_NAME": author_name, "GIT_COMMITTER_EMAIL": author_email}
+        return self.repo.git.commit_tree(tree, "-p", parent, "-m", message, env=env)
+
+    def create_ref(self, branch: str, sha: str) -> None:
+        # Old value of all zeros: fails instead of moving an existing branch
+        self.repo.git.update_ref(f"refs/heads/{branch}", sha, "0" * 40)
+
+    def update_ref(self, branch: str, sha: str, old_sha: str) -> None:
+        # Fails when the branch has moved since old_sha was read
+        self.repo.git.update_ref(f"refs/heads/{branch}", sha, old_sha)
+
 class GitService:
     def __init__(self):
         self.github_token = os.getenv('GITHUB_TOKEN')
@@ -57,6 +168,30 @@ class GitService:
         
         raise ValueError(f"Cannot parse GitHub repo from URL: {self.repo_url}")
     
+    def mirror_path(self) -> Path:
+        repo_info = self.get_repo_info()
+        return GIT_MIRROR_DIR / f"{repo_info['owner']}__{repo_info['repo']}.git"
+
+    def _auth_url(self) -> str:
+        # Passed per command so the token is never stored in the mirror's config
+        repo_info = self.get_repo_info()
+        return f"https://{self.github_token}@github.com/{repo_info['owner']}/{repo_info['repo']}.git"
+
+    def block_files(self, block_name: str, files: Dict[str, str], metadata: Dict[str, Any]) -> Dict[str, str]:
+        """Repository-relative path -> content of everything a block push writes"""
+        block_dir = f"blocks/{self.sanitize_block_name(block_name)}"
+        block_files = {}
+        # Main EDS block files
+        if 'html' in files:
+            block_files[f"{block_dir}/index.html"] = files['html']
+        if 'css' in files:
+            block_files[f"{block_dir}/styles.css"] = files['css']
+        if 'js' in files:
+            block_files[f"{block_dir}/script.js"] = files['js']
+        # README with metadata
+        block_files[f"{block_dir}/README.md"] = self.generate_readme(block_name, metadata, files)
+        return block_files
+
     async def push_eds_block(
         self, 
         block_name: str, 
@@ -76,102 +211,101 @@ class GitService:
         Returns:
             Dict with commit info, branch name, URLs
         """
-        if not self.github_token:
+        result = await self.push_eds_blocks(
+            [{'block_name': block_name, 'files': files, 'metadata': metadata}], create_pr)
+        return self.block_result(result, 0)
+
+    async def push_eds_blocks(self, blocks: List[Dict[str, Any]], create_pr: bool = True,
+                              follow_up: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Push several EDS blocks as one branch, one commit and (optionally) one PR.
+
+        Each block is a dict with block_name, files and metadata. When the same block appears
+        twice in this one call, the later one is pushed and the earlier one is reported as
+        superseded (GitPushQueue never lets that happen between different callers). The result
+        carries the batch's commit info plus a per-block status list under 'blocks'.
+
+        follow_up is an earlier result of this method: the blocks are then committed on top of
+        its commit, on its branch, and belong to its PR instead of opening a new one.
+        """
+        push_mode = GIT_PUSH_MODE
+        if push_mode != "local" and not self.github_token:
             raise HTTPException(status_code=500, detail="GitHub token not configured")
         
-        temp_dir = None
         try:
-            # Create temporary directory
-            temp_dir = tempfile.mkdtemp(prefix='eds_push_')
-            logger.info(f"Working in temp directory: {temp_dir}")
-            
-            # Build authenticated repo URL
-            repo_info = self.get_repo_info()
-            auth_url = f"https://{self.github_token}@github.com/{repo_info['owner']}/{repo_info['repo']}.git"
-            
-            # Clone repository (shallow clone for speed)
-            logger.info(f"Cloning repository: {repo_info['owner']}/{repo_info['repo']}")
-            repo = Repo.clone_from(
-                auth_url, 
-                temp_dir, 
-                depth=1, 
-                branch=self.base_branch
-            )
-            
-            # Create new branch
-            branch_name = self.create_branch_name(block_name)
-            logger.info(f"Creating branch: {branch_name}")
-            new_branch = repo.create_head(branch_name)
-            new_branch.checkout()
-            
-            # Prepare file paths
-            sanitized_name = self.sanitize_block_name(block_name)
-            block_dir = Path(temp_dir) / 'blocks' / sanitized_name
-            block_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Write files
-            files_written = []
-            
-            # Main EDS block files
-            if 'html' in files:
-                html_file = block_dir / 'index.html'
-                html_file.write_text(files['html'], encoding='utf-8')
-                files_written.append(str(html_file.relative_to(temp_dir)))
-            
-            if 'css' in files:
-                css_file = block_dir / 'styles.css'
-                css_file.write_text(files['css'], encoding='utf-8')
-                files_written.append(str(css_file.relative_to(temp_dir)))
-            
-            if 'js' in files:
-                js_file = block_dir / 'script.js'
-                js_file.write_text(files['js'], encoding='utf-8')
-                files_written.append(str(js_file.relative_to(temp_dir)))
-            
-            # Create README with metadata
-            readme_content = self.generate_readme(block_name, metadata, files)
-            readme_file = block_dir / 'README.md'
-            readme_file.write_text(readme_content, encoding='utf-8')
-            files_written.append(str(readme_file.relative_to(temp_dir)))
-            
-            # Stage files
-            repo.index.add(files_written)
-            
-            # Configure git user
-            with repo.config_writer() as git_config:
-                git_config.set_value("user", "name", self.author_name)
-                git_config.set_value("user", "email", self.author_email)
-            
-            # Commit
-            commit_message = f"Add EDS block: {block_name}\n\nGenerated by DXP Component Generator\nSession ID: {metadata.get('sessionId', 'unknown')}"
-            commit = repo.index.commit(commit_message)
-            
-            # Push to remote
-            logger.info(f"Pushing branch {branch_name} to remote")
-            origin = repo.remote('origin')
-            origin.push(branch_name)
-            
+            latest = {self.sanitize_block_name(block['block_name']): block for block in blocks}
+            block_files: Dict[str, str] = {}
+            statuses = []
+            for block in blocks:
+                sanitized_name = self.sanitize_block_name(block['block_name'])
+                status = {'block_name': block['block_name'], 'sanitized_name': sanitized_name}
+                if latest[sanitized_name] is not block:
+                    statuses.append({**status, 'status': 'superseded', 'files_written': []})
+                    continue
+                files = self.block_files(block['block_name'], block['files'], block.get('metadata') or {})
+                block_files.update(files)
+                statuses.append({**status, 'status': 'pushed', 'files_written': list(files)})
+            pushed = list(latest.values())
+
+            if follow_up:
+                branch_name, parent = follow_up['branch_name'], follow_up['commit_sha']
+            else:
+                branch_name, parent = self.create_branch_name(
+                    pushed[0]['block_name'] if len(pushed) == 1 else f"batch-{len(pushed)}-blocks"), None
+            commit_message = self._commit_message(pushed)
+
+            if push_mode == "worktree":
+                # GitPython blocks, so the git work runs in a thread; one push at a time per mirror
+                mirror = self.mirror_path()
+                async with _mirror_locks.setdefault(str(mirror), asyncio.Lock()):
+                    commit_sha = await asyncio.to_thread(
+                        self._commit_and_push, mirror, branch_name, block_files, commit_message, parent)
+            else:
+                commit_sha = await asyncio.to_thread(
+                    self._commit_via_data_api, self._data_backend(push_mode), branch_name, block_files,
+                    commit_message, parent)
+
+            if commit_sha is None:
+                unchanged_on = branch_name if follow_up else self.base_branch
+                logger.info(f"EDS blocks {', '.join(latest)} are unchanged on {unchanged_on}; nothing to push")
+                for status in statuses:
+                    if status['status'] == 'pushed':
+                        status['status'], status['files_written'] = 'unchanged', []
+                return {
+                    'success': True,
+                    'unchanged': True,
+                    'branch_name': unchanged_on,
+                    'commit_sha': parent or '',
+                    'files_written': [],
+                    'commit_url': self._web_url(f"commit/{parent}", push_mode) if parent else '',
+                    'branch_url': self._web_url(f"tree/{unchanged_on}", push_mode),
+                    'batch_size': len(pushed),
+                    'blocks': statuses,
+                    **self._pull_request_fields(follow_up)
+                }
+
             # Prepare result
             result = {
                 'success': True,
-                'block_name': block_name,
-                'sanitized_name': sanitized_name,
                 'branch_name': branch_name,
-                'commit_sha': commit.hexsha,
+                'commit_sha': commit_sha,
                 'commit_message': commit_message,
-                'files_written': files_written,
-                'commit_url': f"https://github.com/{repo_info['owner']}/{repo_info['repo']}/commit/{commit.hexsha}",
-                'branch_url': f"https://github.com/{repo_info['owner']}/{repo_info['repo']}/tree/{branch_name}"
+                'files_written': list(block_files),
+                'commit_url': self._web_url(f"commit/{commit_sha}", push_mode),
+                'branch_url': self._web_url(f"tree/{branch_name}", push_mode),
+                'batch_size': len(pushed),
+                'blocks': statuses
             }
             
-            # Create Pull Request if requested
-            if create_pr and self.github_client:
+            # Create Pull Request if requested; a follow-up commit lands in the earlier push's PR
+            if follow_up and follow_up.get('pull_request_url'):
+                result.update(self._pull_request_fields(follow_up))
+            elif create_pr and self.github_client and push_mode != "local":
                 try:
                     pr = await self.create_pull_request(
-                        repo_info, 
+                        self.get_repo_info(), 
                         branch_name, 
-                        block_name, 
-                        metadata
+                        pushed
                     )
                     result['pull_request_url'] = pr.html_url
                     result['pull_request_number'] = pr.number
@@ -182,29 +316,170 @@ class GitService:
             return result
             
         except Exception as e:
-            logger.error(f"Error pushing EDS block: {e}")
+            logger.error(f"Error pushing EDS blocks: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to push to Git: {str(e)}")
-        
+
+    @staticmethod
+    def _pull_request_fields(result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {key: value for key, value in (result or {}).items()
+                if key in ('pull_request_url', 'pull_request_number', 'pr_error')}
+
+    @staticmethod
+    def block_result(result: Dict[str, Any], index: int) -> Dict[str, Any]:
+        """One block's view of a batch result, in the single-block push response shape"""
+        block = result['blocks'][index]
+        batch = {key: value for key, value in result.items() if key != 'blocks'}
+        return {**batch, **block, 'unchanged': block['status'] == 'unchanged',
+                'batched_with': [b['block_name'] for i, b in enumerate(result['blocks']) if i != index]}
+
+    @staticmethod
+    def _commit_message(blocks: List[Dict[str, Any]]) -> str:
+        session_ids = sorted({str((block.get('metadata') or {}).get('sessionId', 'unknown')) for block in blocks})
+        if len(blocks) == 1:
+            title = f"Add EDS block: {blocks[0]['block_name']}"
+        else:
+            title = f"Add {len(blocks)} EDS blocks: {', '.join(block['block_name'] for block in blocks)}"
+        return f"{title}\n\nGenerated by DXP Component Generator\nSession ID: {', '.join(session_ids)}"
+
+    def _web_url(self, path: str, push_mode: str) -> str:
+        if push_mode == "local":
+            return ""
+        repo_info = self.get_repo_info()
+        return f"https://github.com/{repo_info['owner']}/{repo_info['repo']}/{path}"
+
+    def _data_backend(self, push_mode: str):
+        if push_mode == "local":
+            if not GIT_LOCAL_REPO:
+                raise ValueError("GIT_PUSH_MODE=local requires GIT_LOCAL_REPO")
+            return LocalBareRepoBackend(GIT_LOCAL_REPO)
+        if push_mode == "api":
+            repo_info = self.get_repo_info()
+            return GitHubDataBackend(self.github_client, f"{repo_info['owner']}/{repo_info['repo']}")
+        raise ValueError(f"Unknown GIT_PUSH_MODE: {push_mode}")
+
+    def _commit_via_data_api(self, backend, branch_name: str, block_files: Dict[str, str],
+                             commit_message: str, parent: Optional[str] = None) -> Optional[str]:
+        """
+        Create the block's blobs, a tree on top of the base branch's tree, a commit and the branch
+        ref, without any checkout. Returns None (and creates no commit) when the tree is unchanged.
+        With parent, the commit goes on top of that commit and moves the existing branch instead.
+        """
+        if parent:
+            base_commit, base_tree = backend.resolve_commit(parent)
+        else:
+            base_commit, base_tree = backend.resolve_branch(self.base_branch)
+        entries = {path: backend.create_blob(content) for path, content in block_files.items()}
+        tree = backend.create_tree(base_tree, entries)
+        if tree == base_tree:
+            return None
+        commit_sha = backend.create_commit(commit_message, tree, base_commit, self.author_name, self.author_email)
+        if parent:
+            logger.info(f"Moving branch {branch_name} to {commit_sha}")
+            backend.update_ref(branch_name, commit_sha, parent)
+        else:
+            logger.info(f"Creating branch {branch_name} at {commit_sha}")
+            backend.create_ref(branch_name, commit_sha)
+        return commit_sha
+
+    def _sync_mirror(self, mirror: Path) -> Repo:
+        """Open (or create) the bare mirror and fetch the base branch; only new objects are transferred"""
+        refspec = f"+refs/heads/{self.base_branch}:refs/heads/{self.base_branch}"
+        if mirror.exists():
+            repo = Repo(mirror)
+            # Drop worktrees left behind by a crashed push
+            repo.git.worktree("prune")
+            try:
+                started = time.perf_counter()
+                repo.git.fetch(self._auth_url(), refspec)
+                logger.info(f"Fetched {self.base_branch} into mirror in {time.perf_counter() - started:.2f}s")
+                return repo
+            except GitCommandError as e:
+                logger.warning(f"Fetch into mirror {mirror} failed, recreating it: {e}")
+                shutil.rmtree(mirror, ignore_errors=True)
+
+        logger.info(f"Creating mirror of {self.repo_url} at {mirror}")
+        mirror.parent.mkdir(parents=True, exist_ok=True)
+        repo = Repo.init(mirror, bare=True)
+        repo.git.fetch(self._auth_url(), refspec)
+        return repo
+
+    def _commit_and_push(self, mirror: Path, branch_name: str, block_files: Dict[str, str],
+                         commit_message: str, parent: Optional[str] = None) -> Optional[str]:
+        """
+        Commit the block on a new branch in a throwaway worktree of the mirror and push it. With
+        parent, the branch already exists at that commit and the new commit is pushed on top of it.
+        Returns None when the files are already committed.
+        """
+        repo = self._sync_mirror(mirror)
+        if parent:
+            try:
+                repo.git.cat_file("-e", f"{parent}^{{commit}}")
+            except GitCommandError:
+                # The mirror was recreated since the earlier push; fetch its branch back
+                repo.git.fetch(self._auth_url(), f"refs/heads/{branch_name}")
+        worktree_dir = mirror.with_suffix(".worktrees") / self.sanitize_block_name(branch_name)
+        if worktree_dir.exists():
+            shutil.rmtree(worktree_dir)
+        repo.git.worktree("add", "-b", branch_name, str(worktree_dir), parent or self.base_branch)
+        try:
+            worktree = Repo(worktree_dir)
+            for rel_path, content in block_files.items():
+                path = worktree_dir / rel_path
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(content, encoding='utf-8')
+            # Stage files
+            worktree.index.add(list(block_files))
+            if not worktree.index.diff("HEAD"):
+                return None
+            author = Actor(self.author_name, self.author_email)
+            commit = worktree.index.commit(commit_message, author=author, committer=author)
+
+            # Push to remote
+            logger.info(f"Pushing branch {branch_name} to remote")
+            worktree.git.push(self._auth_url(), f"{branch_name}:refs/heads/{branch_name}")
+            return commit.hexsha
         finally:
-            # Cleanup temp directory
-            if temp_dir and os.path.exists(temp_dir):
-                try:
-                    shutil.rmtree(temp_dir)
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup temp directory {temp_dir}: {e}")
+            try:
+                repo.git.worktree("remove", "--force", str(worktree_dir))
+                repo.git.branch("-D", branch_name)
+            except Exception as e:
+                logger.warning(f"Failed to cleanup worktree {worktree_dir}: {e}")
     
     async def create_pull_request(
         self, 
         repo_info: Dict[str, str], 
         branch_name: str, 
-        block_name: str, 
-        metadata: Dict[str, Any]
+        blocks: List[Dict[str, Any]]
     ):
         """Create a Pull Request using GitHub API"""
+        return await asyncio.to_thread(self._create_pull_request, repo_info, branch_name, blocks)
+
+    def _create_pull_request(self, repo_info: Dict[str, str], branch_name: str, blocks: List[Dict[str, Any]]):
+        # PyGithub is blocking
         github_repo = self.github_client.get_repo(f"{repo_info['owner']}/{repo_info['repo']}")
         
-        pr_title = f"Add EDS Block: {block_name}"
+        if len(blocks) == 1:
+            pr_title = f"Add EDS Block: {blocks[0]['block_name']}"
+        else:
+            pr_title = f"Add {len(blocks)} EDS Blocks: {', '.join(block['block_name'] for block in blocks)}"
+        sections = "\n\n".join(self._pr_block_section(block['block_name'], block.get('metadata') or {})
+                                for block in blocks)
         pr_body = f"""
+{sections}
+
+---
+*This PR was auto-generated by the DXP Component Generator. Please review the generated code before merging.*
+        """.strip()
+        
+        return github_repo.create_pull(
+            title=pr_title,
+            body=pr_body,
+            head=branch_name,
+            base=self.base_branch
+        )
+
+    def _pr_block_section(self, block_name: str, metadata: Dict[str, Any]) -> str:
+        return f"""
 ## New EDS Block: {block_name}
 
 **Generated by DXP Component Generator**
@@ -223,17 +498,7 @@ class GitService:
 - `blocks/{self.sanitize_block_name(block_name)}/styles.css` - Block styles
 - `blocks/{self.sanitize_block_name(block_name)}/script.js` - Block JavaScript
 - `blocks/{self.sanitize_block_name(block_name)}/README.md` - Documentation
-
----
-*This PR was auto-generated by the DXP Component Generator. Please review the generated code before merging.*
         """.strip()
-        
-        return github_repo.create_pull(
-            title=pr_title,
-            body=pr_body,
-            head=branch_name,
-            base=self.base_branch
-        )
     
     def generate_readme(self, block_name: str, metadata: Dict[str, Any], files: Dict[str, str]) -> str:
         """Generate README.md content for the EDS block"""
@@ -276,3 +541,101 @@ Add the block to your EDS page:
 *Generated by [DXP Component Generator](https://github.com/Vinodh-Projects/DXP-GEN-STUDIO)*
 """
         return readme
+
+
+@dataclass
+class _QueuedPush:
+    block: Dict[str, Any]
+    create_pr: bool
+    future: asyncio.Future = field(repr=False)
+
+
+class GitPushQueue:
+    """
+    Coalesces block pushes: the first submission opens a GIT_PUSH_BATCH_WINDOW_SECONDS window,
+    and everything submitted until it closes (or until GIT_PUSH_BATCH_MAX_BLOCKS are queued)
+    goes out as one branch, one commit and one PR. Each caller gets its own block's result.
+    When callers in one window push the same block, the window is split into rounds with each
+    block once: round 1 is committed on a new branch, and every later round is a follow-up
+    commit on top of the previous one on that same branch and in the same PR. Every caller's
+    code is in the branch history, and the PR holds the latest submission.
+    """
+
+    def __init__(self):
+        self._pending: List[_QueuedPush] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def submit(self, block_name: str, files: Dict[str, str], metadata: Dict[str, Any],
+                     create_pr: bool = True) -> Dict[str, Any]:
+        item = _QueuedPush({'block_name': block_name, 'files': files, 'metadata': metadata}, create_pr,
+                           asyncio.get_running_loop().create_future())
+        self._pending.append(item)
+        if len(self._pending) >= GIT_PUSH_BATCH_MAX_BLOCKS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after(GIT_PUSH_BATCH_WINDOW_SECONDS))
+        # Shielded: the batch goes out for everyone else even if this client goes away
+        return await asyncio.shield(item.future)
+
+    async def _flush_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._timer = None
+        self._flush()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._push_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    @staticmethod
+    def _rounds(service: "GitService", batch: List[_QueuedPush]) -> List[List[_QueuedPush]]:
+        """Split a window into rounds with each block name at most once, keeping submission order"""
+        rounds: List[List[_QueuedPush]] = []
+        names: List[Set[str]] = []
+        for item in batch:
+            name = service.sanitize_block_name(item.block['block_name'])
+            index = next((i for i, taken in enumerate(names) if name not in taken), len(rounds))
+            if index == len(rounds):
+                rounds.append([])
+                names.append(set())
+            rounds[index].append(item)
+            names[index].add(name)
+        return rounds
+
+    async def _push_batch(self, batch: List[_QueuedPush]) -> None:
+        try:
+            service = GitService()
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        rounds = self._rounds(service, batch)
+        logger.info(f"Pushing a batch of {len(batch)} EDS block(s) in {len(rounds)} commit(s)")
+        # Rounds go out in submission order, each one a commit on top of the last successful one
+        previous: Optional[Dict[str, Any]] = None
+        for round_items in rounds:
+            try:
+                follow_up = previous if previous and previous['branch_name'] != service.base_branch else None
+                result = await service.push_eds_blocks(
+                    [item.block for item in round_items], create_pr=any(item.create_pr for item in round_items),
+                    follow_up=follow_up)
+                previous = result
+            except Exception as e:
+                for item in round_items:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            for index, item in enumerate(round_items):
+                if not item.future.done():
+                    item.future.set_result(GitService.block_result(result, index))
+
+
+# Global push queue
+git_push_queue = GitPushQueue()
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long a duplicate waits for a run owned by another worker before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "600"))
+# An in-progress claim older than this belongs to a dead worker and may be taken over
+IDEMPOTENCY_STALE_SECONDS = float(os.getenv("IDEMPOTENCY_STALE_SECONDS", "1800"))
+IDEMPOTENCY_POLL_SECONDS = 2.0
+
+
+class IdempotencyConflict(Exception):
+    """The key cannot be honoured: reused with a different payload (422) or still running elsewhere (409)"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def idempotency_scope(user_id: Optional[str], endpoint: str, key: str) -> str:
+    """Keys are scoped per user and endpoint, so two users (or /generate and /refine) never collide"""
+    return f"{user_id or 'anonymous'}:{endpoint}:{key}"
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Hash of the request payload; a key replayed with a different payload is rejected"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = b""
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def generation_id_for(scope_key: str) -> str:
+    """Stable generation id for a key, so a retry after a dropped connection resumes from checkpoints"""
+    return hashlib.sha256(scope_key.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class _InFlight:
+    task: asyncio.Task
+    request_hash: str
+    waiters: int = 0
+
+
+class IdempotencyService:
+    """
+    Runs keyed requests at most once. Duplicates in this worker attach to the running task,
+    duplicates on other workers poll the stored record, and completed responses are replayed
+    from Mongo until the key's TTL expires. Only successful responses are stored: a failed
+    or cancelled run releases its key so the client's retry runs again.
+    """
+
+    def __init__(self):
+        self.storage = None
+        self._in_flight: Dict[str, _InFlight] = {}
+
+    def bind_storage(self, storage) -> None:
+        self.storage = storage
+
+    async def run(self, scope_key: str, request_hash: str,
+                  factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        in_flight = self._in_flight.get(scope_key)
+        if in_flight is not None:
+            self._check_payload(scope_key, in_flight.request_hash, request_hash)
+            logger.info(f"Idempotency key {scope_key}: attaching to the in-flight run")
+            return await self._wait(in_flight)
+
+        record = self._claim(scope_key, request_hash)
+        if record is not None:
+            self._check_payload(scope_key, record["request_hash"], request_hash)
+            if record["status"] == "completed":
+                logger.info(f"Idempotency key {scope_key}: replaying the stored result")
+                return record["result"]
+            return await self._wait_for_other_worker(scope_key, request_hash, factory)
+
+        in_flight = _InFlight(asyncio.ensure_future(self._execute(scope_key, factory)), request_hash)
+        self._in_flight[scope_key] = in_flight
+        return await self._wait(in_flight)
+
+    @staticmethod
+    def _check_payload(scope_key: str, stored_hash: str, request_hash: str) -> None:
+        if stored_hash != request_hash:
+            raise IdempotencyConflict(
+                f"Idempotency key {scope_key.rsplit(':', 1)[-1]} was already used with a different request", 422)
+
+    def _claim(self, scope_key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+        if self.storage is None:
+            return None
+        try:
+            return self.storage.claim_idempotency_key(scope_key, request_hash)
+        except Exception as e:
+            # Storage trouble shouldn't block generation; dedupe falls back to this worker only
+            logger.error(f"Failed to claim idempotency key {scope_key}: {e}")
+            return None
+
+    async def _execute(self, scope_key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        try:
+            result = await factory()
+            if self.storage is not None:
+                if result.get("success"):
+                    self.storage.complete_idempotency_key(scope_key, result)
+                else:
+                    self.storage.release_idempotency_key(scope_key)
+            return result
+        except BaseException:
+            if self.storage is not None:
+                self.storage.release_idempotency_key(scope_key)
+            raise
+        finally:
+            self._in_flight.pop(scope_key, None)
+
+    async def _wait(self, in_flight: _InFlight) -> Dict[str, Any]:
+        in_flight.waiters += 1
+        try:
+            # Shielded: one client disconnecting must not cancel a run others are waiting on
+            return await asyncio.shield(in_flight.task)
+        finally:
+            in_flight.waiters -= 1
+            if in_flight.waiters == 0 and not in_flight.task.done():
+                logger.info("Every client waiting on an idempotent run disconnected; cancelling it")
+                in_flight.task.cancel()
+
+    async def _wait_for_other_worker(self, scope_key: str, request_hash: str,
+                                     factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        logger.info(f"Idempotency key {scope_key}: run in progress on another worker, waiting for it")
+        deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+            record = self.storage.get_idempotency_record(scope_key)
+            if record is None:
+                # The other run failed and released the key: run it here
+                return await self.run(scope_key, request_hash, factory)
+            if record["status"] == "completed":
+                return record["result"]
+            stale_before = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_STALE_SECONDS)
+            if record["created_at"] and record["created_at"] < stale_before:
+                logger.warning(f"Idempotency key {scope_key}: taking over a stale in-progress claim")
+                self.storage.release_idempotency_key(scope_key, claimed_before=stale_before)
+                return await self.run(scope_key, request_hash, factory)
+        raise IdempotencyConflict("A request with this idempotency key is still being processed", 409)
+
+
+# Global idempotency service
+idempotency_service = IdempotencyService()
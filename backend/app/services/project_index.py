@@ -0,0 +1,281 @@
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between filesystem rescans; files written by the backend are indexed immediately
+PROJECT_INDEX_REFRESH_SECONDS = float(os.getenv("PROJECT_INDEX_REFRESH_SECONDS", "10"))
+# Existing models/components summarised into agent prompts
+PROJECT_CONTEXT_MAX_ITEMS = int(os.getenv("PROJECT_CONTEXT_MAX_ITEMS", "5"))
+
+MODELS_SUBDIR = "core/src/main/java/com/adobe/aem/guides/wknd/core/models"
+APPS_SUBDIR = "ui.apps/src/main/content/jcr_root/apps/wknd"
+COMPONENTS_SUBDIR = f"{APPS_SUBDIR}/components"
+
+JAVA_TYPE_PATTERN = re.compile(r"\bpublic\s+(?:abstract\s+|final\s+)*(class|interface)\s+(\w+)")
+PACKAGE_PATTERN = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+GETTER_PATTERN = re.compile(r"\b(?:get|is)([A-Z]\w*)\s*\(\s*\)")
+VALUE_MAP_FIELD_PATTERN = re.compile(r"@ValueMapValue[^;]*?\s(\w+)\s*(?:=[^;]*)?;", re.DOTALL)
+# Only Java classes (package.Class); HTL templates and JS use-objects are not models
+SLY_USE_PATTERN = re.compile(r'data-sly-use\.\w+\s*=\s*"((?:[a-z]\w*\.)+[A-Z]\w*)"')
+CATEGORIES_PATTERN = re.compile(r'\bcategories\s*=\s*"\[([^\]]*)\]"')
+DIALOG_FIELD_PATTERN = re.compile(r'\bname\s*=\s*"\./([\w:/-]+)"')
+TITLE_PATTERN = re.compile(r'\bjcr:title\s*=\s*"([^"]*)"')
+SUPER_TYPE_PATTERN = re.compile(r'\bsling:resourceSuperType\s*=\s*"([^"]*)"')
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9]{2,}")
+
+
+def _words(text: str) -> Set[str]:
+    """Lower-case words of prose or camelCase identifiers"""
+    return set(WORD_PATTERN.findall(re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", text).lower()))
+
+
+@dataclass
+class ModelEntry:
+    name: str
+    path: str
+    kind: str
+    package: str
+    properties: List[str] = field(default_factory=list)
+
+    @property
+    def fqn(self) -> str:
+        return f"{self.package}.{self.name}" if self.package else self.name
+
+
+@dataclass
+class ComponentEntry:
+    name: str
+    path: str
+    title: str = ""
+    super_type: str = ""
+    models: List[str] = field(default_factory=list)
+    dialog_fields: List[str] = field(default_factory=list)
+    clientlib_categories: List[str] = field(default_factory=list)
+
+
+class ProjectIndex:
+    """
+    In-memory index of the generated AEM project: components, Sling Models, dialog fields and
+    clientlib categories. The tree is walked at most every PROJECT_INDEX_REFRESH_SECONDS and
+    only files whose mtime changed are re-parsed; lookups are dict hits.
+    """
+
+    def __init__(self, root_provider: Callable[[], Path]):
+        self._root_provider = root_provider
+        self._lock = threading.RLock()
+        self._root: Optional[Path] = None
+        # path -> (mtime_ns, parsed facts) for every indexed file
+        self._files: Dict[str, Tuple[int, dict]] = {}
+        self._refreshed_at = 0.0
+        self.models: Dict[str, ModelEntry] = {}
+        self.components: Dict[str, ComponentEntry] = {}
+        self.clientlib_categories: Dict[str, List[str]] = {}
+        # Model simple name -> components whose HTL uses it
+        self.model_users: Dict[str, Set[str]] = {}
+
+    # --- maintenance -------------------------------------------------------------------------------
+
+    def ensure_fresh(self, force: bool = False) -> None:
+        with self._lock:
+            root = self._root_provider()
+            if root != self._root:
+                # PROJECT_CODE_DIR changed (tests, benchmarks): start over
+                self._root, self._files, self._refreshed_at = root, {}, 0.0
+            if not force and time.monotonic() - self._refreshed_at < PROJECT_INDEX_REFRESH_SECONDS:
+                return
+            started = time.perf_counter()
+            seen: Set[str] = set()
+            changed = False
+            for path in self._tracked_files(root):
+                key = str(path)
+                seen.add(key)
+                changed |= self._index_file(path)
+            for key in set(self._files) - seen:
+                del self._files[key]
+                changed = True
+            if changed:
+                self._rebuild()
+            self._refreshed_at = time.monotonic()
+            logger.debug(f"Project index refreshed in {(time.perf_counter() - started) * 1000:.1f} ms "
+                         f"({len(self.components)} components, {len(self.models)} models)")
+
+    def update_files(self, paths: Iterable[Path]) -> None:
+        """Index files the backend just wrote without waiting for the next rescan"""
+        with self._lock:
+            if self._root is None:
+                self.ensure_fresh(force=True)
+                return
+            if any([self._index_file(Path(path)) for path in paths]):
+                self._rebuild()
+
+    def _tracked_files(self, root: Path) -> Iterable[Path]:
+        models_dir = root / MODELS_SUBDIR
+        if models_dir.is_dir():
+            yield from models_dir.rglob("*.java")
+        apps_dir = root / APPS_SUBDIR
+        if apps_dir.is_dir():
+            for dirpath, _, filenames in os.walk(apps_dir):
+                for filename in filenames:
+                    if filename.endswith((".html", ".xml")):
+                        yield Path(dirpath) / filename
+
+    def _index_file(self, path: Path) -> bool:
+        """Parse a file when it is new or its mtime moved; True when the index changed"""
+        key = str(path)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return self._files.pop(key, None) is not None
+        cached = self._files.get(key)
+        if cached and cached[0] == mtime:
+            return False
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError as e:
+            logger.warning(f"Project index could not read {path}: {e}")
+            return False
+        self._files[key] = (mtime, self._parse(path, text))
+        return True
+
+    def _parse(self, path: Path, text: str) -> dict:
+        if path.suffix == ".java":
+            match = JAVA_TYPE_PATTERN.search(text)
+            if not match:
+                return {}
+            package = PACKAGE_PATTERN.search(text)
+            properties = VALUE_MAP_FIELD_PATTERN.findall(text) or [
+                getter[0].lower() + getter[1:] for getter in GETTER_PATTERN.findall(text)]
+            return {"model": ModelEntry(match.group(2), key_path(self._root, path), match.group(1),
+                                        package.group(1) if package else "", list(dict.fromkeys(properties)))}
+
+        facts: dict = {}
+        if path.suffix == ".html":
+            facts["uses"] = SLY_USE_PATTERN.findall(text)
+        elif "cq:ClientLibraryFolder" in text:
+            categories = CATEGORIES_PATTERN.search(text)
+            if categories:
+                facts["categories"] = [c.strip() for c in categories.group(1).split(",") if c.strip()]
+        elif "cq:Component" in text:
+            title = TITLE_PATTERN.search(text)
+            super_type = SUPER_TYPE_PATTERN.search(text)
+            facts["component"] = {"title": title.group(1) if title else "",
+                                  "super_type": super_type.group(1) if super_type else ""}
+        elif "cq/gui/components/authoring/dialog" in text:
+            facts["dialog_fields"] = DIALOG_FIELD_PATTERN.findall(text)
+        return facts
+
+    def _rebuild(self) -> None:
+        """Derive the lookup tables from the per-file facts (in memory, no I/O)"""
+        components_dir = self._root / COMPONENTS_SUBDIR
+        models: Dict[str, ModelEntry] = {}
+        components: Dict[str, ComponentEntry] = {}
+        categories: Dict[str, List[str]] = {}
+        model_users: Dict[str, Set[str]] = {}
+
+        for key, (_, facts) in self._files.items():
+            path = Path(key)
+            if "model" in facts:
+                models[facts["model"].name] = facts["model"]
+                continue
+            for category in facts.get("categories", []):
+                categories.setdefault(category, []).append(key_path(self._root, path.parent))
+            try:
+                component_name = path.relative_to(components_dir).parts[0]
+            except (ValueError, IndexError):
+                continue
+            if component_name == path.name:
+                continue
+            entry = components.setdefault(component_name, ComponentEntry(
+                component_name, key_path(self._root, components_dir / component_name)))
+            if "component" in facts and path.parent.name == component_name:
+                entry.title = facts["component"]["title"]
+                entry.super_type = facts["component"]["super_type"]
+            entry.dialog_fields.extend(facts.get("dialog_fields", []))
+            entry.clientlib_categories.extend(facts.get("categories", []))
+            for fqn in facts.get("uses", []):
+                model_name = fqn.rsplit(".", 1)[-1]
+                entry.models.append(model_name)
+                model_users.setdefault(model_name, set()).add(component_name)
+
+        self.models, self.components = models, components
+        self.clientlib_categories, self.model_users = categories, model_users
+
+    # --- queries -----------------------------------------------------------------------------------
+
+    def has_component(self, name: str) -> bool:
+        return name in self.components
+
+    def has_model(self, name: str) -> bool:
+        return name in self.models
+
+    def model_conflict(self, model_name: str, component_name: str) -> Optional[str]:
+        """
+        Why writing model_name for component_name would clobber someone else's model, or None.
+        A model belongs to the components whose HTL uses it; regenerating one of them is not a conflict.
+        """
+        if model_name not in self.models:
+            return None
+        users = self.model_users.get(model_name, set())
+        if component_name in users:
+            return None
+        owners = ", ".join(sorted(users)) or "no component"
+        return f"Sling Model {model_name} already exists ({self.models[model_name].path}, used by {owners})"
+
+    def free_model_name(self, model_name: str) -> str:
+        suffix = 2
+        while f"{model_name}{suffix}" in self.models:
+            suffix += 1
+        return f"{model_name}{suffix}"
+
+    def prompt_context(self, user_prompt: str, max_items: int = PROJECT_CONTEXT_MAX_ITEMS) -> str:
+        """
+        Compact description of the existing project for agent prompts: names that are taken,
+        plus the components and models that share the most words with the request.
+        """
+        if not self.models and not self.components:
+            return ""
+        wanted = _words(user_prompt)
+
+        def score(*texts: str) -> int:
+            return len(wanted & set().union(*(_words(text) for text in texts)))
+
+        ranked_components = sorted(
+            ((score(c.name, c.title, " ".join(c.dialog_fields)), c) for c in self.components.values()),
+            key=lambda item: (-item[0], item[1].name))
+        ranked_models = sorted(
+            ((score(m.name, " ".join(m.properties)), m) for m in self.models.values()),
+            key=lambda item: (-item[0], item[1].name))
+
+        lines = [
+            f"Existing component names (do not reuse): {', '.join(sorted(self.components))}",
+            f"Existing Sling Model names (do not reuse): {', '.join(sorted(self.models))}",
+        ]
+        relevant = [c for s, c in ranked_components[:max_items] if s]
+        if relevant:
+            lines.append("Related existing components:")
+            for c in relevant:
+                details = [f"models {', '.join(c.models)}" if c.models else "",
+                           f"dialog fields {', '.join(c.dialog_fields[:12])}" if c.dialog_fields else "",
+                           f"extends {c.super_type}" if c.super_type else ""]
+                lines.append(f"- {c.name} ({c.title or c.name}): {'; '.join(d for d in details if d) or 'no model'}")
+        relevant_models = [m for s, m in ranked_models[:max_items] if s]
+        if relevant_models:
+            lines.append("Related existing Sling Models:")
+            for m in relevant_models:
+                lines.append(f"- {m.fqn} ({m.kind}): {', '.join(m.properties[:12]) or 'no properties'}")
+        return "\n".join(lines)
+
+
+def key_path(root: Optional[Path], path: Path) -> str:
+    """Project-relative posix path used in index entries"""
+    try:
+        return path.relative_to(root).as_posix()
+    except (ValueError, TypeError):
+        return path.as_posix()
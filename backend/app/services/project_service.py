@@ -1,11 +1,15 @@
+import asyncio
+import hashlib
 import os
 import json
 import re
 import shutil
-import subprocess
+import time
+import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
 
-from typing import Dict, Any, Coroutine
+from typing import Dict, Any, List, Optional, Union
 from dotenv import load_dotenv
 
 import logging
@@ -27,74 +31,252 @@ logger.setLevel(logging.INFO)
 
 model = os.getenv("MODEL_PROVIDER", "gemini")  # Default to OpenAI if not set
 
+OUTPUT_BASE = Path(__file__).parent.parent.parent.parent / "output"
+# Generated skeletons, keyed by archetype version and parameters
+ARCHETYPE_CACHE_DIR = Path(os.getenv("ARCHETYPE_CACHE_DIR") or OUTPUT_BASE / ".archetype-cache")
+# Opt-in: hard-link cached files into the output instead of copying them. Anything that edits
+# output files in place (IDEs, sed, build plugins) then modifies the shared cache as well.
+ARCHETYPE_CACHE_HARDLINK = os.getenv("ARCHETYPE_CACHE_HARDLINK", "false").lower() == "true"
+MAVEN_TIMEOUT_SECONDS = float(os.getenv("MAVEN_TIMEOUT_SECONDS", "300"))
+# Finished jobs are kept this long for status and log queries
+PROJECT_JOB_TTL_SECONDS = float(os.getenv("PROJECT_JOB_TTL_SECONDS", "3600"))
+MAX_JOB_LOG_LINES = 10000
+
+# Request field -> archetype parameter; the default applies when the request omits the field
+PROJECT_PARAMS = {
+    "aem_version": ("aemVersion", "cloud"),
+    "archetype_version": ("archetypeVersion", "42"),
+    "app_title": ("appTitle", "My AEM Project"),
+    "app_id": ("appId", "myapp"),
+    "group_id": ("groupId", "com.mycompany"),
+    "artifact_id": ("artifactId", "myapp-project"),
+    "package": ("package", "com.mycompany.myapp"),
+    "version": ("version", "0.0.1-SNAPSHOT"),
+}
+ARTIFACT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def normalize_project_params(payload: Union[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Accept snake_case (API model) or camelCase (frontend form) keys; fill in archetype defaults"""
+    data = json.loads(payload) if isinstance(payload, str) else dict(payload)
+    params = {}
+    for name, (camel_name, default) in PROJECT_PARAMS.items():
+        value = data.get(name) if data.get(name) not in (None, "") else data.get(camel_name)
+        params[name] = str(value) if value not in (None, "") else default
+    if not ARTIFACT_ID_PATTERN.match(params["artifact_id"]):
+        raise ValueError(f"Invalid artifactId: {params['artifact_id']}")
+    return params
+
+
+def skeleton_key(params: Dict[str, str]) -> str:
+    """Cache key of a skeleton: archetype version plus every parameter that shapes the generated tree"""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"v{params['archetype_version']}-{digest}"
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem or links unsupported
+        shutil.copy2(src, dst)
+
+
+def materialize_tree(source: Path, target: Path) -> None:
+    """
+    Copy (hard-linking where possible) a cached skeleton to target. The new tree is staged beside
+    the target and swapped in, so an existing project is only removed once the copy succeeded.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+    shutil.copytree(source, staging, copy_function=_link_or_copy if ARCHETYPE_CACHE_HARDLINK else shutil.copy2)
+    previous = None
+    if target.exists():
+        previous = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.old")
+        os.replace(target, previous)
+    os.replace(staging, target)
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+@dataclass
+class ProjectJob:
+    job_id: str
+    params: Dict[str, str]
+    status: str = "queued"  # queued | running | succeeded | failed
+    cache_hit: bool = False
+    output_dir: Optional[str] = None
+    error: Optional[str] = None
+    details: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    log_lines: List[str] = field(default_factory=list)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    updated: asyncio.Condition = field(default_factory=asyncio.Condition, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    async def log(self, line: str) -> None:
+        if len(self.log_lines) < MAX_JOB_LOG_LINES:
+            self.log_lines.append(line)
+        elif len(self.log_lines) == MAX_JOB_LOG_LINES:
+            self.log_lines.append("... log truncated ...")
+        async with self.updated:
+            self.updated.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "cache_hit": self.cache_hit,
+            "outputDir": self.output_dir,
+            "error": self.error,
+            "details": self.details,
+            "params": self.params,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "log_lines": len(self.log_lines),
+        }
+
+    def result(self) -> Dict[str, Any]:
+        """Response shape of the original synchronous endpoint"""
+        if self.status == "succeeded":
+            return {
+                'success': True,
+                'outputDir': self.output_dir,
+                'message': 'AEM project generated successfully',
+                'job_id': self.job_id,
+                'cache_hit': self.cache_hit
+            }
+        return {"success": False, "error": self.error or "Project generation failed.",
+                "details": self.details, "job_id": self.job_id}
+
+
 class ProjectService:
     def __init__(self):
         # Load environment variables first
         load_dotenv()
 
         logger.info(f"In ProjectService")
-    async def generate_project_structure(self, payload: str) -> dict[str, str] | dict[str, bool | str]:
-
-        logger.info(f"In ComponentService generate_component :: payload :: {payload}")
+        self.jobs: Dict[str, ProjectJob] = {}
+        # One Maven run per skeleton key; concurrent requests for the same key wait and hit the cache
+        self._build_locks: Dict[str, asyncio.Lock] = {}
 
+    async def generate_project_structure(self, payload: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Generate a project and wait for it without blocking the event loop"""
+        logger.info(f"In ProjectService generate_project_structure :: payload :: {payload}")
         try:
-            data = json.loads(payload)
-
-            # Extract parameters from payload
-            aem_version = data.get('aemVersion', 'cloud')
-            archetype_version = data.get('archetypeVersion', '42')
-            app_title = data.get('appTitle', 'My AEM Project')
-            app_id = data.get('appId', 'myapp')
-            group_id = data.get('groupId', 'com.mycompany')
-            artifact_id = data.get('artifactId', 'myapp-project')
-            package = data.get('package', 'com.mycompany.myapp')
-            version = data.get('version', '0.0.1-SNAPSHOT')
-
-            # Maven archetype command
-            mvn_cmd = [
-                'mvn', 'archetype:generate',
-                '-DarchetypeGroupId=com.adobe.aem',
-                '-DarchetypeArtifactId=aem-project-archetype',
-                f'-DarchetypeVersion={archetype_version}',
-                f'-DgroupId={group_id}',
-                f'-DartifactId={artifact_id}',
-                f'-Dversion={version}',
-                f'-Dpackage={package}',
-                f'-DappTitle={app_title}',
-                f'-DappId={app_id}',
-                f'-DaemVersion={aem_version}',
-                '-DinteractiveMode=false'
-            ]
-
-            output_base = Path(__file__).parent.parent.parent.parent / "output"
-
-            project_output_dir = os.path.join(output_base, artifact_id)
-
-            # Remove existing directory if it exists
-            if os.path.exists(project_output_dir):
-                shutil.rmtree(project_output_dir)
-
-            # Execute Maven command in output directory
-            result = subprocess.run(
-                mvn_cmd,
-                cwd=output_base,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
-
-            if result.returncode != 0:
-                return {
-                    'error': 'Maven archetype generation failed',
-                    'details': result.stderr
-                }
+            job = self.start_job(payload)
+        except Exception as e:
+            logger.error(f"Project generation failed: {str(e)}")
+            return {"success": False, "error": "Project generation failed.", "details": str(e)}
+        await asyncio.shield(job.task)
+        return job.result()
 
-            return {
-                'success': True,
-                'outputDir': project_output_dir,
-                'message': 'AEM project generated successfully'
-            }
+    def start_job(self, payload: Union[str, Dict[str, Any]]) -> ProjectJob:
+        """Queue archetype generation; progress is visible through get_job and stream_job_log"""
+        self._prune_jobs()
+        job = ProjectJob(job_id=uuid.uuid4().hex, params=normalize_project_params(payload))
+        job.task = asyncio.create_task(self._run_job(job))
+        self.jobs[job.job_id] = job
+        return job
 
+    def get_job(self, job_id: str) -> Optional[ProjectJob]:
+        return self.jobs.get(job_id)
+
+    async def stream_job_log(self, job_id: str):
+        """Yield the job's Maven output line by line, following it until the job finishes"""
+        job = self.jobs[job_id]
+        sent = 0
+        while True:
+            async with job.updated:
+                await job.updated.wait_for(lambda: len(job.log_lines) > sent or job.done)
+            while sent < len(job.log_lines):
+                yield job.log_lines[sent] + "\n"
+                sent += 1
+            if job.done and sent >= len(job.log_lines):
+                yield f"[job {job.status}]\n"
+                return
+
+    def _prune_jobs(self) -> None:
+        cutoff = time.time() - PROJECT_JOB_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def _run_job(self, job: ProjectJob) -> None:
+        params = job.params
+        key = skeleton_key(params)
+        cached_skeleton = ARCHETYPE_CACHE_DIR / key / params["artifact_id"]
+        target = OUTPUT_BASE / params["artifact_id"]
+        job.status = "running"
+        try:
+            lock = self._build_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                if cached_skeleton.is_dir():
+                    job.cache_hit = True
+                    await job.log(f"Using cached skeleton {key}")
+                else:
+                    await self._run_maven(job, key)
+            await job.log(f"Materializing project at {target}")
+            await asyncio.to_thread(materialize_tree, cached_skeleton, target)
+            job.output_dir = str(target)
+            job.status = "succeeded"
         except Exception as e:
-            logger.error(f"Project generation failed: {str(e)}")
-            return {"success": False, "error": "Project generation failed.", "details": str(e)}
\ No newline at end of file
+            logger.error(f"Project generation job {job.job_id} failed: {str(e)}")
+            job.status = "failed"
+            job.error = job.error or "Project generation failed."
+            job.details = job.details or str(e)
+        finally:
+            job.finished_at = time.time()
+            job.status = job.status if job.done else "failed"
+            await job.log(f"Job finished: {job.status}")
+
+    async def _run_maven(self, job: ProjectJob, key: str) -> None:
+        """Run mvn archetype:generate into a scratch dir, streaming its output, then publish it to the cache"""
+        params = job.params
+        # Maven archetype command
+        mvn_cmd = [
+            'mvn', '-B', 'archetype:generate',
+            '-DarchetypeGroupId=com.adobe.aem',
+            '-DarchetypeArtifactId=aem-project-archetype',
+            f'-DarchetypeVersion={params["archetype_version"]}',
+            f'-DgroupId={params["group_id"]}',
+            f'-DartifactId={params["artifact_id"]}',
+            f'-Dversion={params["version"]}',
+            f'-Dpackage={params["package"]}',
+            f'-DappTitle={params["app_title"]}',
+            f'-DappId={params["app_id"]}',
+            f'-DaemVersion={params["aem_version"]}',
+            '-DinteractiveMode=false'
+        ]
+        scratch = ARCHETYPE_CACHE_DIR / f".build-{job.job_id}"
+        scratch.mkdir(parents=True, exist_ok=True)
+        try:
+            await job.log("$ " + " ".join(mvn_cmd))
+            process = await asyncio.create_subprocess_exec(
+                *mvn_cmd, cwd=scratch, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            try:
+                await asyncio.wait_for(self._pump_output(job, process), timeout=MAVEN_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                process.kill()
+                await process.wait()
+                job.error = "Maven archetype generation timed out"
+                raise
+            if process.returncode != 0:
+                job.error = 'Maven archetype generation failed'
+                job.details = "\n".join(job.log_lines[-40:])
+                raise RuntimeError(f"mvn exited with status {process.returncode}")
+            # Publish atomically: a half-written skeleton is never visible under the cache key
+            os.replace(scratch, ARCHETYPE_CACHE_DIR / key)
+            await job.log(f"Cached skeleton as {key}")
+        finally:
+            if scratch.exists():
+                await asyncio.to_thread(shutil.rmtree, scratch, True)
+
+    @staticmethod
+    async def _pump_output(job: ProjectJob, process: asyncio.subprocess.Process) -> None:
+        async for raw_line in process.stdout:
+            await job.log(raw_line.decode("utf-8", errors="replace").rstrip())
+        await process.wait()
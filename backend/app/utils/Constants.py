@@ -15,4 +15,32 @@ MODEL_SELECTOR = {
 
 AEM_BLOCK_COLLECTION_URL = "https://cdn.jsdelivr.net/gh/adobe/aem-block-collection@main"
 
-DEFAULT_BLOCKS_LIST = "accordion,cards,carousel,columns,embed,footer,form,fragment,header,hero,modal,quote,search,table,tabs,video"
\ No newline at end of file
+DEFAULT_BLOCKS_LIST = "accordion,cards,carousel,columns,embed,footer,form,fragment,header,hero,modal,quote,search,table,tabs,video"
+
+# Completion token budget per agent. Overridable with LLM_MAX_TOKENS_<AGENT> env vars,
+# e.g. LLM_MAX_TOKENS_EDS_GENERATE=8192. None leaves OpenAI and Groq calls uncapped (the
+# model's own output limit), which the code-emitting agents need: a truncated response is
+# invalid JSON. Anthropic requires a limit and falls back to ANTHROPIC_MAX_TOKENS.
+AGENT_MAX_TOKENS = {
+    "default": None,
+    "eds_extract": 1000,
+    "eds_extract_batch": 4096,
+}
+
+# Approximate list prices in USD per 1M tokens, used for cost accounting of LLM calls.
+# Keys are matched as model-name prefixes (longest match wins), so dated snapshots such as
+# "gpt-4o-2024-08-06" resolve to their family. Update when provider pricing changes.
+MODEL_PRICING = {
+    "gpt-3.5-turbo": {"input": 0.50, "cached_input": 0.50, "cache_write": 0.50, "output": 1.50},
+    "gpt-4": {"input": 30.00, "cached_input": 30.00, "cache_write": 30.00, "output": 60.00},
+    "gpt-4-turbo": {"input": 10.00, "cached_input": 10.00, "cache_write": 10.00, "output": 30.00},
+    "gpt-4o": {"input": 2.50, "cached_input": 1.25, "cache_write": 2.50, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "cache_write": 0.15, "output": 0.60},
+    "o1-preview": {"input": 15.00, "cached_input": 7.50, "cache_write": 15.00, "output": 60.00},
+    "o1-mini": {"input": 3.00, "cached_input": 1.50, "cache_write": 3.00, "output": 12.00},
+    "claude-3-5-sonnet": {"input": 3.00, "cached_input": 0.30, "cache_write": 3.75, "output": 15.00},
+    "claude-3-5-haiku": {"input": 0.80, "cached_input": 0.08, "cache_write": 1.00, "output": 4.00},
+    "gemini-pro": {"input": 0.50, "cached_input": 0.50, "cache_write": 0.50, "output": 1.50},
+    "gemini-1.5-pro": {"input": 1.25, "cached_input": 0.3125, "cache_write": 1.25, "output": 5.00},
+    "llama3-70b-8192": {"input": 0.59, "cached_input": 0.59, "cache_write": 0.59, "output": 0.79},
+}
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable
+
+from starlette.requests import Request
+
+from app.utils.telemetry import CLIENT_DISCONNECTS
+
+logger = logging.getLogger(__name__)
+
+# How often a long-running route checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "1.0"))
+# Status logged for abandoned requests (nginx's "client closed request"); the client never sees it
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the response was ready"""
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[Any],
+                               poll_interval: float = DISCONNECT_POLL_SECONDS) -> Any:
+    """
+    Await the work as a task while polling the connection. When the client goes away the task
+    is cancelled (aborting in-flight provider requests), its cleanup handlers are awaited, and
+    ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                route = getattr(request.scope.get("route"), "path", request.url.path)
+                logger.info(f"Client disconnected from {request.method} {route}; cancelling the request's work")
+                CLIENT_DISCONNECTS.labels(route).inc()
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnected(route)
+    finally:
+        if not task.done():
+            # The route itself was cancelled (e.g. server shutdown)
+            task.cancel()
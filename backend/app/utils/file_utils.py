@@ -0,0 +1,56 @@
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# Mode open() gives new files. os.umask can only be read by setting it, which is not thread-safe,
+# so it is read once at import.
+_umask = os.umask(0)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_if_changed(path: Path, content: str) -> Tuple[str, bool]:
+    """
+    Write text atomically (temp file in the same directory, then os.replace) unless the file
+    already holds exactly this content. Returns (sha256, written). Readers never see a partial
+    file, and unchanged files keep their mtime so Maven, IDEs and file watchers stay quiet.
+    """
+    data = content.encode("utf-8")
+    sha256 = hashlib.sha256(data).hexdigest()
+    if path.is_file() and path.stat().st_size == len(data) and file_sha256(path) == sha256:
+        return sha256, False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        mode = path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the mode a plain write would have left
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return sha256, True
@@ -1,4 +1,4 @@
-import os, requests, re, json, logging
+import os, requests, re, json, logging, time
 from datetime import datetime
 from typing import Dict, Any
 
@@ -7,9 +7,11 @@ from bs4 import BeautifulSoup
 from fastapi.logger import logger
 
 from app.utils.Constants import MODEL_SELECTOR, AEM_BLOCK_COLLECTION_URL
+from app.utils.llm_replay import replay_provider, messages_to_prompt
+from app.utils.openai_client import get_max_tokens, get_openai_client, max_tokens_kwargs
+from app.utils.usage_tracker import usage_tracker
 from jinja2 import Environment, FileSystemLoader
-from openai import OpenAI
-from typing import List, Union
+from typing import List, Optional, Union
 
 env = Environment(loader=FileSystemLoader("app/templates"))
 
@@ -91,31 +93,117 @@ class HelperUtils:
 
 
     @staticmethod
-    def call_openai(
+    async def call_openai(
             messages:List[Message],
             model: str = MODEL_SELECTOR.get("GPT_4o"),
             temperature: float = 0.7,
-            max_tokens: int = 1000
+            max_tokens: Optional[int] = None,
+            agent_name: str = "eds"
     ) -> ChatCompletion:
-        """Calls OpenAI chat completion using the new OpenAI client SDK."""
+        """Calls OpenAI chat completion through the shared pooled async client."""
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        if replay_provider.replaying:
+            started = time.perf_counter()
+            response = await replay_provider.complete(agent_name, *messages_to_prompt(messages))
+            usage_tracker.record(response, agent_name, "replay", model, (time.perf_counter() - started) * 1000)
+            return response
 
-        client = OpenAI(api_key=api_key)
+        client = get_openai_client()
 
+        started = time.perf_counter()
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                **max_tokens_kwargs(max_tokens or get_max_tokens(agent_name))
             )
-            return response
         except Exception as e:
+            usage_tracker.record(None, agent_name, "openai", model, (time.perf_counter() - started) * 1000, success=False)
             raise RuntimeError(f"OpenAI API call failed: {e}")
 
+        if replay_provider.recording:
+            replay_provider.record(agent_name, *messages_to_prompt(messages), response)
+
+        usage_tracker.record(response, agent_name, "openai", model, (time.perf_counter() - started) * 1000)
+        return response
+
+    @staticmethod
+    def extract_text(response_obj: Any) -> str:
+        """Returns the text content of OpenAI/Groq, Gemini or Anthropic responses."""
+        try:
+            # OpenAI/Groq
+            if hasattr(response_obj, 'choices'):
+                return response_obj.choices[0].message.content
+            # Gemini
+            elif hasattr(response_obj, 'text'):
+                return response_obj.text  # google-generativeai response
+            # Anthropic messages
+            elif hasattr(response_obj, 'content') and isinstance(response_obj.content, list):
+                blocks = []
+                for block in response_obj.content:
+                    if isinstance(block, dict):
+                        if block.get('type') == 'text' and 'text' in block:
+                            blocks.append(block['text'])
+                    else:
+                        # SDK models may provide objects with .type/.text
+                        t = getattr(block, 'type', None)
+                        txt = getattr(block, 'text', None)
+                        if t == 'text' and txt:
+                            blocks.append(txt)
+                return "\n".join(blocks) if blocks else str(response_obj)
+            return str(response_obj)
+        except Exception:
+            return str(response_obj)
+
+    @staticmethod
+    def extract_usage(response: Any) -> Dict[str, int]:
+        """
+        Normalises the token usage block of OpenAI/Groq, Anthropic and Gemini responses.
+        cached_tokens are prompt tokens served from the provider's prompt cache,
+        cache_creation_tokens are prompt tokens written to it (Anthropic only).
+        """
+        def _get(obj: Any, key: str) -> Any:
+            if obj is None:
+                return None
+            if isinstance(obj, dict):
+                return obj.get(key)
+            return getattr(obj, key, None)
+
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "cache_creation_tokens": 0,
+        }
+
+        # OpenAI / Groq chat completions
+        raw = _get(response, "usage")
+        if raw is not None and _get(raw, "prompt_tokens") is not None:
+            usage["prompt_tokens"] = _get(raw, "prompt_tokens") or 0
+            usage["completion_tokens"] = _get(raw, "completion_tokens") or 0
+            usage["cached_tokens"] = _get(_get(raw, "prompt_tokens_details"), "cached_tokens") or 0
+            return usage
+
+        # Anthropic messages: input_tokens excludes cache reads/writes, so add them back
+        if raw is not None and _get(raw, "input_tokens") is not None:
+            cache_read = _get(raw, "cache_read_input_tokens") or 0
+            cache_write = _get(raw, "cache_creation_input_tokens") or 0
+            usage["prompt_tokens"] = (_get(raw, "input_tokens") or 0) + cache_read + cache_write
+            usage["completion_tokens"] = _get(raw, "output_tokens") or 0
+            usage["cached_tokens"] = cache_read
+            usage["cache_creation_tokens"] = cache_write
+            return usage
+
+        # Gemini
+        meta = _get(response, "usage_metadata")
+        if meta is not None:
+            usage["prompt_tokens"] = _get(meta, "prompt_token_count") or 0
+            usage["completion_tokens"] = _get(meta, "candidates_token_count") or 0
+            usage["cached_tokens"] = _get(meta, "cached_content_token_count") or 0
+
+        return usage
+
     @staticmethod
     def sanitize_content(text_content: str) -> str:
         text_content = re.sub(r'^\s*/\*[\s\S]*?\*/', '', text_content, flags=re.MULTILINE)
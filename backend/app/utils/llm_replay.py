@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_DIR = Path(__file__).parent.parent.parent / "cassettes"
+
+
+class ReplayProviderError(RuntimeError):
+    """Simulated provider failure injected by the replay provider"""
+
+
+def prompt_fingerprint(system_prompt: str, prompt: str) -> str:
+    """Stable key of one LLM request, used to find its exact recording"""
+    digest = hashlib.sha256()
+    digest.update(system_prompt.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def messages_to_prompt(messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """Split OpenAI-style messages into (system prompt, remaining prompt) for fingerprinting"""
+    system_parts, other_parts = [], []
+    for message in messages:
+        content = message.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True)
+        (system_parts if message.get("role") == "system" else other_parts).append(content)
+    return "\n".join(system_parts), "\n".join(other_parts)
+
+
+class LatencyProfile:
+    """
+    Log-normal latency model described by its median and p95, plus a streaming
+    rate so total latency grows with the completion length like a real provider.
+    """
+
+    def __init__(self, median_ms: float = 0.0, p95_ms: float = 0.0, tokens_per_second: float = 0.0):
+        self.median_ms = median_ms
+        self.p95_ms = max(p95_ms, median_ms)
+        self.tokens_per_second = tokens_per_second
+
+    @classmethod
+    def from_env(cls) -> "LatencyProfile":
+        # LLM_REPLAY_LATENCY_MS="median,p95" is the time to first token
+        median_ms, p95_ms = 0.0, 0.0
+        spec = os.getenv("LLM_REPLAY_LATENCY_MS", "")
+        if spec:
+            parts = [float(p) for p in spec.split(",")]
+            median_ms = parts[0]
+            p95_ms = parts[1] if len(parts) > 1 else parts[0]
+        return cls(median_ms, p95_ms, float(os.getenv("LLM_REPLAY_TOKENS_PER_SEC", "0")))
+
+    def first_token_delay(self, rng: random.Random) -> float:
+        """Seconds until the first token"""
+        if self.median_ms <= 0:
+            return 0.0
+        # p95 of a log-normal is median * exp(1.645 * sigma)
+        sigma = math.log(self.p95_ms / self.median_ms) / 1.645 if self.p95_ms > self.median_ms else 0.0
+        return rng.lognormvariate(math.log(self.median_ms), sigma) / 1000
+
+    def token_delay(self) -> float:
+        """Seconds per completion token"""
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+class ReplayProvider:
+    """
+    Fake LLM provider backed by cassette files.
+
+    LLM_REPLAY_MODE selects the behaviour:
+      - "off" (default): not used, real providers are called
+      - "replay": responses come from cassettes; no API keys or network needed
+      - "record": real providers are called and their responses appended to a cassette
+
+    A request is matched on the fingerprint of its system prompt and prompt; when there is
+    no exact recording, the recordings of the same agent are cycled through so pipelines
+    with varying prompts still replay deterministically.
+    """
+
+    def __init__(self, mode: Optional[str] = None, cassette_dir: Optional[str] = None,
+                 latency: Optional[LatencyProfile] = None, failure_rate: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.mode = (mode or os.getenv("LLM_REPLAY_MODE", "off")).lower()
+        self.cassette_dir = Path(cassette_dir or os.getenv("LLM_CASSETTE_DIR", str(DEFAULT_CASSETTE_DIR)))
+        self.record_file = self.cassette_dir / os.getenv("LLM_RECORD_CASSETTE", "recorded.json")
+        self.latency = latency or LatencyProfile.from_env()
+        self.failure_rate = failure_rate if failure_rate is not None else float(os.getenv("LLM_REPLAY_FAILURE_RATE", "0"))
+        self.rng = random.Random(seed if seed is not None else int(os.getenv("LLM_REPLAY_SEED", "42")))
+
+        self._by_fingerprint: Dict[str, Dict[str, Any]] = {}
+        self._by_agent: Dict[str, List[Dict[str, Any]]] = {}
+        self._agent_cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._by_fingerprint.clear()
+            self._by_agent.clear()
+            self._agent_cursor.clear()
+            for cassette_file in sorted(self.cassette_dir.glob("*.json")):
+                try:
+                    with open(cassette_file, "r", encoding="utf-8") as f:
+                        cassette = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning(f"Skipping unreadable cassette {cassette_file}: {e}")
+                    continue
+                for interaction in cassette.get("interactions", []):
+                    if interaction.get("fingerprint"):
+                        self._by_fingerprint[interaction["fingerprint"]] = interaction
+                    self._by_agent.setdefault(interaction["agent"], []).append(interaction)
+            self._loaded = True
+            logger.info(f"Loaded {sum(len(v) for v in self._by_agent.values())} LLM recordings from {self.cassette_dir}")
+
+    def _find(self, agent_name: str, fingerprint: str) -> Dict[str, Any]:
+        self._load()
+        if fingerprint in self._by_fingerprint:
+            return self._by_fingerprint[fingerprint]
+
+        recordings = self._by_agent.get(agent_name)
+        if not recordings:
+            raise LookupError(f"No LLM recording for agent '{agent_name}' in {self.cassette_dir}")
+        with self._lock:
+            cursor = self._agent_cursor.get(agent_name, 0)
+            self._agent_cursor[agent_name] = cursor + 1
+        return recordings[cursor % len(recordings)]
+
+    def _plan(self, agent_name: str, system_prompt: str, prompt: str) -> Tuple[Dict[str, Any], float]:
+        """Pick the recording and total simulated latency, or raise an injected failure"""
+        interaction = self._find(agent_name, prompt_fingerprint(system_prompt, prompt))
+        with self._lock:
+            fail = self.failure_rate > 0 and self.rng.random() < self.failure_rate
+            delay = self.latency.first_token_delay(self.rng)
+        completion_tokens = interaction["response"].get("usage", {}).get("completion_tokens", 0)
+        delay += completion_tokens * self.latency.token_delay()
+        if fail:
+            raise ReplayProviderError(f"Simulated provider failure for agent '{agent_name}'")
+        return interaction, delay
+
+    @staticmethod
+    def _to_response(interaction: Dict[str, Any]) -> SimpleNamespace:
+        """Build an object shaped like an OpenAI ChatCompletion"""
+        recorded = interaction["response"]
+        usage = recorded.get("usage", {})
+        return SimpleNamespace(
+            id=f"replay-{interaction.get('fingerprint', '')[:12]}",
+            model=recorded.get("model", "replay"),
+            choices=[SimpleNamespace(
+                index=0,
+                finish_reason="stop",
+                message=SimpleNamespace(role="assistant", content=recorded["content"])
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                total_tokens=usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+                prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get("cached_tokens", 0))
+            )
+        )
+
+    async def complete(self, agent_name: str, system_prompt: str, prompt: str) -> SimpleNamespace:
+        """Replay a recorded completion after the simulated latency"""
+        interaction, delay = self._plan(agent_name, system_prompt, prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._to_response(interaction)
+
+    def record(self, agent_name: str, system_prompt: str, prompt: str, response: Any) -> None:
+        """Append a real provider response to the recording cassette"""
+        from app.utils.helper_utils import HelperUtils
+
+        usage = HelperUtils.extract_usage(response)
+        interaction = {
+            "agent": agent_name,
+            "fingerprint": prompt_fingerprint(system_prompt, prompt),
+            "response": {
+                "model": getattr(response, "model", None) or "unknown",
+                "content": HelperUtils.extract_text(response),
+                "usage": {
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "cached_tokens": usage["cached_tokens"]
+                }
+            }
+        }
+
+        with self._lock:
+            self.cassette_dir.mkdir(parents=True, exist_ok=True)
+            cassette = {"version": 1, "interactions": []}
+            if self.record_file.exists():
+                with open(self.record_file, "r", encoding="utf-8") as f:
+                    cassette = json.load(f)
+            cassette["interactions"].append(interaction)
+            tmp_file = self.record_file.with_suffix(".json.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(cassette, f, indent=2)
+            os.replace(tmp_file, self.record_file)
+            self._loaded = False
+        logger.info(f"Recorded LLM response for agent '{agent_name}' to {self.record_file}")
+
+
+# Singleton instance
+replay_provider = ReplayProvider()
@@ -0,0 +1,80 @@
+import importlib.util
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.utils.Constants import AGENT_MAX_TOKENS
+from app.utils.llm_replay import replay_provider
+
+logger = logging.getLogger(__name__)
+
+# Connection pool tuning for the shared client; the defaults suit a single worker
+# running a few dozen concurrent generations.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "300"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_max_tokens(agent_name: str) -> Optional[int]:
+    """Completion token budget for an agent: LLM_MAX_TOKENS_<AGENT> env var, then AGENT_MAX_TOKENS; None is uncapped"""
+    override = os.getenv(f"LLM_MAX_TOKENS_{agent_name.upper()}")
+    if override:
+        return int(override)
+    return AGENT_MAX_TOKENS.get(agent_name, AGENT_MAX_TOKENS["default"])
+
+
+def max_tokens_kwargs(max_tokens: Optional[int]) -> Dict[str, Any]:
+    """chat.completions.create kwargs for a budget; empty when uncapped so the model limit applies"""
+    return {"max_tokens": max_tokens} if max_tokens else {}
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    # HTTP/2 multiplexes concurrent completions over one TLS connection; it needs the h2 package
+    http2 = OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None
+    if OPENAI_HTTP2 and not http2:
+        logger.warning("OPENAI_HTTP2 is enabled but the h2 package is missing; using HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+    )
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """Process-wide AsyncOpenAI client sharing one pooled HTTP connection set"""
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        _client = AsyncOpenAI(api_key=api_key, http_client=_build_http_client())
+    return _client
+
+
+async def warm_up_openai_client() -> None:
+    """Open the pooled connection (DNS + TLS) at startup so the first request doesn't pay for it"""
+    if replay_provider.replaying or not os.getenv("OPENAI_API_KEY"):
+        return
+    try:
+        await get_openai_client().models.list()
+        logger.info("OpenAI client warmed up")
+    except Exception as e:
+        logger.warning(f"OpenAI client warm-up failed: {e}")
+
+
+async def close_openai_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Per-request values that deep call sites (LLM calls, storage writes) need for tagging
+# without threading extra parameters through every agent method.
+_session_id: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+_user_id: ContextVar[Optional[str]] = ContextVar("user_id", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def get_session_id() -> Optional[str]:
+    return _session_id.get()
+
+
+def get_user_id() -> Optional[str]:
+    return _user_id.get()
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def get_call_context() -> Dict[str, Optional[str]]:
+    """Return the values currently bound to this task."""
+    return {
+        "session_id": _session_id.get(),
+        "user_id": _user_id.get(),
+        "request_id": _request_id.get(),
+    }
+
+
+@contextmanager
+def request_scope(request_id: str):
+    """Bind the id of the HTTP request being served to the current task."""
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+@contextmanager
+def call_context(session_id: Optional[str] = None, user_id: Optional[str] = None):
+    """Bind session/user to the current task for the duration of the block."""
+    session_token = _session_id.set(session_id)
+    user_token = _user_id.set(user_id)
+    try:
+        yield
+    finally:
+        _session_id.reset(session_token)
+        _user_id.reset(user_token)
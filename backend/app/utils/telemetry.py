@@ -0,0 +1,171 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.utils.request_context import get_request_id
+
+logger = logging.getLogger(__name__)
+
+# Buckets sized for LLM pipelines: sub-second storage writes up to multi-minute generations
+_DURATION_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "dxp_http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=_DURATION_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "dxp_http_requests_in_progress", "HTTP requests currently being served", ["method"],
+)
+STAGE_DURATION = Histogram(
+    "dxp_stage_duration_seconds", "Latency of instrumented pipeline stages",
+    ["stage", "status"], buckets=_DURATION_BUCKETS,
+)
+STAGE_IN_PROGRESS = Gauge(
+    "dxp_stage_in_progress", "Pipeline stages currently executing (queueing indicator)", ["stage"],
+)
+LLM_TOKENS = Counter(
+    "dxp_llm_tokens_total", "LLM tokens by agent, provider and kind (prompt, completion, cached)",
+    ["agent", "provider", "kind"],
+)
+LLM_COST = Counter(
+    "dxp_llm_cost_usd_total", "Estimated LLM spend in USD", ["agent", "provider"],
+)
+CLIENT_DISCONNECTS = Counter(
+    "dxp_client_disconnects_total", "Requests whose work was cancelled because the client went away", ["route"],
+)
+AEM_PIPELINE_RUNS = Counter(
+    "dxp_aem_pipeline_total", "AEM component generations by pipeline (fast, full, fast_fallback)", ["pipeline"],
+)
+AEM_PIPELINE_DURATION = Histogram(
+    "dxp_aem_pipeline_duration_seconds", "AEM component generation latency by pipeline",
+    ["pipeline"], buckets=_DURATION_BUCKETS,
+)
+
+# Trace/span ids of the span currently open in this task, used to parent nested spans
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+_span_id: ContextVar[Optional[str]] = ContextVar("span_id", default=None)
+
+
+class FileSpanExporter:
+    """
+    Appends finished spans as JSON lines shaped like OTLP/JSON spans, so the file can be
+    loaded by OpenTelemetry tooling. Enabled by setting OTEL_TRACES_FILE.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span, default=str)
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to export span {span.get('name')}: {e}")
+
+
+span_exporter = FileSpanExporter(os.getenv("OTEL_TRACES_FILE"))
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> list:
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            converted.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            converted.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            converted.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            converted.append({"key": key, "value": {"stringValue": str(value)}})
+    return converted
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """
+    Time a pipeline stage. Records the stage histogram and in-progress gauge, logs the
+    duration with the request id, and exports a trace span when a file exporter is set.
+    """
+    trace_id = _trace_id.get() or secrets.token_hex(16)
+    parent_span_id = _span_id.get()
+    span_id = secrets.token_hex(8)
+    trace_token = _trace_id.set(trace_id)
+    span_token = _span_id.set(span_id)
+
+    STAGE_IN_PROGRESS.labels(name).inc()
+    start_ns = time.time_ns()
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_IN_PROGRESS.labels(name).dec()
+        STAGE_DURATION.labels(name, status).observe(duration)
+        _span_id.reset(span_token)
+        _trace_id.reset(trace_token)
+
+        request_id = get_request_id()
+        logger.info(f"span={name} status={status} duration_ms={duration * 1000:.1f} request_id={request_id}")
+
+        if span_exporter.enabled:
+            span_exporter.export({
+                "traceId": trace_id,
+                "spanId": span_id,
+                "parentSpanId": parent_span_id or "",
+                "name": name,
+                "kind": 1,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(duration * 1e9)),
+                "attributes": _otlp_attributes({"request.id": request_id, **attributes}),
+                "status": {"code": 1 if status == "ok" else 2},
+            })
+
+
+def traced(name: str):
+    """Decorator wrapping a sync or async function in span(name)"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(agent: str, provider: str, usage: Dict[str, Any], cost_usd: float) -> None:
+    """Feed one LLM call's token usage and cost into the Prometheus counters"""
+    for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(agent, provider, kind.replace("_tokens", "")).inc(usage[kind])
+    if cost_usd:
+        LLM_COST.labels(agent, provider).inc(cost_usd)
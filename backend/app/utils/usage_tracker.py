@@ -0,0 +1,81 @@
+import logging
+from typing import Any, Dict, Optional
+
+from app.chatStorage.chat_model import LLMUsageRecord
+from app.utils.Constants import MODEL_PRICING
+from app.utils.request_context import get_call_context
+from app.utils.telemetry import record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    """Estimate the USD cost of a call from MODEL_PRICING (0.0 for unknown models)."""
+    model_key = None
+    for key in MODEL_PRICING:
+        if model.startswith(key) and (model_key is None or len(key) > len(model_key)):
+            model_key = key
+    if model_key is None:
+        return 0.0
+
+    price = MODEL_PRICING[model_key]
+    uncached = max(usage["prompt_tokens"] - usage["cached_tokens"] - usage["cache_creation_tokens"], 0)
+    cost = (
+        uncached * price["input"]
+        + usage["cached_tokens"] * price["cached_input"]
+        + usage["cache_creation_tokens"] * price["cache_write"]
+        + usage["completion_tokens"] * price["output"]
+    )
+    return round(cost / 1_000_000, 6)
+
+
+class UsageTracker:
+    """
+    Records token usage, cost and wall time of every LLM call.
+    Records are tagged with the session/user bound in request_context and persisted
+    through whichever ChatStorage has been bound; without storage they are only logged.
+    """
+
+    def __init__(self):
+        self.storage = None
+
+    def bind_storage(self, storage) -> None:
+        self.storage = storage
+
+    def record(self, response: Any, agent_name: str, provider: str, model: Optional[str],
+               duration_ms: float, success: bool = True) -> Dict[str, Any]:
+        # Imported lazily: helper_utils imports this module at load time
+        from app.utils.helper_utils import HelperUtils
+
+        usage = HelperUtils.extract_usage(response) if response is not None else {
+            "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cache_creation_tokens": 0
+        }
+        resolved_model = getattr(response, "model", None) or model or "unknown"
+        context = get_call_context()
+
+        record = LLMUsageRecord(
+            agent_name=agent_name,
+            provider=provider,
+            model=resolved_model,
+            session_id=context["session_id"],
+            user_id=context["user_id"],
+            duration_ms=round(duration_ms, 2),
+            cost_usd=estimate_cost(resolved_model, usage),
+            success=success,
+            **usage
+        )
+
+        logger.info(
+            f"LLM call agent={agent_name} provider={provider} model={resolved_model} "
+            f"prompt={record.prompt_tokens} completion={record.completion_tokens} "
+            f"cached={record.cached_tokens} duration_ms={record.duration_ms} cost_usd={record.cost_usd}"
+        )
+
+        record_llm_usage(agent_name, provider, usage, record.cost_usd)
+        if self.storage is not None:
+            self.storage.add_usage_record(record)
+        return record.model_dump()
+
+
+# Singleton instance
+usage_tracker = UsageTracker()
@@ -0,0 +1,65 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare results/<baseline>.json results/<candidate>.json --threshold 10
+
+Exits with status 1 when any scenario's p95 latency or throughput regresses by more
+than the threshold percentage, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+
+def load(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return {scenario["scenario"]: scenario for scenario in report["scenarios"]}
+
+
+def pct_change(before: float, after: float) -> float:
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(baseline: Dict[str, Dict[str, Any]], candidate: Dict[str, Dict[str, Any]],
+            threshold: float) -> Tuple[List[str], List[str]]:
+    lines, regressions = [], []
+    header = f"{'scenario':16s} {'p50 Δ%':>9s} {'p95 Δ%':>9s} {'p99 Δ%':>9s} {'rps Δ%':>9s} {'loop lag max':>16s}"
+    lines.append(header)
+    for name, after in candidate.items():
+        before = baseline.get(name)
+        if not before:
+            lines.append(f"{name:16s} (new scenario)")
+            continue
+        deltas = {
+            key: pct_change(before["latency_ms"][key], after["latency_ms"][key])
+            for key in ("p50", "p95", "p99")
+        }
+        rps_delta = pct_change(before["throughput_rps"], after["throughput_rps"])
+        lag = f"{before['event_loop_lag_ms']['max_ms']:.0f}->{after['event_loop_lag_ms']['max_ms']:.0f}ms"
+        lines.append(f"{name:16s} {deltas['p50']:>+9.1f} {deltas['p95']:>+9.1f} {deltas['p99']:>+9.1f} "
+                     f"{rps_delta:>+9.1f} {lag:>16s}")
+
+        if deltas["p95"] > threshold:
+            regressions.append(f"{name}: p95 latency +{deltas['p95']:.1f}%")
+        if rps_delta < -threshold:
+            regressions.append(f"{name}: throughput {rps_delta:.1f}%")
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    report_lines, found = compare(load(args.baseline), load(args.candidate), args.threshold)
+    print("\n".join(report_lines))
+    if found:
+        print("\nRegressions:")
+        print("\n".join(f"  - {r}" for r in found))
+        sys.exit(1)
@@ -0,0 +1,179 @@
+"""
+In-process harness for driving the FastAPI app under load.
+
+The app is imported with the replay LLM provider, an in-memory Mongo stand-in
+(mongomock) and a throwaway project_code directory, so scenarios run offline and
+never touch the real database or the repository tree.
+"""
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def bootstrap_environment(llm_latency_ms: str, tokens_per_sec: float, failure_rate: float, seed: int) -> Path:
+    """Configure env vars and patch Mongo before the app modules are imported"""
+    # Prompt templates are resolved relative to the backend directory
+    os.chdir(BACKEND_DIR)
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+
+    project_dir = Path(tempfile.mkdtemp(prefix="bench_project_code_"))
+    os.environ.update({
+        "LLM_REPLAY_MODE": "replay",
+        "LLM_CASSETTE_DIR": str(BACKEND_DIR / "cassettes"),
+        "LLM_REPLAY_LATENCY_MS": llm_latency_ms,
+        "LLM_REPLAY_TOKENS_PER_SEC": str(tokens_per_sec),
+        "LLM_REPLAY_FAILURE_RATE": str(failure_rate),
+        "LLM_REPLAY_SEED": str(seed),
+        "PROJECT_CODE_DIR": str(project_dir),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench-not-used"),
+    })
+
+    import mongomock
+    from app.chatStorage import chat_model
+
+    # One shared in-memory client so every ChatStorage instance sees the same data
+    shared_client = mongomock.MongoClient()
+    chat_model.MongoClient = lambda *args, **kwargs: shared_client
+    return project_dir
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 2)
+    except (OSError, ValueError):
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+
+class EventLoopLagMonitor:
+    """Measures how late a periodic timer fires; blocking calls on the loop show up as lag"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - expected, 0.0) * 1000)
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        samples = sorted(self.samples)
+        return {
+            "p50_ms": round(percentile(samples, 50), 2),
+            "p99_ms": round(percentile(samples, 99), 2),
+            "max_ms": round(samples[-1], 2) if samples else 0.0,
+        }
+
+
+RequestFn = Callable[[Any, int], Awaitable[Any]]
+
+
+class UnexpectedResponse(Exception):
+    """A non-2xx response: the scenario is hitting the wrong route or a broken one, so its numbers are meaningless"""
+
+
+async def run_scenario(name: str, client: Any, request_fn: RequestFn, total_requests: int,
+                       concurrency: int, trace_memory: bool = False) -> Dict[str, Any]:
+    """Fire total_requests calls of request_fn with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await request_fn(client, index)
+            except Exception as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+                latencies.append((time.perf_counter() - started) * 1000)
+                return
+            if not 200 <= response.status_code < 300:
+                raise UnexpectedResponse(
+                    f"{name}: {response.request.method} {response.request.url.path} returned "
+                    f"HTTP {response.status_code}: {response.text[:200]}")
+            # Application-level failures (e.g. injected provider errors) are counted, not fatal
+            try:
+                if response.headers.get("content-type", "").startswith("application/json"):
+                    body = response.json()
+                    if isinstance(body, dict) and body.get("success") is False:
+                        errors["success_false"] = errors.get("success_false", 0) + 1
+            except Exception as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    monitor = EventLoopLagMonitor()
+    rss_before = current_rss_mb()
+    if trace_memory:
+        tracemalloc.start()
+    monitor.start()
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total_requests)))
+    wall_seconds = time.perf_counter() - wall_started
+
+    loop_lag = await monitor.stop()
+    peak_traced_mb = None
+    if trace_memory:
+        peak_traced_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "error_count": sum(errors.values()),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(total_requests / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        },
+        "event_loop_lag_ms": loop_lag,
+        "memory": {
+            "rss_before_mb": rss_before,
+            "rss_after_mb": current_rss_mb(),
+            "traced_peak_mb": peak_traced_mb,
+        },
+    }
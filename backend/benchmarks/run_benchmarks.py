@@ -0,0 +1,144 @@
+"""
+End-to-end throughput and latency benchmarks for the backend.
+
+Usage (from the backend directory):
+    pip install -r requirements.txt -r benchmarks/requirements.txt
+    python -m benchmarks.run_benchmarks --concurrency 8 --requests 40
+
+Each run writes benchmarks/results/<timestamp>-<git sha>.json; compare two runs with
+    python -m benchmarks.compare <baseline.json> <candidate.json>
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.harness import BACKEND_DIR, bootstrap_environment, run_scenario
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+SCENARIOS = ["generate", "refine", "session_list", "session_search", "session_detail", "eds_block"]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+async def seed_component(client) -> Dict[str, str]:
+    """Generate one component so refine and session routes have data to work on"""
+    response = await client.post("/api/component/generate",
+                                 data={"componentDesc": "Promo banner with title, text and a CTA", "userId": "bench"})
+    body = response.json()
+    if not body.get("success"):
+        raise RuntimeError(f"Seeding generation failed: {body}")
+    return {"session_id": body["session_id"], "component_id": body["component_id"]}
+
+
+def build_requests(seed: Dict[str, str]):
+    async def generate(client, index):
+        return await client.post("/api/component/generate", data={
+            "componentDesc": f"Promo banner #{index} with title, text and a call to action",
+            "userId": f"bench-user-{index % 4}"
+        })
+
+    async def refine(client, index):
+        return await client.post("/api/component/refine", json={
+            "session_id": seed["session_id"],
+            "component_id": seed["component_id"],
+            "refinement_prompt": f"Make the CTA more prominent (variant {index})",
+            "user_id": "bench"
+        })
+
+    async def session_list(client, index):
+        return await client.get("/api/component/chat/sessions", params={"limit": 20})
+
+    async def session_search(client, index):
+        return await client.get("/api/component/chat/sessions/search", params={"q": "Promo"})
+
+    async def session_detail(client, index):
+        return await client.get(f"/api/component/chat/sessions/{seed['session_id']}")
+
+    async def eds_block(client, index):
+        return await client.post("/api/component/generate-eds-block",
+                                 json={"description": f"Hero banner with background image #{index}"})
+
+    return {
+        "generate": generate,
+        "refine": refine,
+        "session_list": session_list,
+        "session_search": session_search,
+        "session_detail": session_detail,
+        "eds_block": eds_block,
+    }
+
+
+async def main(args) -> Dict[str, Any]:
+    bootstrap_environment(args.llm_latency, args.tokens_per_sec, args.failure_rate, args.seed)
+
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    results: List[Dict[str, Any]] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        seed = await seed_component(client)
+        requests = build_requests(seed)
+
+        for name in args.scenarios:
+            # Read-only routes are cheap, so give them proportionally more requests
+            total = args.requests * (5 if name.startswith("session_") else 1)
+            result = await run_scenario(name, client, requests[name], total, args.concurrency, args.trace_memory)
+            results.append(result)
+            print(f"{name:16s} p50={result['latency_ms']['p50']:>9.1f}ms "
+                  f"p95={result['latency_ms']['p95']:>9.1f}ms p99={result['latency_ms']['p99']:>9.1f}ms "
+                  f"rps={result['throughput_rps']:>8.2f} loop_lag_max={result['event_loop_lag_ms']['max_ms']:>8.1f}ms "
+                  f"errors={result['error_count']}")
+
+    return {
+        "git_revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "llm_latency_ms": args.llm_latency,
+            "tokens_per_sec": args.tokens_per_sec,
+            "failure_rate": args.failure_rate,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run backend throughput/latency benchmarks")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight per scenario")
+    parser.add_argument("--requests", type=int, default=24, help="Requests per generation scenario")
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--llm-latency", default="200,600", help="Simulated time to first token 'median,p95' in ms")
+    parser.add_argument("--tokens-per-sec", type=float, default=400, help="Simulated completion token rate")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of a simulated provider failure")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--trace-memory", action="store_true", help="Track Python allocation peaks (slower)")
+    parser.add_argument("--output", type=Path, default=None, help="Result file (default: results/<time>-<sha>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    report = asyncio.run(main(arguments))
+
+    output = arguments.output or RESULTS_DIR / (
+        f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{report['git_revision']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
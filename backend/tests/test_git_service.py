@@ -0,0 +1,90 @@
+"""Object-level EDS push (GIT_PUSH_MODE=local) against a temporary bare repository"""
+import asyncio
+from pathlib import Path
+
+import pytest
+from git import Actor, Repo
+
+from app.services import git_service
+from app.services.git_service import GitPushQueue, GitService, LocalBareRepoBackend
+
+BLOCK_FILES = {
+    "blocks/hero/hero.js": "export default function decorate(block) {}\n",
+    "blocks/hero/hero.css": ".hero { display: flex; }\n",
+}
+
+
+@pytest.fixture
+def bare_repo(tmp_path) -> Path:
+    """Bare repository whose main branch already holds the hero block's CSS"""
+    work = Repo.init(tmp_path / "work", initial_branch="main")
+    for rel_path, content in {"README.md": "# EDS\n", "blocks/hero/hero.css": BLOCK_FILES["blocks/hero/hero.css"]}.items():
+        path = tmp_path / "work" / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    work.index.add(["README.md", "blocks/hero/hero.css"])
+    author = Actor("Test", "test@example.com")
+    work.index.commit("Initial commit", author=author, committer=author)
+    work.clone(tmp_path / "origin.git", bare=True)
+    return tmp_path / "origin.git"
+
+
+@pytest.fixture
+def service(monkeypatch) -> GitService:
+    monkeypatch.setenv("GIT_BASE_BRANCH", "main")
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    return GitService()
+
+
+def test_unchanged_tree_creates_no_commit(bare_repo, service):
+    backend = LocalBareRepoBackend(str(bare_repo))
+    unchanged = {"blocks/hero/hero.css": BLOCK_FILES["blocks/hero/hero.css"]}
+
+    assert service._commit_via_data_api(backend, "eds/hero-1", unchanged, "Add hero") is None
+    assert "eds/hero-1" not in [head.name for head in Repo(bare_repo).heads]
+
+
+def test_changed_tree_creates_commit_and_branch(bare_repo, service):
+    backend = LocalBareRepoBackend(str(bare_repo))
+    base = Repo(bare_repo).commit("refs/heads/main")
+
+    commit_sha = service._commit_via_data_api(backend, "eds/hero-1", BLOCK_FILES, "Add hero")
+
+    commit = Repo(bare_repo).commit("refs/heads/eds/hero-1")
+    assert commit.hexsha == commit_sha
+    assert commit.parents == (base,)
+    assert commit.message.strip() == "Add hero"
+    assert commit.author.name == service.author_name
+    for rel_path, content in BLOCK_FILES.items():
+        assert commit.tree[rel_path].data_stream.read().decode("utf-8") == content
+        assert commit.tree[rel_path].mode == 0o100644
+    # The base tree's other files are kept; main itself does not move
+    assert commit.tree["README.md"].data_stream.read() == b"# EDS\n"
+    assert Repo(bare_repo).commit("refs/heads/main") == base
+
+
+def test_queue_pushes_repeated_block_as_follow_up_commit(bare_repo, service, monkeypatch):
+    """Two callers pushing the same block in one window: one branch, the later code on top of the earlier"""
+    monkeypatch.setattr(git_service, "GIT_PUSH_MODE", "local")
+    monkeypatch.setattr(git_service, "GIT_LOCAL_REPO", str(bare_repo))
+    monkeypatch.setattr(git_service, "GIT_PUSH_BATCH_WINDOW_SECONDS", 0.01)
+
+    async def push_twice():
+        queue = GitPushQueue()
+        return await asyncio.gather(
+            queue.submit("Hero", {"js": "// first\n"}, {"sessionId": "a"}),
+            queue.submit("Cards", {"js": "// cards\n"}, {"sessionId": "a"}),
+            queue.submit("hero", {"js": "// second\n"}, {"sessionId": "b"}))
+
+    first, cards, second = asyncio.run(push_twice())
+
+    assert [first["status"], cards["status"], second["status"]] == ["pushed", "pushed", "pushed"]
+    assert first["branch_name"] == cards["branch_name"] == second["branch_name"]
+    assert first["commit_sha"] == cards["commit_sha"] != second["commit_sha"]
+    repo = Repo(bare_repo)
+    head = repo.commit(f"refs/heads/{second['branch_name']}")
+    assert head.hexsha == second["commit_sha"]
+    assert head.parents[0].hexsha == first["commit_sha"]
+    assert head.tree["blocks/hero/script.js"].data_stream.read() == b"// second\n"
+    assert head.tree["blocks/cards/script.js"].data_stream.read() == b"// cards\n"
+    assert head.parents[0].tree["blocks/hero/script.js"].data_stream.read() == b"// first\n"
@@ -30,7 +30,8 @@ import VisualCodeSandbox from "./VisualCodeSandbox";
 import MkdTable from "./MarkdownTable";
 import AEMRightPanel from "./AEMRightPanel";
 import EDSRightPanel from "./EDSRightPanel";
-import { downloadZipFromBase64 } from "../utils/zipdownload.js";
+import { downloadBlob } from "../utils/zipdownload.js";
+import { createSubmissionKeys, postIdempotent } from "../utils/idempotency.js";
 import { apiConfig } from '../config/apiConfig.js';
 
 // API base URL for component endpoints (backward compatibility)
@@ -105,6 +106,9 @@ const DXPComponentGeneratorInterface = () => {
 
   const llmButtonRef = useRef(null);
   const cmsButtonRef = useRef(null);
+  // Idempotency keys survive re-renders so a resubmitted request reuses its key
+  const generateKeysRef = useRef(createSubmissionKeys());
+  const refineKeysRef = useRef(createSubmissionKeys());
 
   const [edsOutput, setEdsOutput] = useState({});
 
@@ -475,11 +479,18 @@ const DXPComponentGeneratorInterface = () => {
     }
   };
 
-  const handleDownload = () => {
-    downloadZipFromBase64(
-        selectedComponent?.code?.zip_base64,
-        selectedComponent?.code?.file_name
-    );
+  const handleDownload = async () => {
+    const code = selectedComponent?.code || {};
+    try {
+      const archive = await axios.post(
+          apiConfig.getFullUrl(apiConfig.endpoints.edsBlockArchive),
+          { block_name: code.block_name, css: code.css || "", js: code.js || "" },
+          { responseType: "blob" }
+      );
+      downloadBlob(archive.data, code.file_name);
+    } catch (err) {
+      console.error("Failed to download block archive", err);
+    }
   };
 
   const handleEdsSendMessage = async () => {
@@ -651,9 +662,19 @@ const DXPComponentGeneratorInterface = () => {
       console.log("📡 Making POST request to:", `${API_BASE_URL}/generate`);
       console.log("🔗 Full URL:", `${API_BASE_URL}/generate`);
       
-      const response = await axios.post(`${API_BASE_URL}/generate`, formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
+      // One key per submission: retries (and resubmitting the same prompt after a failure)
+      // reuse it, so the backend resumes or returns the first run instead of starting another
+      const imageId = uploadedImage
+        ? (typeof uploadedImage === "string"
+            ? `${uploadedImage.length}:${uploadedImage.slice(-64)}`
+            : `${uploadedImage.name}:${uploadedImage.size}:${uploadedImage.lastModified}`)
+        : "";
+      const fingerprint = `${sessionId}\n${inputMessage}\n${imageId}`;
+      const response = await postIdempotent(`${API_BASE_URL}/generate`, formData,
+        generateKeysRef.current.keyFor(fingerprint), {
+          headers: { "Content-Type": "multipart/form-data" },
+        });
+      if (response.data.success) generateKeysRef.current.complete(fingerprint);
 
       console.log("📨 Generate response received:", response.data);
 
@@ -726,12 +747,14 @@ const DXPComponentGeneratorInterface = () => {
 
     setIsRefining(true);
     try {
-      const response = await axios.post(`${API_BASE_URL}/refine`, {
+      const fingerprint = `${currentSessionId}\n${selectedComponentForRefinement.id}\n${inputMessage}`;
+      const response = await postIdempotent(`${API_BASE_URL}/refine`, {
         session_id: currentSessionId,
         component_id: selectedComponentForRefinement.id,
         refinement_prompt: inputMessage,
         user_id: "default_user"
-      });
+      }, refineKeysRef.current.keyFor(fingerprint));
+      if (response.data.success) refineKeysRef.current.complete(fingerprint);
 
       if (response.data.success) {
         // Reload the current session to get the refined component
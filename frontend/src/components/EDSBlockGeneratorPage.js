@@ -1,6 +1,5 @@
 import React, { useState } from 'react';
 import axios from 'axios';
-import { Buffer } from 'buffer';
 import { apiConfig } from '../config/apiConfig.js';
 
 export default function EDSBlockGeneratorPage() {
@@ -29,10 +28,13 @@ export default function EDSBlockGeneratorPage() {
     try {
       const res = await axios.post(apiConfig.getFullUrl(apiConfig.endpoints.generateEdsBlock), formData);
 
-      const { zip_base64, css, js, file_name } = res.data;
-      const blob = new Blob([Uint8Array.from(Buffer.from(zip_base64, 'hex'))], {
-        type: 'application/zip'
-      });
+      const { block_name, css, js, file_name } = res.data;
+      const archive = await axios.post(
+        apiConfig.getFullUrl(apiConfig.endpoints.edsBlockArchive),
+        { block_name, css, js },
+        { responseType: 'blob' }
+      );
+      const blob = archive.data;
 
       const zipUrl = window.URL.createObjectURL(blob);
       setDownloadUrl({ url: zipUrl, name: file_name });
@@ -44,9 +44,10 @@ export const apiConfig = {
     generateComponent: '/api/component/generate',
     generateAemComponent: '/api/component',
     generateEdsBlock: '/api/component/generate-eds-block',
+    edsBlockArchive: '/api/component/generate-eds-block/archive',
     
     // Project endpoints
-    generateProject: '/api/projects/generate',
+    generateProject: '/api/project/generate',
     
     // AEM project build endpoint
     buildAemProject: '/api/build-aem-project',
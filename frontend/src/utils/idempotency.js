@@ -0,0 +1,56 @@
+// utils/idempotency.js
+import axios from "axios";
+
+// Statuses worth retrying with the same key: the backend either never saw the request or
+// is still running it, and answers a repeat with the first run's result
+const RETRYABLE_STATUSES = [408, 502, 503, 504];
+
+// crypto.randomUUID only exists in secure contexts (HTTPS or localhost)
+export function newIdempotencyKey() {
+    if (typeof crypto !== "undefined" && typeof crypto.randomUUID === "function") {
+        return crypto.randomUUID();
+    }
+    const bytes = new Uint8Array(16);
+    if (typeof crypto !== "undefined" && typeof crypto.getRandomValues === "function") {
+        crypto.getRandomValues(bytes);
+    } else {
+        for (let i = 0; i < bytes.length; i++) bytes[i] = Math.floor(Math.random() * 256);
+    }
+    bytes[6] = (bytes[6] & 0x0f) | 0x40; // version 4
+    bytes[8] = (bytes[8] & 0x3f) | 0x80; // RFC 4122 variant
+    const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+// One key per user submission: a resubmission of the same request (same fingerprint) after a
+// failure reuses it, so the backend resumes or returns that run instead of starting another
+export function createSubmissionKeys() {
+    let pending = null;
+    return {
+        keyFor(fingerprint) {
+            if (!pending || pending.fingerprint !== fingerprint) {
+                pending = { fingerprint, key: newIdempotencyKey() };
+            }
+            return pending.key;
+        },
+        // Call once the submission succeeded; the next one gets a fresh key
+        complete(fingerprint) {
+            if (pending && pending.fingerprint === fingerprint) pending = null;
+        },
+    };
+}
+
+// POST with an Idempotency-Key, retrying network errors and gateway timeouts with the same key
+export async function postIdempotent(url, data, key, config = {}, retries = 2) {
+    const headers = { ...(config.headers || {}), "Idempotency-Key": key };
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await axios.post(url, data, { ...config, headers });
+        } catch (error) {
+            const status = error.response?.status;
+            const retryable = !error.response || RETRYABLE_STATUSES.includes(status);
+            if (!retryable || attempt >= retries || axios.isCancel(error)) throw error;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt));
+        }
+    }
+}
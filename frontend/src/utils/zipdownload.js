@@ -9,7 +9,10 @@ export function downloadZipFromBase64(
         .map((_, i) => byteCharacters.charCodeAt(i));
     const byteArray = new Uint8Array(byteNumbers);
 
-    const blob = new Blob([byteArray], { type: "application/zip" });
+    downloadBlob(new Blob([byteArray], { type: "application/zip" }), filename);
+}
+
+export function downloadBlob(blob: Blob, filename: string = "download.zip") {
     const blobUrl = URL.createObjectURL(blob);
 
     const link = document.createElement("a");